@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ApiV2Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api_v2'
\ No newline at end of file
+    name = 'api_v2'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -11,6 +11,7 @@ from django.shortcuts import get_object_or_404
 from user.models import LineProfile
 from services.integrated_query_service import IntegratedQueryService
 from services.n8n_workflow_service import N8nWorkflowService
+from services.search_service import SearchService, DEFAULT_LIMIT
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -222,6 +223,73 @@ def search_courses_and_assignments(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def unified_search(request):
+    """
+    全文搜尋（課程、作業、筆記），依相關度排序
+    
+    GET /api/v2/integrated/search/all/?line_user_id=U123456789&q=資料結構&types=course,note&limit=20
+    """
+    try:
+        line_user_id = request.GET.get('line_user_id')
+        query = request.GET.get('q')
+        
+        if not line_user_id:
+            return Response({
+                "error": "missing_parameter",
+                "message": "缺少 line_user_id 參數",
+                "code": "MISSING_LINE_USER_ID"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not query:
+            return Response({
+                "error": "missing_parameter",
+                "message": "缺少搜尋關鍵字 q 參數",
+                "code": "MISSING_QUERY"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        doc_types = [t for t in request.GET.get('types', '').split(',') if t] or None
+        if doc_types and not set(doc_types) <= {'course', 'assignment', 'note'}:
+            return Response({
+                "error": "invalid_parameter",
+                "message": "types 只能是 course、assignment、note",
+                "code": "INVALID_TYPES_PARAMETER"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({
+                "error": "invalid_parameter",
+                "message": "limit 必須是數字",
+                "code": "INVALID_LIMIT_PARAMETER"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 驗證使用者存在
+        get_object_or_404(LineProfile, line_user_id=line_user_id)
+        
+        results = SearchService.search(line_user_id, query, doc_types, limit)
+        
+        return Response({
+            "success": True,
+            "data": {
+                "query": query,
+                "results": results,
+                "total_results": len(results)
+            }
+        }, status=status.HTTP_200_OK)
+    
+    except Exception as e:
+        logger.error(f"Error in unified search: {str(e)}")
+        return Response({
+            "error": "internal_error",
+            "message": "搜尋時發生錯誤",
+            "details": str(e),
+            "code": "INTERNAL_ERROR"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def get_dashboard_data(request):
@@ -366,4 +434,4 @@ def process_n8n_intent(request):
             "message": "處理意圖時發生錯誤",
             "details": str(e),
             "code": "INTERNAL_ERROR"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
@@ -15,10 +15,47 @@ from services.integrated_query_service import IntegratedQueryService
 from services.web_data_service import WebDataService
 from api_v2.models import CustomCategory, CustomTodoItem, CourseV2, NoteV2
 from api_v2.validators import APIValidator
+from api_v2.streaming import streaming_json_response
 
 logger = logging.getLogger(__name__)
 
 
+def _format_course(course):
+    """轉換為前端期望的課程欄位（即時 Classroom 資料的 sync_status 等額外欄位不輸出）"""
+    return {
+        'id': course['id'],
+        'title': course['title'],
+        'description': course['description'],
+        'instructor': course['instructor'],
+        'classroom': course['classroom'],
+        'color': course['color'],
+        'source': course['source'],  # local, classroom_mirror, classroom_live
+        'is_google_classroom': course['is_google_classroom'],
+        'google_classroom_id': course.get('google_classroom_id'),
+        'created_at': course['created_at'],
+        'updated_at': course['updated_at'],
+        'schedules': course['schedules']
+    }
+
+
+def _format_assignment(assignment):
+    """轉換為前端期望的作業欄位"""
+    return {
+        'id': assignment['id'],
+        'title': assignment['title'],
+        'description': assignment['description'],
+        'due_date': assignment['due_date'],
+        'type': assignment['type'],
+        'status': assignment['status'],
+        'source': assignment['source'],  # local, classroom_mirror, classroom_live
+        'is_google_classroom': assignment['is_google_classroom'],
+        'google_coursework_id': assignment.get('google_coursework_id'),
+        'course': assignment['course'],
+        'created_at': assignment['created_at'],
+        'updated_at': assignment['updated_at']
+    }
+
+
 @api_view(["GET", "HEAD"])
 @permission_classes([AllowAny])
 def get_courses(request):
@@ -46,32 +83,14 @@ def get_courses(request):
         if request.method == "HEAD":
             return Response(status=status.HTTP_200_OK)
         
-        # 獲取整合課程列表
+        # 獲取整合課程列表（逐筆串流輸出，source: local, classroom_mirror, classroom_live）
         query_service = IntegratedQueryService(line_user_id)
-        courses = query_service.get_integrated_courses(include_classroom=True)
-        
-        # 轉換為前端期望的格式
-        formatted_courses = []
-        for course in courses:
-            formatted_course = {
-                'id': course['id'],
-                'title': course['title'],
-                'description': course['description'],
-                'instructor': course['instructor'],
-                'classroom': course['classroom'],
-                'color': course['color'],
-                'source': course['source'],  # local, classroom_mirror, classroom_live
-                'is_google_classroom': course['is_google_classroom'],
-                'google_classroom_id': course.get('google_classroom_id'),
-                'created_at': course['created_at'],
-                'updated_at': course['updated_at'],
-                'schedules': course['schedules']
-            }
-            formatted_courses.append(formatted_course)
+        courses = map(_format_course, query_service.iter_integrated_courses(include_classroom=True))
         
-        logger.info(f"Retrieved {len(formatted_courses)} courses for user: {line_user_id}")
-        
-        return Response(formatted_courses, status=status.HTTP_200_OK)
+        return streaming_json_response(
+            courses,
+            on_complete=lambda count: logger.info(f"Retrieved {count} courses for user: {line_user_id}")
+        )
     
     except Exception as e:
         logger.error(f"Error retrieving courses: {str(e)}")
@@ -125,32 +144,14 @@ def get_assignments(request):
                     "code": "INVALID_DAYS_PARAMETER"
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 獲取整合作業列表
+        # 獲取整合作業列表（依截止日期逐筆串流輸出，source: local, classroom_mirror, classroom_live）
         query_service = IntegratedQueryService(line_user_id)
-        assignments = query_service.get_integrated_assignments(**filters)
+        assignments = map(_format_assignment, query_service.iter_integrated_assignments(**filters))
         
-        # 轉換為前端期望的格式
-        formatted_assignments = []
-        for assignment in assignments:
-            formatted_assignment = {
-                'id': assignment['id'],
-                'title': assignment['title'],
-                'description': assignment['description'],
-                'due_date': assignment['due_date'],
-                'type': assignment['type'],
-                'status': assignment['status'],
-                'source': assignment['source'],  # local, classroom_mirror, classroom_live
-                'is_google_classroom': assignment['is_google_classroom'],
-                'google_coursework_id': assignment.get('google_coursework_id'),
-                'course': assignment['course'],
-                'created_at': assignment['created_at'],
-                'updated_at': assignment['updated_at']
-            }
-            formatted_assignments.append(formatted_assignment)
-        
-        logger.info(f"Retrieved {len(formatted_assignments)} assignments for user: {line_user_id}")
-        
-        return Response(formatted_assignments, status=status.HTTP_200_OK)
+        return streaming_json_response(
+            assignments,
+            on_complete=lambda count: logger.info(f"Retrieved {count} assignments for user: {line_user_id}")
+        )
     
     except Exception as e:
         logger.error(f"Error retrieving assignments: {str(e)}")
@@ -1305,4 +1306,4 @@ def get_exams(request):
             "message": "獲取考試時發生錯誤",
             "details": str(e),
             "code": "INTERNAL_ERROR"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Django 管理命令：以 OCR 課表文字語料測量 parse_multiple_courses_from_timetable 的速度
+
+執行方式：
+python manage.py benchmark_timetable_parser fixtures/ocr_timetables
+python manage.py benchmark_timetable_parser a.txt b.txt --repeat 50
+"""
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.importers import parse_multiple_courses_from_timetable
+
+
+class Command(BaseCommand):
+    help = '測量課表文字解析器在 OCR 語料上的執行時間'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='文字檔或資料夾（讀取其中的 .txt）')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='每個檔案重複解析次數 (預設: 20)'
+        )
+
+    def _collect(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith('.txt')
+                )
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f'找不到檔案: {path}')
+        if not files:
+            raise CommandError('沒有可測量的文字檔')
+        return files
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+        medians = []
+        for path in self._collect(options['paths']):
+            with open(path, encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+
+            timings = []
+            courses = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                courses = parse_multiple_courses_from_timetable(text)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            median = statistics.median(timings)
+            medians.append(median)
+            self.stdout.write(
+                f'{os.path.basename(path)}: {len(text.splitlines())} 行, {len(courses)} 門課程, '
+                f'中位數 {median:.2f} ms, 最大 {max(timings):.2f} ms'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'共 {len(medians)} 個檔案，中位數合計 {sum(medians):.2f} ms'
+        ))
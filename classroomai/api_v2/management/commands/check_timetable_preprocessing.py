@@ -0,0 +1,81 @@
+"""
+Django 管理命令：以一組課表圖片檢查上傳模型前的圖片前處理
+- 回報每張圖片前處理前後的大小、格式與處理時間
+- --compare 時分別以原圖與前處理後的圖片呼叫模型，比對解析出的課程與時段是否一致
+
+執行方式：
+python manage.py check_timetable_preprocessing fixtures/timetables
+python manage.py check_timetable_preprocessing fixtures/timetables --compare
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.image_preprocessing import preprocess_image, sniff_mime_type
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.heic')
+
+
+def _signature(items):
+    """比對用的課程與時段集合（忽略順序）"""
+    return {
+        (item['title'], item.get('instructor', ''), item.get('classroom', ''),
+         tuple((s['day_of_week'], s['start'], s['end']) for s in item.get('schedule', [])))
+        for item in items
+    }
+
+
+class Command(BaseCommand):
+    help = '以課表圖片資料夾檢查圖片前處理（大小、時間，以及可選的解析結果比對）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='課表圖片資料夾')
+        parser.add_argument('--compare', action='store_true', help='呼叫模型比對原圖與前處理後的解析結果')
+        parser.add_argument('--max-side', type=int, default=None, help='長邊上限（預設為設定值）')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'找不到資料夾: {directory}')
+
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            raise CommandError('資料夾內沒有圖片')
+
+        total_before = total_after = mismatches = 0
+        for path in paths:
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            started = time.perf_counter()
+            processed, mime_type = preprocess_image(data, max_side=options['max_side'])
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            total_before += len(data)
+            total_after += len(processed)
+            self.stdout.write(
+                f'{os.path.basename(path)}: {sniff_mime_type(data)} {len(data)} B -> '
+                f'{mime_type} {len(processed)} B ({elapsed_ms:.0f} ms)'
+            )
+
+            if options['compare']:
+                from services.gemma_client import extract_timetable_from_image
+
+                original = _signature(extract_timetable_from_image(data, preprocess=False))
+                reduced = _signature(extract_timetable_from_image(data))
+                if original == reduced:
+                    self.stdout.write(self.style.SUCCESS(f'  解析結果一致（{len(original)} 門課程）'))
+                else:
+                    mismatches += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'  解析結果不同：僅原圖 {sorted(original - reduced)}；僅前處理 {sorted(reduced - original)}'
+                    ))
+
+        ratio = total_after / total_before if total_before else 1
+        self.stdout.write(f'共 {len(paths)} 張：{total_before} B -> {total_after} B（{ratio:.0%}）')
+        if options['compare']:
+            style = self.style.SUCCESS if not mismatches else self.style.WARNING
+            self.stdout.write(style(f'解析結果不同的圖片：{mismatches} 張'))
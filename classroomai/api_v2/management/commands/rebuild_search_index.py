@@ -0,0 +1,54 @@
+"""
+Django 管理命令：重建全文搜尋索引（SearchDocument）
+
+執行方式：
+python manage.py rebuild_search_index
+python manage.py rebuild_search_index --line-user-id U123456789
+"""
+from django.core.management.base import BaseCommand
+
+from api_v2.models import CourseV2, AssignmentV2, SearchDocument
+from course.models import StudentNote
+from services.search_service import SearchService
+
+
+class Command(BaseCommand):
+    help = '重建課程、作業、筆記的全文搜尋索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--line-user-id',
+            type=str,
+            default='',
+            help='只重建指定使用者的索引（預設全部）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批讀取筆數 (預設: 500)'
+        )
+
+    def handle(self, *args, **options):
+        line_user_id = options['line_user_id']
+        batch_size = options['batch_size']
+
+        sources = [
+            ('課程', CourseV2.objects.all(), 'user_id'),
+            ('作業', AssignmentV2.objects.all(), 'user_id'),
+            ('筆記', StudentNote.objects.all(), 'author_id'),
+        ]
+
+        stale = SearchDocument.objects.all()
+        if line_user_id:
+            stale = stale.filter(user_id=line_user_id)
+        deleted, _ = stale.delete()
+        self.stdout.write(f"🧹 已清除 {deleted} 筆舊索引")
+
+        for label, queryset, user_field in sources:
+            if line_user_id:
+                queryset = queryset.filter(**{user_field: line_user_id})
+            count = SearchService.rebuild(queryset.iterator(chunk_size=batch_size))
+            self.stdout.write(self.style.SUCCESS(f"✅ {label}：已建立 {count} 筆索引"))
+
+        self.stdout.write(f"🔎 搜尋後端：{SearchService.backend()}")
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.24 on 2026-10-19 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_lineprofile_email_alter_lineprofile_extra_and_more'),
+        ('api_v2', '0003_delete_userprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDashboardSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_summary', serialize=False, to='user.lineprofile')),
+                ('courses_local', models.IntegerField(default=0)),
+                ('courses_mirror', models.IntegerField(default=0)),
+                ('assignments_local', models.IntegerField(default=0)),
+                ('assignments_mirror', models.IntegerField(default=0)),
+                ('assignments_pending', models.IntegerField(default=0)),
+                ('assignments_completed', models.IntegerField(default=0)),
+                ('assignments_overdue', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'api_v2_userdashboardsummary',
+            },
+        ),
+    ]
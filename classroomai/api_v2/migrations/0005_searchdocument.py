@@ -0,0 +1,197 @@
+# Generated by Django 4.2.24 on 2026-10-19 12:30
+
+from html.parser import HTMLParser
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TABLE = "api_v2_searchdocument"
+FTS_TABLE = "api_v2_searchdocument_fts"
+BACKFILL_BATCH_SIZE = 1000
+
+# 以下斷詞與 HTML 純文字轉換為建立索引當下的版本，刻意不引用 services，避免日後修改服務程式碼影響遷移
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+TOKEN_RE = re.compile(f"([{_CJK}]+)|([0-9a-z]+)")
+WHITESPACE_RE = re.compile(r"\s+")
+BLOCK_TAGS = {"br", "p", "div", "li", "ul", "ol", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre"}
+SKIP_TAGS = {"script", "style"}
+
+
+def create_fulltext(apps, schema_editor):
+    """
+    MySQL：ngram parser FULLTEXT 索引（標題單獨一個索引以便加權）
+    SQLite：以 external content 方式建立 FTS5 虛擬表，並以 trigger 同步
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "mysql":
+        # InnoDB 一次只能建立一個 FULLTEXT 索引
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX api_v2_sear_title_ft (title) WITH PARSER ngram")
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX api_v2_sear_text_ft (title, body) WITH PARSER ngram")
+    elif vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if "ENABLE_FTS5" not in {row[0] for row in cursor.fetchall()}:
+                # 未編譯 FTS5 時改由 Python 端計分
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"owner, title_tokens, body_tokens, content='{TABLE}', content_rowid='id', "
+            "tokenize='unicode61', prefix='1 2 3')"
+        )
+        columns = "owner, title_tokens, body_tokens"
+        new_values = "new.user_id, new.title_tokens, new.body_tokens"
+        old_values = "old.user_id, old.title_tokens, old.body_tokens"
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+
+
+def drop_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "mysql":
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP INDEX api_v2_sear_title_ft")
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP INDEX api_v2_sear_text_ft")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _tokenize(text):
+    """中日韓連續字串切成二元組並補上最後一個字，英數字以整個詞為單位"""
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            tokens.append(cjk[-1])
+    return tokens
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def _plain_text(html):
+    extractor = _TextExtractor()
+    extractor.feed(html or "")
+    extractor.close()
+    return WHITESPACE_RE.sub(" ", "".join(extractor.parts)).strip()
+
+
+def _course_documents(apps):
+    CourseV2 = apps.get_model("api_v2", "CourseV2")
+    rows = CourseV2.objects.values("id", "user_id", "title", "description", "instructor", "classroom")
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        body = " ".join(filter(None, [row["description"], row["instructor"], row["classroom"]]))
+        yield "course", row["id"], row["user_id"], row["title"], body
+
+
+def _assignment_documents(apps):
+    AssignmentV2 = apps.get_model("api_v2", "AssignmentV2")
+    rows = AssignmentV2.objects.values("id", "user_id", "title", "description")
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        yield "assignment", row["id"], row["user_id"], row["title"], row["description"] or ""
+
+
+def _note_documents(apps):
+    StudentNote = apps.get_model("course", "StudentNote")
+    rows = StudentNote.objects.values("id", "author_id", "title", "content", "text", "note_type", "tags")
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        plain = _plain_text(row["content"] or row["text"])
+        # note_type 也被用來保存 course_v2:<uuid> 關聯，這種值不列入索引
+        note_type = "" if row["note_type"].startswith("course_v2:") else row["note_type"]
+        body = " ".join(filter(None, [plain, row["tags"], note_type]))
+        yield "note", row["id"], row["author_id"], row["title"] or plain[:50], body
+
+
+def backfill_documents(apps, schema_editor):
+    """為既有課程、作業、筆記建立索引（SQLite 由 trigger 同步寫入 FTS5）"""
+    SearchDocument = apps.get_model("api_v2", "SearchDocument")
+    for source in (_course_documents, _assignment_documents, _note_documents):
+        batch = []
+        for doc_type, object_id, user_id, title, body in source(apps):
+            batch.append(SearchDocument(
+                doc_type=doc_type,
+                object_id=object_id,
+                user_id=user_id,
+                title=title[:255],
+                body=body,
+                title_tokens=" ".join(_tokenize(title)),
+                body_tokens=" ".join(_tokenize(body)),
+            ))
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                SearchDocument.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            SearchDocument.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_lineprofile_email_alter_lineprofile_extra_and_more'),
+        ('api_v2', '0004_userdashboardsummary'),
+        ('course', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('course', '課程'), ('assignment', '作業'), ('note', '筆記')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('title_tokens', models.TextField(blank=True, default='')),
+                ('body_tokens', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='user.lineprofile')),
+            ],
+            options={
+                'db_table': 'api_v2_searchdocument',
+                'indexes': [models.Index(fields=['user', 'doc_type'], name='api_v2_sear_user_type_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('doc_type', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_fulltext, drop_fulltext),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0005_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableExtractionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_sha256', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('items', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'api_v2_timetableextractioncache',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timetableextractioncache',
+            constraint=models.UniqueConstraint(fields=('image_sha256', 'model_name', 'prompt_version'), name='unique_timetable_extraction'),
+        ),
+        migrations.AddIndex(
+            model_name='timetableextractioncache',
+            index=models.Index(fields=['expires_at'], name='api_v2_ttex_expires_idx'),
+        ),
+    ]
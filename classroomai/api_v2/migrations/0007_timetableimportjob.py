@@ -0,0 +1,47 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_lineprofile_email_alter_lineprofile_extra_and_more'),
+        ('api_v2', '0006_timetableextractioncache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '解析中'), ('completed', '已完成'), ('failed', '失敗'), ('confirmed', '已匯入')], default='pending', max_length=10)),
+                ('image', models.FileField(blank=True, upload_to='timetable_imports/%Y/%m/')),
+                ('notify', models.BooleanField(default=False)),
+                ('items', models.JSONField(default=list)),
+                ('preview', models.JSONField(default=list)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('cached', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timetable_import_jobs', to='user.lineprofile')),
+            ],
+            options={
+                'db_table': 'api_v2_timetableimportjob',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timetableimportjob',
+            index=models.Index(fields=['user', 'created_at'], name='api_v2_ttij_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetableimportjob',
+            index=models.Index(fields=['status', 'created_at'], name='api_v2_ttij_status_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0007_timetableimportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100)),
+                ('text_sha256', models.CharField(max_length=64)),
+                ('vector', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'api_v2_embeddingcache',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='embeddingcache',
+            constraint=models.UniqueConstraint(fields=('model_name', 'text_sha256'), name='unique_embedding_cache'),
+        ),
+    ]
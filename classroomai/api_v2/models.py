@@ -313,3 +313,146 @@ class AssignmentStatus(models.Model):
         return f"{self.line_user_id} - {self.assignment.title} ({self.get_status_display()})"
 
 
+class UserDashboardSummary(models.Model):
+    """
+    使用者儀表板統計（物化資料）
+    由 CourseV2 / AssignmentV2 的 signals 增量維護，首次讀取時以聚合查詢建立
+    """
+    user = models.OneToOneField(LineProfile, primary_key=True, on_delete=models.CASCADE, related_name='dashboard_summary')
+    courses_local = models.IntegerField(default=0)
+    courses_mirror = models.IntegerField(default=0)
+    assignments_local = models.IntegerField(default=0)
+    assignments_mirror = models.IntegerField(default=0)
+    assignments_pending = models.IntegerField(default=0)
+    assignments_completed = models.IntegerField(default=0)
+    assignments_overdue = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'api_v2_userdashboardsummary'
+
+    def __str__(self):
+        return f"summary:{self.user_id}"
+
+
+class SearchDocument(models.Model):
+    """
+    全文搜尋索引文件（課程、作業、筆記）
+    由 signals 維護；*_tokens 為已斷詞（中文二元組 + 英數字詞）並以空白分隔的內容
+    MySQL 另有 ngram FULLTEXT 索引、SQLite 另有 FTS5 虛擬表（見 migration 0005）
+    """
+    DOC_TYPE_CHOICES = [
+        ('course', '課程'),
+        ('assignment', '作業'),
+        ('note', '筆記'),
+    ]
+
+    user = models.ForeignKey(LineProfile, on_delete=models.CASCADE, related_name='search_documents')
+    doc_type = models.CharField(max_length=20, choices=DOC_TYPE_CHOICES)
+    object_id = models.UUIDField()
+    title = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    title_tokens = models.TextField(blank=True, default='')
+    body_tokens = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'api_v2_searchdocument'
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'object_id'], name='unique_search_document'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'doc_type'], name='api_v2_sear_user_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.object_id}"
+
+
+class TimetableExtractionCache(models.Model):
+    """
+    課表圖片解析結果快取（以內容定址，不分使用者）
+    鍵為圖片 SHA-256 + 模型名稱 + 提示詞版本；預覽、dryRun 與正式匯入共用同一次模型呼叫
+    """
+    image_sha256 = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=20)
+    items = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'api_v2_timetableextractioncache'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['image_sha256', 'model_name', 'prompt_version'], name='unique_timetable_extraction'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='api_v2_ttex_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.image_sha256[:12]}:{self.model_name}:{self.prompt_version}"
+
+
+class TimetableImportJob(models.Model):
+    """
+    課表圖片非同步匯入工作
+    - image: 上傳的圖片，解析完成後刪除
+    - items: 模型解析出的課程；preview: 附帶衝突資訊的課程（與 preview=true 回應相同）
+    - result: confirm 後的匯入結果
+    confirm_timetable_import 帶 jobId 時直接使用 items，不需重新解析
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '解析中'),
+        ('completed', '已完成'),
+        ('failed', '失敗'),
+        ('confirmed', '已匯入'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(LineProfile, on_delete=models.CASCADE, related_name='timetable_import_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    image = models.FileField(upload_to='timetable_imports/%Y/%m/', blank=True)
+    notify = models.BooleanField(default=False)
+    items = models.JSONField(default=list)
+    preview = models.JSONField(default=list)
+    result = models.JSONField(default=dict, blank=True)
+    cached = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'api_v2_timetableimportjob'
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='api_v2_ttij_user_idx'),
+            models.Index(fields=['status', 'created_at'], name='api_v2_ttij_status_idx'),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.job_id} - {self.status}"
+
+
+class EmbeddingCache(models.Model):
+    """
+    文字嵌入向量快取（跨請求、跨 worker 共用）
+    鍵為 (模型名稱, 文字 SHA-256)，相同文字不會重複向模型請求嵌入
+    """
+    model_name = models.CharField(max_length=100)
+    text_sha256 = models.CharField(max_length=64)
+    vector = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'api_v2_embeddingcache'
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'text_sha256'], name='unique_embedding_cache'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name}:{self.text_sha256[:12]}"
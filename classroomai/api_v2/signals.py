@@ -0,0 +1,86 @@
+"""
+API V2 signals
+維護 UserDashboardSummary 物化統計與全文搜尋索引（SearchDocument）
+"""
+import logging
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from course.models import StudentNote
+from services.dashboard_summary_service import DashboardSummaryService
+from services.search_service import SearchService
+from .models import CourseV2, AssignmentV2
+
+logger = logging.getLogger(__name__)
+
+COURSE_FIELDS = ('user_id', 'is_google_classroom')
+ASSIGNMENT_FIELDS = ('user_id', 'google_coursework_id', 'status')
+
+
+def _state(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _previous_state(sender, instance, fields):
+    # UUID 主鍵在建立前就有值，需以 _state.adding 判斷是否為新增
+    if instance._state.adding:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=CourseV2)
+def remember_course_state(sender, instance, **kwargs):
+    instance._summary_previous = _previous_state(sender, instance, COURSE_FIELDS)
+
+
+@receiver(post_save, sender=CourseV2)
+def update_summary_on_course_save(sender, instance, **kwargs):
+    DashboardSummaryService.course_changed(
+        getattr(instance, '_summary_previous', None), _state(instance, COURSE_FIELDS)
+    )
+
+
+@receiver(post_delete, sender=CourseV2)
+def update_summary_on_course_delete(sender, instance, **kwargs):
+    DashboardSummaryService.course_changed(_state(instance, COURSE_FIELDS), None)
+
+
+@receiver(pre_save, sender=AssignmentV2)
+def remember_assignment_state(sender, instance, **kwargs):
+    instance._summary_previous = _previous_state(sender, instance, ASSIGNMENT_FIELDS)
+
+
+@receiver(post_save, sender=AssignmentV2)
+def update_summary_on_assignment_save(sender, instance, **kwargs):
+    DashboardSummaryService.assignment_changed(
+        getattr(instance, '_summary_previous', None), _state(instance, ASSIGNMENT_FIELDS)
+    )
+
+
+@receiver(post_delete, sender=AssignmentV2)
+def update_summary_on_assignment_delete(sender, instance, **kwargs):
+    DashboardSummaryService.assignment_changed(_state(instance, ASSIGNMENT_FIELDS), None)
+
+
+# ── 全文搜尋索引 ─────────────────────────────────────────────
+
+@receiver(post_save, sender=CourseV2)
+@receiver(post_save, sender=AssignmentV2)
+@receiver(post_save, sender=StudentNote)
+def update_search_index(sender, instance, **kwargs):
+    # 索引失敗不影響原本的寫入，之後可用 rebuild_search_index 補建
+    try:
+        SearchService.index(instance)
+    except Exception as e:
+        logger.error(f"Failed to index {sender.__name__} {instance.pk}: {str(e)}")
+
+
+@receiver(post_delete, sender=CourseV2)
+@receiver(post_delete, sender=AssignmentV2)
+@receiver(post_delete, sender=StudentNote)
+def remove_search_index(sender, instance, **kwargs):
+    try:
+        SearchService.remove(instance)
+    except Exception as e:
+        logger.error(f"Failed to remove {sender.__name__} {instance.pk} from search index: {str(e)}")
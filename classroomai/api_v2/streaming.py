@@ -0,0 +1,67 @@
+"""
+串流 JSON 輸出
+逐筆編碼列表資料並以 StreamingHttpResponse 回傳，記憶體用量與首位元組時間不隨筆數增加
+有安裝 orjson 時使用 orjson，否則退回標準 json
+"""
+import json
+import logging
+from typing import Callable, Iterable, Iterator, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 為選用套件
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 累積到此大小才送出一段，避免每筆資料都觸發一次寫出
+FLUSH_BYTES = 32 * 1024
+
+
+def dumps(obj) -> bytes:
+    """編碼為 UTF-8 JSON bytes（非 ASCII 字元不跳脫，與 DRF JSONRenderer 相同）"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def iter_json_array(items: Iterable, on_complete: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+    """
+    將可迭代物件逐筆編碼為 JSON 陣列片段
+
+    Args:
+        items: 要輸出的資料（可為 generator）
+        on_complete: 全部輸出後以總筆數呼叫（記錄日誌用）
+    """
+    buffer = bytearray(b'[')
+    count = 0
+    try:
+        for item in items:
+            if count:
+                buffer += b','
+            buffer += dumps(item)
+            count += 1
+            if len(buffer) >= FLUSH_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+    except Exception as e:
+        # 回應標頭已送出，無法改回錯誤狀態碼；中斷連線讓用戶端收到不完整的 JSON 而非看似完整的部分資料
+        logger.error(f"Error while streaming JSON array after {count} items: {str(e)}")
+        raise
+    buffer += b']'
+    yield bytes(buffer)
+    if on_complete is not None:
+        on_complete(count)
+
+
+def streaming_json_response(items: Iterable, status: int = 200,
+                            on_complete: Optional[Callable[[int], None]] = None) -> StreamingHttpResponse:
+    """以 JSON 陣列串流回傳 items"""
+    return StreamingHttpResponse(
+        iter_json_array(items, on_complete=on_complete),
+        status=status,
+        content_type='application/json',
+    )
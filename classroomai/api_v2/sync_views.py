@@ -12,7 +12,7 @@ from django.utils import timezone
 from user.models import LineProfile
 from services.classroom_sync_service import ClassroomSyncService, ClassroomSyncError
 from services.auto_sync_trigger import AutoSyncTrigger, SyncNotificationService
-from services.error_handler import handle_api_errors, rate_limit
+from services.error_handler import handle_api_errors, rate_limit, google_api_breakers
 
 from services.preview_sync_service import PreviewSyncService
 
@@ -159,7 +159,7 @@ def preview_sync_all(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @handle_api_errors
-@rate_limit(limit=5, window=300)  # 每5分鐘最多5次確認匯入
+@rate_limit(limit=5, window=300, tiers={'teacher': (10, 300)})  # 每5分鐘最多5次確認匯入（教師10次）
 def confirm_import(request):
     """
     確認匯入選擇的 Google Classroom 項目到資料庫
@@ -316,7 +316,7 @@ def confirm_import(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @handle_api_errors
-@rate_limit(limit=5, window=300)  # 每5分鐘最多5次統一同步
+@rate_limit(limit=5, window=300, tiers={'teacher': (10, 300)})  # 每5分鐘最多5次統一同步（教師10次）
 def manual_sync_all(request):
     """
     手動同步所有 Google 服務（Classroom + Calendar）
@@ -408,7 +408,7 @@ def manual_sync_all(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @handle_api_errors
-@rate_limit(limit=30, window=300)  # 每5分鐘最多30次單一課程同步
+@rate_limit(limit=30, window=300, tiers={'teacher': (60, 300)})  # 每5分鐘最多30次單一課程同步（教師60次）
 def sync_classroom_course(request):
     """
     同步單一 Google Classroom 課程的作業
@@ -674,6 +674,7 @@ def check_google_api_status(request):
             "data": {
                 "quota_status": quota_status,
                 "permission_status": permission_status,
+                "circuit_breakers": google_api_breakers.snapshot(),
                 "user_id": line_user_id,
                 "check_time": timezone.now().isoformat()
             }
@@ -685,4 +686,4 @@ def check_google_api_status(request):
             "error": "sync_service_error",
             "message": str(e),
             "code": "SYNC_SERVICE_INIT_FAILED"
-        }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
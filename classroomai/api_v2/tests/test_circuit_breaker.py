@@ -0,0 +1,160 @@
+"""
+Google API 斷路器（CircuitBreakerRegistry / retry_on_error）測試
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from googleapiclient.errors import HttpError
+from httplib2 import Response as HttpResponse
+
+from services.error_handler import CircuitBreakerRegistry, GoogleAPIUnavailable, retry_on_error
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'breaker-tests'}}
+BREAKER = {'threshold': 2, 'window': 60, 'cooldown': 30}
+
+
+def http_error(status: int, content: bytes = b'{}', retry_after: str = None) -> HttpError:
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = retry_after
+    return HttpError(HttpResponse(headers), content)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GOOGLE_API_BREAKER=BREAKER)
+class BreakerTestCase(SimpleTestCase):
+    """以可控制的時鐘執行，重試等待不實際 sleep"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        for target, kwargs in (
+            ('services.error_handler.time.time', {'side_effect': lambda: self.now}),
+            ('services.error_handler.time.sleep', {}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breakers = CircuitBreakerRegistry()
+        patcher = mock.patch('services.error_handler.google_api_breakers', self.breakers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_breaker(self, endpoint: str = 'ep') -> None:
+        for _ in range(BREAKER['threshold']):
+            self.breakers.record_failure(endpoint)
+
+
+class CircuitBreakerStateTests(BreakerTestCase):
+
+    def test_closed_until_threshold(self):
+        self.assertFalse(self.breakers.record_failure('ep'))
+        self.assertEqual(self.breakers.state('ep')['state'], 'closed')
+        self.breakers.before_call('ep')
+        self.assertTrue(self.breakers.record_failure('ep'))
+        self.assertEqual(self.breakers.state('ep'), {'state': 'open', 'failures': 0, 'retry_after': 30})
+
+    def test_success_resets_failure_count(self):
+        self.breakers.record_failure('ep')
+        self.breakers.record_success('ep')
+        self.assertFalse(self.breakers.record_failure('ep'))
+        self.assertEqual(self.breakers.state('ep')['state'], 'closed')
+
+    def test_open_breaker_rejects_calls(self):
+        self.open_breaker()
+        with self.assertRaises(GoogleAPIUnavailable) as ctx:
+            self.breakers.before_call('ep')
+        self.assertEqual(ctx.exception.retry_after, 30)
+        # 其他端點不受影響
+        self.breakers.before_call('other')
+
+    def test_half_open_allows_single_probe(self):
+        self.open_breaker()
+        self.now += BREAKER['cooldown'] + 1
+        self.assertEqual(self.breakers.state('ep')['state'], 'half_open')
+        self.breakers.before_call('ep')
+        with self.assertRaises(GoogleAPIUnavailable):
+            self.breakers.before_call('ep')
+        # 試探請求自己的重試不需要再取得名額
+        self.breakers.before_call('ep', retrying=True)
+
+    def test_successful_probe_closes_breaker(self):
+        self.open_breaker()
+        self.now += BREAKER['cooldown'] + 1
+        self.breakers.before_call('ep')
+        self.breakers.record_success('ep')
+        self.assertEqual(self.breakers.state('ep')['state'], 'closed')
+        self.breakers.before_call('ep')
+        self.breakers.before_call('ep')
+
+    def test_failed_probe_reopens_breaker(self):
+        self.open_breaker()
+        self.now += BREAKER['cooldown'] + 1
+        self.breakers.before_call('ep')
+        self.assertTrue(self.breakers.record_failure('ep'))
+        self.assertEqual(self.breakers.state('ep')['state'], 'open')
+        with self.assertRaises(GoogleAPIUnavailable):
+            self.breakers.before_call('ep')
+
+
+class RetryOnErrorBreakerTests(BreakerTestCase):
+
+    def failing(self, error, max_retries: int = 3):
+        calls = []
+
+        @retry_on_error(max_retries=max_retries, endpoint='ep')
+        def call():
+            calls.append(1)
+            raise error
+
+        return call, calls
+
+    def test_counts_one_failure_per_exhausted_call(self):
+        call, calls = self.failing(http_error(503))
+        with self.assertRaises(HttpError):
+            call()
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(self.breakers.state('ep'), {'state': 'closed', 'failures': 1, 'retry_after': 0})
+        with self.assertRaises(HttpError):
+            call()
+        self.assertEqual(self.breakers.state('ep')['state'], 'open')
+        with self.assertRaises(GoogleAPIUnavailable):
+            call()
+        self.assertEqual(len(calls), 8)
+
+    def test_user_quota_errors_do_not_open_breaker(self):
+        body = b'{"error": {"code": 429, "errors": [{"reason": "userRateLimitExceeded"}]}}'
+        call, calls = self.failing(http_error(429, body))
+        for _ in range(BREAKER['threshold'] + 1):
+            with self.assertRaises(HttpError):
+                call()
+        self.assertEqual(len(calls), 4 * (BREAKER['threshold'] + 1))
+        self.assertEqual(self.breakers.state('ep'), {'state': 'closed', 'failures': 0, 'retry_after': 0})
+
+    def test_long_retry_after_trips_breaker(self):
+        call, calls = self.failing(http_error(503, retry_after='120'))
+        with self.assertRaises(HttpError):
+            call()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.breakers.state('ep'), {'state': 'open', 'failures': 0, 'retry_after': 120})
+
+    def test_client_errors_do_not_count(self):
+        self.breakers.record_failure('ep')
+        call, calls = self.failing(http_error(404))
+        with self.assertRaises(HttpError):
+            call()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.breakers.state('ep')['failures'], 0)
+
+    def test_recovers_after_transient_errors(self):
+        responses = [http_error(503), http_error(502), 'ok']
+
+        @retry_on_error(max_retries=3, endpoint='ep')
+        def call():
+            result = responses.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.assertEqual(call(), 'ok')
+        self.assertEqual(self.breakers.state('ep'), {'state': 'closed', 'failures': 0, 'retry_after': 0})
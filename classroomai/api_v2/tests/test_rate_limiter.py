@@ -0,0 +1,143 @@
+"""
+滑動視窗速率限制器（RateLimiter / rate_limit）測試
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from services.error_handler import RateLimiter, rate_limit
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limiter-tests'}}
+WINDOW = 60
+# 固定視窗的起點，方便計算經過時間
+WINDOW_START = 1000 * WINDOW
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimiterTestCase(SimpleTestCase):
+    """以可控制的時鐘執行（LocMemCache 的 TTL 也使用同一個時鐘）"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = float(WINDOW_START)
+        patcher = mock.patch('services.error_handler.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter()
+
+    def hits(self, key: str, count: int, limit: int = 3):
+        return [self.limiter.hit(key, limit, WINDOW) for _ in range(count)]
+
+
+class RateLimiterHitTests(RateLimiterTestCase):
+
+    def test_allows_up_to_limit(self):
+        self.assertEqual([allowed for allowed, _ in self.hits('u', 3)], [True, True, True])
+        allowed, retry_after = self.limiter.hit('u', 3, WINDOW)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0)
+
+    def test_rejected_hits_are_not_counted(self):
+        self.hits('u', 3)
+        for _ in range(10):
+            self.assertFalse(self.limiter.hit('u', 3, WINDOW)[0])
+        self.assertEqual(cache.get(f'ratelimit:u:{WINDOW}:{WINDOW_START // WINDOW}'), 3)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        self.hits('u', 3)
+        # 下一視窗過了一半：上一視窗 3 次以 0.5 計 → 1.5 + 1 <= 3
+        self.now = WINDOW_START + WINDOW * 1.5
+        self.assertTrue(self.limiter.hit('u', 3, WINDOW)[0])
+        # 1.5 + 2 > 3
+        self.assertFalse(self.limiter.hit('u', 3, WINDOW)[0])
+
+    def test_retry_after_within_window(self):
+        self.hits('u', 3)
+        self.now = WINDOW_START + WINDOW * 1.5
+        self.hits('u', 1)
+        allowed, retry_after = self.limiter.hit('u', 3, WINDOW)
+        self.assertFalse(allowed)
+        # 需等到上一視窗權重降到 1/3（經過 40 秒）才能再放行
+        self.assertEqual(retry_after, 10)
+        self.now += retry_after - 1
+        self.assertFalse(self.limiter.hit('u', 3, WINDOW)[0])
+        self.now += 1
+        self.assertTrue(self.limiter.hit('u', 3, WINDOW)[0])
+
+    def test_retry_after_when_current_window_is_full(self):
+        self.hits('u', 3)
+        allowed, retry_after = self.limiter.hit('u', 3, WINDOW)
+        self.assertFalse(allowed)
+        # 本視窗已滿：等到下一視窗且本視窗 3 次的權重降到 2/3 以下
+        self.assertEqual(retry_after, 80)
+        self.now += retry_after - 1
+        self.assertFalse(self.limiter.hit('u', 3, WINDOW)[0])
+        self.now += 1
+        self.assertTrue(self.limiter.hit('u', 3, WINDOW)[0])
+
+    def test_recovers_after_two_windows(self):
+        self.hits('u', 3)
+        self.assertFalse(self.limiter.hit('u', 3, WINDOW)[0])
+        self.now = WINDOW_START + WINDOW * 2
+        self.assertEqual([allowed for allowed, _ in self.hits('u', 3)], [True, True, True])
+
+    def test_keys_are_independent(self):
+        self.hits('u1', 3)
+        self.assertFalse(self.limiter.hit('u1', 3, WINDOW)[0])
+        self.assertTrue(self.limiter.hit('u2', 3, WINDOW)[0])
+
+
+class RateLimitDecoratorTests(RateLimiterTestCase):
+
+    def setUp(self):
+        super().setUp()
+        limiter_patcher = mock.patch('services.error_handler.rate_limiter', self.limiter)
+        limiter_patcher.start()
+        self.addCleanup(limiter_patcher.stop)
+        # 角色預先寫入快取，不需查詢資料庫
+        cache.set('ratelimit:role:teacher-1', 'teacher')
+        cache.set('ratelimit:role:student-1', 'student')
+
+    @staticmethod
+    def request(line_user_id: str):
+        return SimpleNamespace(data={'line_user_id': line_user_id}, GET={})
+
+    @staticmethod
+    def view(**kwargs):
+        @rate_limit(**kwargs)
+        def handler(request):
+            return 'ok'
+        return handler
+
+    def test_returns_429_with_retry_after_header(self):
+        handler = self.view(limit=1, window=WINDOW)
+        self.assertEqual(handler(self.request('student-1')), 'ok')
+        response = handler(self.request('student-1'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(response.data['retry_after']))
+
+    def test_tier_overrides_limit_by_role(self):
+        handler = self.view(limit=3, window=WINDOW, tiers={'teacher': (1, WINDOW)})
+        self.assertEqual(handler(self.request('teacher-1')), 'ok')
+        self.assertEqual(handler(self.request('teacher-1')).status_code, 429)
+        self.assertEqual([handler(self.request('student-1')) for _ in range(3)], ['ok'] * 3)
+        self.assertEqual(handler(self.request('student-1')).status_code, 429)
+
+    def test_routes_are_scoped_separately(self):
+        first = self.view(limit=1, window=WINDOW)
+        second = self.view(limit=1, window=WINDOW, scope='second')
+        self.assertEqual(first(self.request('student-1')), 'ok')
+        self.assertEqual(second(self.request('student-1')), 'ok')
+        self.assertEqual(first(self.request('student-1')).status_code, 429)
+
+    def test_shared_scope_shares_counter(self):
+        first = self.view(limit=1, window=WINDOW, scope='shared')
+        second = self.view(limit=1, window=WINDOW, scope='shared')
+        self.assertEqual(first(self.request('student-1')), 'ok')
+        self.assertEqual(second(self.request('student-1')).status_code, 429)
+
+    def test_requests_without_key_are_not_limited(self):
+        handler = self.view(limit=1, window=WINDOW)
+        self.assertEqual([handler(self.request('')) for _ in range(3)], ['ok'] * 3)
@@ -0,0 +1,164 @@
+"""
+課表匯入時段衝突檢查（IntervalTree / ScheduleConflictEngine）測試
+"""
+import random
+from datetime import time as dt_time
+
+from django.test import SimpleTestCase
+
+from services.course_import_service import IntervalTree, ScheduleConflictEngine, parse_slots
+
+
+def t(value: str) -> dt_time:
+    hour, minute = value.split(':')
+    return dt_time(int(hour), int(minute))
+
+
+def existing_slot(day: int, start: str, end: str, title: str) -> dict:
+    return {
+        'day_of_week': day,
+        'start_time': t(start),
+        'end_time': t(end),
+        'conflicting_course': {'id': title, 'title': title, 'source': 'existing'},
+    }
+
+
+def import_item(title: str, *slots) -> dict:
+    return {
+        'title': title,
+        'schedule': [{'day_of_week': day, 'start': start, 'end': end} for day, start, end in slots],
+    }
+
+
+class IntervalTreeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tree = IntervalTree([
+            (t('08:00'), t('10:00'), 'A'),
+            (t('10:00'), t('12:00'), 'B'),
+            (t('13:00'), t('15:00'), 'C'),
+        ])
+
+    def test_touching_intervals_do_not_overlap(self):
+        self.assertEqual(self.tree.overlapping(t('12:00'), t('13:00')), [])
+        self.assertEqual(self.tree.overlapping(t('07:00'), t('08:00')), [])
+        self.assertEqual(self.tree.overlapping(t('15:00'), t('16:00')), [])
+
+    def test_partial_overlap(self):
+        self.assertEqual(sorted(self.tree.overlapping(t('09:30'), t('10:30'))), ['A', 'B'])
+        self.assertEqual(self.tree.overlapping(t('14:59'), t('16:00')), ['C'])
+
+    def test_containment(self):
+        self.assertEqual(self.tree.overlapping(t('08:30'), t('09:00')), ['A'])
+        self.assertEqual(sorted(self.tree.overlapping(t('07:00'), t('16:00'))), ['A', 'B', 'C'])
+
+    def test_insert_after_build(self):
+        self.tree.insert(t('12:00'), t('13:00'), 'D')
+        self.assertEqual(self.tree.overlapping(t('12:30'), t('12:45')), ['D'])
+        self.assertEqual(sorted(self.tree.overlapping(t('11:59'), t('13:01'))), ['B', 'C', 'D'])
+
+    def test_empty_tree(self):
+        tree = IntervalTree()
+        self.assertEqual(tree.overlapping(t('08:00'), t('09:00')), [])
+        tree.insert(t('08:00'), t('09:00'), 'A')
+        self.assertEqual(tree.overlapping(t('08:30'), t('10:00')), ['A'])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(1)
+
+        def random_interval():
+            start = rng.randrange(0, 23 * 60)
+            end = rng.randrange(start + 1, 24 * 60)
+            return dt_time(start // 60, start % 60), dt_time(end // 60, end % 60)
+
+        intervals = [(*random_interval(), index) for index in range(200)]
+        tree = IntervalTree(intervals[:150])
+        for start, end, index in intervals[150:]:
+            tree.insert(start, end, index)
+
+        for _ in range(500):
+            start, end = random_interval()
+            expected = sorted(i for s, e, i in intervals if start < e and end > s)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+
+class ParseSlotsTests(SimpleTestCase):
+
+    def test_skips_malformed_slots(self):
+        slots = parse_slots([
+            {'day_of_week': 1, 'start': '08:00', 'end': '10:00'},
+            {'day_of_week': 7, 'start': '08:00', 'end': '10:00'},
+            {'day_of_week': 'x', 'start': '08:00', 'end': '10:00'},
+            {'day_of_week': 2, 'start': '25:00', 'end': '26:00'},
+            {'day_of_week': 3, 'start': '', 'end': '10:00'},
+            {'start': '08:00', 'end': '10:00'},
+        ])
+        self.assertEqual(slots, [(1, t('08:00'), t('10:00'), '08:00', '10:00')])
+
+    def test_empty_schedule(self):
+        self.assertEqual(parse_slots(None), [])
+        self.assertEqual(parse_slots([]), [])
+
+
+class ScheduleConflictEngineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.engine = ScheduleConflictEngine([
+            existing_slot(1, '08:00', '10:00', 'existing-mon'),
+            existing_slot(3, '13:00', '15:00', 'existing-wed'),
+        ])
+
+    def test_touching_existing_slot_is_not_conflict(self):
+        planned = self.engine.plan([import_item('after', (1, '10:00', '12:00'))])
+        self.assertEqual(planned[0]['conflicts'], [])
+
+    def test_conflict_with_existing_course(self):
+        planned = self.engine.plan([import_item('overlap', (1, '09:00', '11:00'))])
+        conflicts = planned[0]['conflicts']
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0]['day_of_week'], 1)
+        self.assertEqual(conflicts[0]['start_time'], '09:00')
+        self.assertEqual(conflicts[0]['end_time'], '11:00')
+        self.assertEqual(conflicts[0]['conflicting_course']['title'], 'existing-mon')
+
+    def test_same_time_on_different_day_is_not_conflict(self):
+        planned = self.engine.plan([import_item('tuesday', (2, '08:00', '10:00'))])
+        self.assertEqual(planned[0]['conflicts'], [])
+
+    def test_conflict_within_same_batch(self):
+        planned = self.engine.plan([
+            import_item('first', (5, '08:00', '10:00')),
+            import_item('second', (5, '09:00', '09:30')),
+        ])
+        self.assertEqual(planned[0]['conflicts'], [])
+        conflicts = planned[1]['conflicts']
+        self.assertEqual(len(conflicts), 1)
+        course = conflicts[0]['conflicting_course']
+        self.assertEqual(course['source'], 'import')
+        self.assertEqual(course['import_index'], 0)
+        self.assertEqual(course['title'], 'first')
+
+    def test_touching_within_same_batch_is_not_conflict(self):
+        planned = self.engine.plan([
+            import_item('first', (5, '08:00', '10:00')),
+            import_item('second', (5, '10:00', '12:00')),
+        ])
+        self.assertEqual([p['conflicts'] for p in planned], [[], []])
+
+    def test_rejected_item_does_not_block_later_items(self):
+        planned = self.engine.plan([
+            # 與既有課程衝突，不會被接受
+            import_item('rejected', (1, '09:00', '12:00')),
+            # 只與被拒絕的項目重疊
+            import_item('later', (1, '10:00', '12:00')),
+        ])
+        self.assertEqual(len(planned[0]['conflicts']), 1)
+        self.assertEqual(planned[1]['conflicts'], [])
+
+    def test_multiple_slots_report_each_conflict(self):
+        planned = self.engine.plan([
+            import_item('two-slots', (1, '07:00', '08:30'), (3, '14:00', '16:00'), (4, '08:00', '09:00')),
+        ])
+        titles = sorted(c['conflicting_course']['title'] for c in planned[0]['conflicts'])
+        self.assertEqual(titles, ['existing-mon', 'existing-wed'])
+        self.assertEqual(len(planned[0]['slots']), 3)
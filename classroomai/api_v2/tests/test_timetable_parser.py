@@ -0,0 +1,60 @@
+"""
+課表文字解析測試：預先編譯 regex 後的實作需與舊版輸出完全一致
+"""
+import random
+
+from django.test import SimpleTestCase
+
+from services.importers import parse_course_from_text, parse_multiple_courses_from_timetable
+
+from . import legacy_timetable_parser as legacy
+
+TOKENS = [
+    '週一', '星期三', '二', '五', 'Monday', 'Friday', '日', '節次', '第一節', '第',
+    '08:10-09:00', '10:10~12:00', '13:10',
+    '人工智慧應用', '網頁設計', '資訊安全', '資料庫管理', '微積分', '英文',
+    '蔡文隆P', '許晉龍', '電708(承曦樓)', '教101', '101教室', '實驗室2', '藝201',
+    '  ', 'P', '401', '-',
+    '星期一 08:10-10:00 人工智慧應用 電708 蔡文隆P',
+]
+
+
+def random_timetables(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        lines = [
+            ' '.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 25))
+        ]
+        yield '\n'.join(lines)
+
+
+class TimetableParserParityTests(SimpleTestCase):
+
+    def test_multiple_courses_match_legacy(self):
+        for text in random_timetables(3000):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    parse_multiple_courses_from_timetable(text),
+                    legacy.parse_multiple_courses_from_timetable(text),
+                )
+
+    def test_single_course_matches_legacy(self):
+        for text in random_timetables(3000):
+            with self.subTest(text=text):
+                self.assertEqual(parse_course_from_text(text), legacy.parse_course_from_text(text))
+
+    def test_known_timetables(self):
+        samples = [
+            '節次 星期一 星期二 星期三\n第一節\n08:10-09:00\n人工智慧應用\n蔡文隆P\n電708(承曦樓)',
+            '星期一 08:10-10:00 人工智慧應用 電708 蔡文隆P\n週三\n10:10~12:00 網頁設計 教101 許晉龍',
+            '課程名稱：網頁設計\n教師：許晉龍\n教室：教101\n說明：期末專題',
+            '',
+        ]
+        for text in samples:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    parse_multiple_courses_from_timetable(text),
+                    legacy.parse_multiple_courses_from_timetable(text),
+                )
+                self.assertEqual(parse_course_from_text(text), legacy.parse_course_from_text(text))
@@ -79,6 +79,7 @@ urlpatterns = [
     path('integrated/assignments/', integrated_views.get_integrated_assignments, name='get_integrated_assignments'),
     path('integrated/summary/', integrated_views.get_course_summary, name='get_course_summary'),
     path('integrated/search/', integrated_views.search_courses_and_assignments, name='search_courses_and_assignments'),
+    path('integrated/search/all/', integrated_views.unified_search, name='unified_search'),
     path('integrated/dashboard/', integrated_views.get_dashboard_data, name='get_dashboard_data'),
     
     # n8n 工作流整合 API
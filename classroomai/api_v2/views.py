@@ -6,17 +6,19 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from django.conf import settings
 from django.db import connection
 from django.http import JsonResponse
 from datetime import timedelta, datetime
+import hmac
 import uuid
 import os
 import traceback
 import time
 import sys
-from .models import CourseV2, CourseScheduleV2, AssignmentV2, ExamV2, NoteV2, FileAttachment, CustomCategory, CustomTodoItem
+from .models import CourseV2, AssignmentV2, ExamV2, NoteV2, FileAttachment, CustomCategory, CustomTodoItem
 from .serializers import (
     CourseSerializer,
     AssignmentSerializer,
@@ -29,7 +31,12 @@ from .serializers import (
 from user.models import LineProfile
 from .authentication import LineUserAuthentication
 from services.recommendation import build_query, fetch_candidates, rerank, diversify_by_source, fallback_learning_resources
-from services.importers import parse_courses_csv, parse_courses_ical, parse_courses_xlsx, parse_courses_xls
+from services.search_service import SearchService
+from services.course_import_service import CourseImportService
+from services.timetable_extraction_service import TimetableExtractionService
+from services.timetable_import_job_service import TimetableImportJobService, TimetableImportJobStateError
+from services.note_summary_service import NoteSummaryService, BATCH_MAX_NOTES
+from services.importers import iter_courses
 
 
 class ServiceHealthChecker:
@@ -116,6 +123,11 @@ class HealthCheckView(APIView):
         
         # Google API 檢查
         health_status['checks']['google_api'] = ServiceHealthChecker.check_google_api()
+
+        # 各呼叫位置的 LLM 呼叫統計（本行程），屬內部資訊，只提供給帶 INTERNAL_API_TOKEN 的請求
+        if self.has_internal_token(request):
+            from services.llm_clients import llm_metrics
+            health_status['llm_calls'] = llm_metrics.snapshot()
         
         # 整體狀態評估
         overall_status = self.evaluate_overall_health(health_status['checks'])
@@ -126,6 +138,15 @@ class HealthCheckView(APIView):
         
         return Response(health_status, status=status_code)
     
+    @staticmethod
+    def has_internal_token(request) -> bool:
+        """檢查 X-Internal-Token 是否與 INTERNAL_API_TOKEN 相符（常數時間比較，未設定時一律拒絕）"""
+        internal_token = getattr(settings, 'INTERNAL_API_TOKEN', None)
+        provided = request.headers.get('X-Internal-Token')
+        if not internal_token or not provided:
+            return False
+        return hmac.compare_digest(provided.encode('utf-8'), internal_token.encode('utf-8'))
+
     def evaluate_overall_health(self, checks):
         """評估整體健康狀態"""
         critical_unhealthy_count = 0
@@ -596,8 +617,8 @@ class CourseViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
     serializer_class = CourseSerializer
     permission_classes = []  # 簡化權限檢查
     authentication_classes = []  # 使用現有的 LINE 認證
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'instructor', 'classroom']
+    # search 參數改由全文索引處理（見 list）
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['title', 'created_at', 'updated_at']
     ordering = ['-created_at']
 
@@ -744,11 +765,9 @@ class CourseViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
         to_date = request.query_params.get('to', None)
         
         if search:
+            line_profile = self.get_line_profile()
             queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(instructor__icontains=search) |
-                Q(classroom__icontains=search)
+                id__in=SearchService.matching_ids(line_profile.line_user_id, search, 'course') if line_profile else []
             )
             
         if from_date:
@@ -919,8 +938,8 @@ class AssignmentViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
     serializer_class = AssignmentSerializer
     permission_classes = []  # 簡化權限檢查
     authentication_classes = []  # 使用現有的 LINE 認證
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description']
+    # search 參數改由全文索引處理（見 get_queryset）
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['due_date', 'created_at', 'updated_at']
     ordering = ['due_date']
 
@@ -960,8 +979,7 @@ class AssignmentViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
             
         if search:
             queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search)
+                id__in=SearchService.matching_ids(line_profile.line_user_id, search, 'assignment') if line_profile else []
             )
             
         return queryset
@@ -1096,8 +1114,8 @@ class NoteViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
     """
     permission_classes = []  # 簡化權限檢查
     authentication_classes = []  # 使用現有的 LINE 認證
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'content']
+    # search 參數改由全文索引處理（見 get_queryset）
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
 
@@ -1180,8 +1198,7 @@ class NoteViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
             
         if search:
             queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(content__icontains=search)
+                id__in=SearchService.matching_ids(line_profile.line_user_id, search, 'note') if line_profile else []
             )
             
         return queryset
@@ -1240,6 +1257,11 @@ class NoteViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
             raise ValueError("無法獲取LINE用戶資料")
 
         note = serializer.save()
+        # 內容變更時於背景更新 AI 摘要（未產生過摘要的筆記不處理）
+        try:
+            NoteSummaryService.schedule_refresh(note)
+        except Exception as e:
+            print('[perform_update] 排程摘要更新失敗:', e)
 
         # 更新課程關聯邏輯同 create
         course_value = self.request.data.get('course', None)
@@ -1286,45 +1308,37 @@ class NoteViewSet(LineUserViewSetMixin, viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='ai/summary')
     def ai_summary(self, request, pk=None):
+        """筆記 AI 摘要：內容未變更時直接回傳已保存的摘要"""
         from course.models import StudentNote
-        import os, re
-        note = get_object_or_404(StudentNote, pk=pk)
-        # 取純文字：剝除 HTML 標籤
-        html = (note.content or '')
-        text = re.sub(r'<br\s*/?>', '\n', html)
-        text = re.sub(r'<[^>]+>', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        summary = ''
-        keywords = []
-        print(f'[ai_summary] note_id={pk}, text_len={len(text)}, api_key_present={bool(os.getenv("DEEPSEEK") or os.getenv("DEEPSEEK_API_KEY") or os.getenv("DeepSeek_API_KEY"))}')
-        try:
-            import json
-            if os.getenv('DEEPSEEK') or os.getenv('DEEPSEEK_API_KEY') or os.getenv('DeepSeek_API_KEY'):
-                from services.deepseek_client import generate_json  # type: ignore
-                system = '你是摘要助理。請嚴格回傳 JSON，無其他文字、無 Markdown。'
-                prompt = (
-                    '以繁體中文將以下筆記濃縮為 3 個條列重點，並抽取 3-6 個關鍵字。'
-                    '僅輸出 JSON：{"summary":["..."],"keywords":["k1","k2"]}\n\n' + text
-                )
-                raw = generate_json(prompt=prompt, system=system)
-                print(f'[ai_summary] DeepSeek response: {raw[:200]}...')
-                data = json.loads(raw or '{}')
-                summary = '\n'.join(data.get('summary') or [])
-                keywords = data.get('keywords') or []
-                print(f'[ai_summary] parsed summary={summary[:100]}..., keywords={keywords}')
-            else:
-                clean = text
-                summary = clean[:200]
-                words = [w for w in re.split(r'[^\w\u4e00-\u9fa5]+', clean) if len(w) >= 2]
-                from collections import Counter
-                keywords = [w for w,_ in Counter(words).most_common(5)]
-                print(f'[ai_summary] fallback summary={summary[:100]}..., keywords={keywords}')
-        except Exception as e:
-            print('[ai_summary] error:', e)
-            summary = (text or '')[:200]
-            keywords = []
+        note = get_object_or_404(StudentNote.objects.select_related('ai_summary'), pk=pk)
+        result = NoteSummaryService.summarize(note)
+        print(f"[ai_summary] note_id={pk}, cached={result['cached']}, keywords={result['keywords']}")
+        return Response(result)
+
+    @action(detail=False, methods=['post'], url_path='ai/summary/batch')
+    def ai_summary_batch(self, request):
+        """批次筆記摘要（複習頁使用）
+        body: {"ids": [筆記 id, ...]}，最多 50 筆；未產生過或已變更的筆記同時呼叫模型
+        """
+        line_profile = self.get_line_profile()
+        if not line_profile:
+            return Response({'error': '無法獲取LINE用戶資料'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        return Response({'id': str(note.id), 'summary': summary, 'keywords': keywords})
+        ids = request.data.get('ids') or []
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids 必須為非空陣列'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > BATCH_MAX_NOTES:
+            return Response({'error': f'一次最多 {BATCH_MAX_NOTES} 筆'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            notes = {str(note.id): note for note in self.get_queryset().filter(id__in=ids).select_related('ai_summary')}
+        except (ValueError, DjangoValidationError):
+            return Response({'error': 'ids 格式錯誤'}, status=status.HTTP_400_BAD_REQUEST)
+        ordered = [notes[str(i)] for i in ids if str(i) in notes]
+        results = NoteSummaryService.summarize_many(ordered)
+        missing = [str(i) for i in ids if str(i) not in notes]
+        print(f"[ai_summary_batch] requested={len(ids)}, found={len(ordered)}, cached={sum(1 for r in results if r['cached'])}")
+        return Response({'results': results, 'missing': missing})
 
 
 class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
@@ -1412,6 +1426,8 @@ class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
         """匯入課程：支援上傳 CSV 或 iCal 檔案。
         - CSV: 欄位 title/description/instructor/classroom（不區分大小寫）
         - iCal: 取 VEVENT 的 SUMMARY/DESCRIPTION/LOCATION
+        - dryRun: 'true' 時只驗證並回傳結果，不寫入資料庫
+        邊解析邊分批驗證、去除重複並寫入（同一個交易內）；逐列錯誤列在 errors
         """
         line_profile = self.get_line_profile()
         if not line_profile:
@@ -1420,47 +1436,20 @@ class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
         if 'file' not in request.FILES:
             return Response({'error': '沒有上傳檔案'}, status=status.HTTP_400_BAD_REQUEST)
         file = request.FILES['file']
-        name = (file.name or '').lower()
-        data = file.read()
-        
-        print(f'[import_courses] 檔案: {file.name}, 大小: {len(data)} bytes, 用戶: {line_profile.line_user_id}')
+
+        print(f'[import_courses] 檔案: {file.name}, 大小: {file.size} bytes, 用戶: {line_profile.line_user_id}')
 
         try:
-            items = []
-            if name.endswith('.csv'):
-                print('[import_courses] 使用 CSV 解析器')
-                items = parse_courses_csv(data)
-            elif name.endswith('.ics') or name.endswith('.ical'):
-                print('[import_courses] 使用 iCal 解析器')
-                items = parse_courses_ical(data)
-            elif name.endswith('.xlsx'):
-                print('[import_courses] 使用 XLSX 解析器')
-                items = parse_courses_xlsx(data)
-            elif name.endswith('.xls'):
-                print('[import_courses] 使用 XLS 解析器')
-                items = parse_courses_xls(data)
-            else:
+            try:
+                # 解析器為 generator，邊讀檔邊分批寫入，不會一次載入整個檔案
+                items = iter_courses(file, file.name)
+            except ValueError:
                 return Response({'error': '不支援的檔案類型，請上傳 CSV / iCal(.ics) / Excel(.xlsx/.xls)'}, status=status.HTTP_400_BAD_REQUEST)
 
-            print(f'[import_courses] 解析到 {len(items)} 個課程')
-            created = []
-            for i, it in enumerate(items):
-                try:
-                    obj = CourseV2.objects.create(
-                        user=line_profile,
-                        title=it.get('title',''),
-                        description=it.get('description',''),
-                        instructor=it.get('instructor',''),
-                        classroom=it.get('classroom','')
-                    )
-                    created.append(str(obj.id))
-                    print(f'[import_courses] 創建課程 {i+1}: {obj.title}')
-                except Exception as e:
-                    print(f'[import_courses] 創建課程 {i+1} 失敗: {e}')
-                    continue
-                    
-            print(f'[import_courses] 成功創建 {len(created)} 個課程')
-            return Response({'count': len(created), 'ids': created})
+            dry_run = (request.query_params.get('dryRun') or request.data.get('dryRun') or '').strip().lower() == 'true'
+            result = CourseImportService.import_courses(line_profile, items, dry_run=dry_run)
+            print(f"[import_courses] 解析到 {result['total']} 個課程，成功創建 {result['count']} 個，重複 {len(result['duplicates'])}，錯誤 {len(result['errors'])}")
+            return Response(result)
         except Exception as e:
             print(f'[import_courses] 錯誤: {e}')
             import traceback
@@ -1497,6 +1486,9 @@ class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
         參數：
         - dryRun: 'true' 時只回傳解析結果，不寫入資料庫
         - preview: 'true' 時回傳解析結果和衝突檢查，供前端預覽
+        - async: 'true' 時保存圖片並建立背景工作，立即回傳 202 與 jobId；
+          以 timetable-import-jobs/<jobId>/ 輪詢結果，再以 confirm-timetable-import 帶 jobId 匯入
+        - notify: 搭配 async，'true' 時解析完成後以 LINE 推播通知
         """
         line_profile = self.get_line_profile()
         if not line_profile:
@@ -1506,13 +1498,25 @@ class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
             return Response({'error': '沒有上傳檔案'}, status=status.HTTP_400_BAD_REQUEST)
 
         file = request.FILES['file']
-        data = file.read()
-        if not data:
+        if not file.size:
             return Response({'error': '空檔案'}, status=status.HTTP_400_BAD_REQUEST)
 
+        async_mode = (request.query_params.get('async') or request.data.get('async') or '').strip().lower() == 'true'
+        if async_mode:
+            # 解析（模型呼叫數秒以上）交給 Celery，不佔用 web worker
+            notify = (request.query_params.get('notify') or request.data.get('notify') or '').strip().lower() == 'true'
+            from services.tasks import enqueue_task, process_timetable_import_job
+            job = TimetableImportJobService.create_job(line_profile, file, notify=notify)
+            enqueue_task(process_timetable_import_job, str(job.job_id))
+            print(f'[import_timetable_image] 建立背景工作 {job.job_id}')
+            return Response(TimetableImportJobService.serialize(job), status=status.HTTP_202_ACCEPTED)
+
+        data = file.read()
+
         try:
-            from services.gemma_client import extract_timetable_from_image  # type: ignore
-            items = extract_timetable_from_image(data)
+            # 以圖片內容快取解析結果：預覽後再正式匯入同一張圖片不會再次呼叫模型
+            items, cached = TimetableExtractionService.extract(data)
+            print(f'[import_timetable_image] 解析 {len(items)} 門課程（快取: {cached}）')
         except Exception as e:
             print('[import_timetable_image] Gemma 解析失敗:', e)
             return Response({'error': f'Gemma 解析失敗: {e}'}, status=status.HTTP_400_BAD_REQUEST)
@@ -1521,243 +1525,77 @@ class FileUploadViewSet(LineUserViewSetMixin, viewsets.ViewSet):
         dry_run = (request.query_params.get('dryRun') or request.data.get('dryRun') or '').strip().lower() == 'true'
         preview_mode = (request.query_params.get('preview') or request.data.get('preview') or '').strip().lower() == 'true'
         
-        # 如果是預覽模式或 dryRun，進行衝突檢查並回傳結果
+        # 如果是預覽模式或 dryRun，進行衝突檢查並回傳結果（既有課表一次載入，同批課程彼此也會比對）
         if dry_run or preview_mode:
-            # 檢查時段衝突
-            items_with_conflicts = []
-            for item in items:
-                item_conflicts = []
-                for sch in item.get('schedule', []):
-                    try:
-                        dow = int(sch.get('day_of_week'))
-                        start = sch.get('start') or ''
-                        end = sch.get('end') or ''
-                        if 0 <= dow <= 6 and start and end:
-                            from datetime import datetime as _dt
-                            st = _dt.strptime(start, '%H:%M').time()
-                            et = _dt.strptime(end, '%H:%M').time()
-                            
-                            # 檢查是否有時段衝突
-                            conflicting_schedules = CourseScheduleV2.objects.filter(
-                                course__user=line_profile,
-                                day_of_week=dow,
-                                start_time__lt=et,
-                                end_time__gt=st
-                            ).select_related('course')
-                            
-                            if conflicting_schedules.exists():
-                                for conflict in conflicting_schedules:
-                                    item_conflicts.append({
-                                        'day_of_week': dow,
-                                        'start_time': start,
-                                        'end_time': end,
-                                        'conflicting_course': {
-                                            'id': conflict.course.id,
-                                            'title': conflict.course.title,
-                                            'instructor': conflict.course.instructor,
-                                            'classroom': conflict.course.classroom,
-                                            'start_time': conflict.start_time.strftime('%H:%M'),
-                                            'end_time': conflict.end_time.strftime('%H:%M')
-                                        }
-                                    })
-                    except Exception as e:
-                        print(f'[import_timetable_image] 衝突檢查失敗: {e}')
-                        continue
-                
-                item_with_conflict = item.copy()
-                item_with_conflict['conflicts'] = item_conflicts
-                item_with_conflict['has_conflicts'] = len(item_conflicts) > 0
-                items_with_conflicts.append(item_with_conflict)
+            items_with_conflicts = CourseImportService.preview_timetable(line_profile, items)
             
             return Response({
                 'items': items_with_conflicts, 
                 'dryRun': dry_run,
                 'preview': preview_mode,
+                'cached': cached,
                 'total_courses': len(items_with_conflicts),
                 'courses_with_conflicts': sum(1 for item in items_with_conflicts if item['has_conflicts'])
             })
 
-        # 正常創建模式 - 跳過有衝突的課程
-        created_courses = []
-        created_schedules = 0
-        skipped_courses = []
-        
-        for it in items:
-            # 檢查是否有時段衝突
-            has_conflict = False
-            for sch in it.get('schedule', []):
-                try:
-                    dow = int(sch.get('day_of_week'))
-                    start = sch.get('start') or ''
-                    end = sch.get('end') or ''
-                    if 0 <= dow <= 6 and start and end:
-                        from datetime import datetime as _dt
-                        st = _dt.strptime(start, '%H:%M').time()
-                        et = _dt.strptime(end, '%H:%M').time()
-                        
-                        # 檢查是否有時段衝突
-                        conflicting_schedules = CourseScheduleV2.objects.filter(
-                            course__user=line_profile,
-                            day_of_week=dow,
-                            start_time__lt=et,
-                            end_time__gt=st
-                        )
-                        
-                        if conflicting_schedules.exists():
-                            has_conflict = True
-                            break
-                except Exception:
-                    continue
-            
-            if has_conflict:
-                skipped_courses.append({
-                    'title': it.get('title', ''),
-                    'reason': '時段衝突'
-                })
-                continue
-            
-            # 創建課程
-            try:
-                course = CourseV2.objects.create(
-                    user=line_profile,
-                    title=it.get('title','')[:255],
-                    description='',
-                    instructor=it.get('instructor','')[:100],
-                    classroom=it.get('classroom','')[:100],
-                )
-                created_courses.append(str(course.id))
-                
-                # 創建時段
-                for sch in it.get('schedule') or []:
-                    try:
-                        dow = int(sch.get('day_of_week'))
-                        start = sch.get('start') or ''
-                        end = sch.get('end') or ''
-                        if 0 <= dow <= 6 and start and end:
-                            from datetime import datetime as _dt
-                            st = _dt.strptime(start, '%H:%M').time()
-                            et = _dt.strptime(end, '%H:%M').time()
-                            CourseScheduleV2.objects.create(
-                                course=course,
-                                day_of_week=dow,
-                                start_time=st,
-                                end_time=et,
-                                location=course.classroom or '',
-                            )
-                            created_schedules += 1
-                    except Exception:
-                        continue
-            except Exception as e:
-                print('[import_timetable_image] 建立課程失敗:', e)
-                skipped_courses.append({
-                    'title': it.get('title', ''),
-                    'reason': f'創建失敗: {str(e)}'
-                })
-                continue
+        # 正常創建模式 - 跳過有衝突的課程，其餘在同一個交易內批次建立
+        try:
+            result = CourseImportService.import_timetable(line_profile, items)
+        except Exception as e:
+            print('[import_timetable_image] 建立課程失敗:', e)
+            return Response({'error': f'建立課程失敗: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({
-            'coursesCreated': len(created_courses), 
-            'courseIds': created_courses, 
-            'schedulesCreated': created_schedules,
-            'skippedCourses': skipped_courses,
-            'totalProcessed': len(items)
-        })
+        return Response(result)
+
+    @action(detail=False, methods=['get'], url_path=r'timetable-import-jobs/(?P<job_id>[0-9a-fA-F-]{36})')
+    def timetable_import_job(self, request, job_id=None):
+        """查詢課表圖片背景匯入工作的狀態與解析結果"""
+        line_profile = self.get_line_profile()
+        if not line_profile:
+            return Response({'error': '無法獲取LINE用戶資料'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        job = TimetableImportJobService.get_job(line_profile, job_id)
+        if not job:
+            return Response({'error': '找不到匯入工作'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TimetableImportJobService.serialize(job))
 
     @action(detail=False, methods=['post'], url_path='confirm-timetable-import', parser_classes=[parsers.JSONParser])
     def confirm_timetable_import(self, request):
-        """確認創建用戶編輯後的課程數據"""
+        """確認創建用戶編輯後的課程數據
+        帶 jobId 時使用背景工作保存的解析結果（有傳 courses 則以編輯後的 courses 為準），不需重新解析
+        """
         line_profile = self.get_line_profile()
         if not line_profile:
             return Response({'error': '無法獲取LINE用戶資料'}, status=status.HTTP_401_UNAUTHORIZED)
 
         courses_data = request.data.get('courses', [])
-        if not courses_data:
-            return Response({'error': '沒有課程數據'}, status=status.HTTP_400_BAD_REQUEST)
-
-        created_courses = []
-        created_schedules = 0
-        skipped_courses = []
-
-        for course_data in courses_data:
-            # 再次檢查時段衝突（防止前端數據被篡改）
-            has_conflict = False
-            for sch in course_data.get('schedule', []):
-                try:
-                    dow = int(sch.get('day_of_week'))
-                    start = sch.get('start') or ''
-                    end = sch.get('end') or ''
-                    if 0 <= dow <= 6 and start and end:
-                        from datetime import datetime as _dt
-                        st = _dt.strptime(start, '%H:%M').time()
-                        et = _dt.strptime(end, '%H:%M').time()
-                        
-                        # 檢查是否有時段衝突
-                        conflicting_schedules = CourseScheduleV2.objects.filter(
-                            course__user=line_profile,
-                            day_of_week=dow,
-                            start_time__lt=et,
-                            end_time__gt=st
-                        )
-                        
-                        if conflicting_schedules.exists():
-                            has_conflict = True
-                            break
-                except Exception:
-                    continue
-            
-            if has_conflict:
-                skipped_courses.append({
-                    'title': course_data.get('title', ''),
-                    'reason': '時段衝突'
-                })
-                continue
-            
-            # 創建課程
+        job_id = request.data.get('jobId')
+        if job_id:
+            job = TimetableImportJobService.get_job(line_profile, job_id)
+            if not job:
+                return Response({'error': '找不到匯入工作'}, status=status.HTTP_404_NOT_FOUND)
+            if job.status != 'completed':
+                return Response({'error': f'匯入工作狀態為 {job.status}，無法匯入'}, status=status.HTTP_409_CONFLICT)
             try:
-                course = CourseV2.objects.create(
-                    user=line_profile,
-                    title=course_data.get('title', '')[:255],
-                    description='',
-                    instructor=course_data.get('instructor', '')[:100],
-                    classroom=course_data.get('classroom', '')[:100],
-                )
-                created_courses.append(str(course.id))
-                
-                # 創建時段
-                for sch in course_data.get('schedule', []):
-                    try:
-                        dow = int(sch.get('day_of_week'))
-                        start = sch.get('start') or ''
-                        end = sch.get('end') or ''
-                        if 0 <= dow <= 6 and start and end:
-                            from datetime import datetime as _dt
-                            st = _dt.strptime(start, '%H:%M').time()
-                            et = _dt.strptime(end, '%H:%M').time()
-                            CourseScheduleV2.objects.create(
-                                course=course,
-                                day_of_week=dow,
-                                start_time=st,
-                                end_time=et,
-                                location=course.classroom or '',
-                            )
-                            created_schedules += 1
-                    except Exception:
-                        continue
+                result = TimetableImportJobService.confirm(job, courses_data or None)
+            except TimetableImportJobStateError as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
             except Exception as e:
                 print('[confirm_timetable_import] 建立課程失敗:', e)
-                skipped_courses.append({
-                    'title': course_data.get('title', ''),
-                    'reason': f'創建失敗: {str(e)}'
-                })
-                continue
+                return Response({'error': f'建立課程失敗: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response(result)
 
-        return Response({
-            'coursesCreated': len(created_courses), 
-            'courseIds': created_courses, 
-            'schedulesCreated': created_schedules,
-            'skippedCourses': skipped_courses,
-            'totalProcessed': len(courses_data)
-        })
+        if not courses_data:
+            return Response({'error': '沒有課程數據'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 再次檢查時段衝突（防止前端數據被篡改），通過者在同一個交易內批次建立
+        try:
+            result = CourseImportService.import_timetable(line_profile, courses_data)
+        except Exception as e:
+            print('[confirm_timetable_import] 建立課程失敗:', e)
+            return Response({'error': f'建立課程失敗: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(result)
         
     def list(self, request):
         line_profile = self.get_line_profile()
@@ -172,6 +172,27 @@ else:
     }
 
 
+# 快取設定 - 有 REDIS_URL 時使用 Redis（多個 worker 共用），否則使用行程內記憶體
+# 多個 worker 部署時必須設定 REDIS_URL：LINE 綁定碼 Bloom filter、群組綁定快取、速率限制與斷路器
+# 都以共用快取通知其他行程；使用行程內記憶體時綁定碼與群組綁定改為每次查資料庫
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            },
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -274,6 +295,24 @@ CHANNEL_TOKEN = os.getenv("CHANNEL_TOKEN")
 LINE_CHANNEL_ID = os.getenv("LINE_CHANNEL_ID")          # Channel ID (注意不是 liffId)
 LINE_ISSUER = "https://access.line.me"
 REGISTRATION_COOLDOWN_MINUTES = 1
+# LINE Messaging API 各端點每秒請求上限，以及推播時保留的每月訊息額度
+LINE_RATE_LIMITS = {
+    'push': int(os.getenv('LINE_PUSH_RATE_LIMIT', 2000)),
+    'multicast': int(os.getenv('LINE_MULTICAST_RATE_LIMIT', 200)),
+    'reply': int(os.getenv('LINE_REPLY_RATE_LIMIT', 2000)),
+}
+LINE_QUOTA_RESERVE = int(os.getenv('LINE_QUOTA_RESERVE', 0))
+# 課表圖片解析結果快取保存秒數（預設 7 天）
+TIMETABLE_EXTRACTION_CACHE_TTL = int(os.getenv('TIMETABLE_EXTRACTION_CACHE_TTL', 7 * 24 * 60 * 60))
+# 課表圖片上傳模型前縮小到的長邊像素
+TIMETABLE_IMAGE_MAX_SIDE = int(os.getenv('TIMETABLE_IMAGE_MAX_SIDE', 2048))
+# Google API 每個行程同時呼叫上限；斷路器在 window 秒內失敗 threshold 次後暫停 cooldown 秒
+GOOGLE_API_MAX_CONCURRENCY = int(os.getenv('GOOGLE_API_MAX_CONCURRENCY', 8))
+GOOGLE_API_BREAKER = {
+    'threshold': int(os.getenv('GOOGLE_API_BREAKER_THRESHOLD', 5)),
+    'window': int(os.getenv('GOOGLE_API_BREAKER_WINDOW', 60)),
+    'cooldown': int(os.getenv('GOOGLE_API_BREAKER_COOLDOWN', 30)),
+}
 N8N_NLP_URL = os.getenv("N8N_NLP_URL")
 INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
 
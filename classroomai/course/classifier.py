@@ -0,0 +1,165 @@
+# course/classifier.py
+"""
+筆記自動歸類索引（每位使用者一份，行程內快取）
+- 課表：每個星期幾一份依開始時間排序的時段陣列，二分搜尋找出涵蓋指定時間的課程
+- 課程名稱：Aho-Corasick 自動機，一次掃描文字找出出現的課程名稱
+課程或課表變更時由 signals 遞增該使用者的 generation，各行程下次查詢時重建
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import time as dt_time
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+GENERATION_KEY = "course:classifier_generation:{}"
+
+
+class AhoCorasick:
+    """多字串比對自動機；match() 回傳出現在文字中最長的關鍵字所對應的值"""
+
+    def __init__(self, keywords: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每個狀態結尾（含 fail 鏈上）最長的 (長度, 值)
+        self._output: List[Optional[Tuple[int, object]]] = [None]
+
+        for keyword, value in keywords.items():
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                state = nxt
+            self._output[state] = (len(keyword), value)
+
+        # BFS 建立 fail 連結，並把 fail 鏈上較長的輸出合併到每個狀態
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                if state:
+                    fail = self._fail[state]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[nxt] = self._goto[fail].get(char, 0)
+                inherited = self._output[self._fail[nxt]]
+                if inherited and (self._output[nxt] is None or inherited[0] > self._output[nxt][0]):
+                    self._output[nxt] = inherited
+
+    def match(self, text: str):
+        best = None
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found = self._output[state]
+            if found and (best is None or found[0] > best[0]):
+                best = found
+        return best[1] if best else None
+
+
+class CourseIndex:
+    """單一使用者的課表時段索引與課程名稱自動機（值為 Course.id）"""
+
+    def __init__(self, slots: List[Tuple[int, dt_time, dt_time, int]], names: Dict[str, int]):
+        """
+        Args:
+            slots: [(day_of_week, start_time, end_time, course_id)]
+            names: {課程名稱: course_id}
+        """
+        by_day: Dict[int, List[Tuple[dt_time, dt_time, int]]] = {}
+        for day, start, end, course_id in slots:
+            by_day.setdefault(day, []).append((start, end, course_id))
+
+        self._days = {}
+        for day, entries in by_day.items():
+            entries.sort(key=lambda entry: entry[0])
+            # max_end[i]：前 i+1 個時段中最晚的結束時間，用來提早結束往回掃描
+            max_end, latest = [], None
+            for _, end, _ in entries:
+                latest = end if latest is None or end > latest else latest
+                max_end.append(latest)
+            self._days[day] = ([entry[0] for entry in entries], entries, max_end)
+
+        self._names = AhoCorasick(names)
+
+    def course_at(self, day_of_week: int, at: dt_time) -> Optional[int]:
+        """涵蓋指定時間的課程（重疊時取開始時間最晚者）"""
+        day = self._days.get(day_of_week)
+        if day is None:
+            return None
+        starts, entries, max_end = day
+        i = bisect.bisect_right(starts, at) - 1
+        while i >= 0 and max_end[i] >= at:
+            if entries[i][1] >= at:
+                return entries[i][2]
+            i -= 1
+        return None
+
+    def course_named_in(self, text: str) -> Optional[int]:
+        """文字中出現的課程名稱（多個時取最長者）"""
+        return self._names.match(text) if text else None
+
+
+class CourseIndexCache:
+    """每個行程以 LRU 保存最近使用者的 CourseIndex"""
+
+    def __init__(self, max_users: int = 256, max_age: int = 300):
+        self.max_users = max_users
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Tuple[object, float, CourseIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build(owner_id: str) -> CourseIndex:
+        from .models import Course, CourseSchedule
+
+        slots = CourseSchedule.objects.filter(course__owner_id=owner_id).values_list(
+            "day_of_week", "start_time", "end_time", "course_id"
+        )
+        names = {}
+        # 同名課程保留最早建立者
+        for course_id, name in Course.objects.filter(owner_id=owner_id).order_by("-id").values_list("id", "name"):
+            if name:
+                names[name] = course_id
+        return CourseIndex(list(slots), names)
+
+    def get(self, owner_id: str) -> CourseIndex:
+        generation = cache.get(GENERATION_KEY.format(owner_id), 0)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(owner_id)
+            if entry and entry[0] == generation and now - entry[1] <= self.max_age:
+                self._entries.move_to_end(owner_id)
+                return entry[2]
+
+        index = self._build(owner_id)
+        with self._lock:
+            self._entries[owner_id] = (generation, now, index)
+            self._entries.move_to_end(owner_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return index
+
+    @staticmethod
+    def invalidate(owner_id: str) -> None:
+        """課程或課表變更後呼叫，通知所有行程重建該使用者的索引"""
+        key = GENERATION_KEY.format(owner_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+course_index_cache = CourseIndexCache()
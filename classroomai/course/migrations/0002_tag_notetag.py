@@ -0,0 +1,71 @@
+# Generated by Django 4.2.24 on 2026-10-19 13:00
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TAG_SPLIT_RE = re.compile(r"[,，、]")
+
+
+def split_existing_tags(apps, schema_editor):
+    """把既有 StudentNote.tags 字串拆成 Tag / NoteTag"""
+    StudentNote = apps.get_model("course", "StudentNote")
+    Tag = apps.get_model("course", "Tag")
+    NoteTag = apps.get_model("course", "NoteTag")
+
+    tag_ids = {}
+    links = []
+    notes = StudentNote.objects.exclude(tags="").values_list("id", "author_id", "tags")
+    for note_id, author_id, value in notes.iterator(chunk_size=1000):
+        names = dict.fromkeys(n.strip()[:50] for n in TAG_SPLIT_RE.split(value or "") if n.strip())
+        for name in names:
+            key = (author_id, name)
+            if key not in tag_ids:
+                tag_ids[key] = Tag.objects.get_or_create(owner_id=author_id, name=name)[0].id
+            links.append(NoteTag(note_id=note_id, tag_id=tag_ids[key]))
+        if len(links) >= 1000:
+            NoteTag.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    if links:
+        NoteTag.objects.bulk_create(links, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_lineprofile_email_alter_lineprofile_extra_and_more'),
+        ('course', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_tags', to='user.lineprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_tag_links', to='course.studentnote')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_links', to='course.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'note'], name='course_note_tag_note_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('owner', 'name'), name='unique_owner_tag_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='notetag',
+            constraint=models.UniqueConstraint(fields=('note', 'tag'), name='unique_note_tag'),
+        ),
+        migrations.RunPython(split_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.24 on 2026-10-19 16:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0002_tag_notetag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSummary',
+            fields=[
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ai_summary', serialize=False, to='course.studentnote')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('keywords', models.JSONField(default=list)),
+                ('source', models.CharField(default='deepseek', max_length=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -118,6 +118,60 @@ class StudentNote(models.Model):
         super().save(*args, **kwargs)
 
 
+class Tag(models.Model):
+    """
+    筆記標籤（每位使用者各自一組）
+    (owner, name) 唯一索引同時供精確比對與自動完成的前綴查詢使用
+    """
+    owner = models.ForeignKey(LineProfile, on_delete=models.CASCADE, related_name="note_tags")
+    name = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "name"], name="unique_owner_tag_name"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    """
+    StudentNote 與 Tag 的關聯表
+    由 StudentNote.tags（逗號分隔字串）於儲存時同步，供標籤篩選與統計使用
+    """
+    note = models.ForeignKey(StudentNote, on_delete=models.CASCADE, related_name="note_tag_links")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="note_links")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["note", "tag"], name="unique_note_tag"),
+        ]
+        indexes = [
+            models.Index(fields=["tag", "note"], name="course_note_tag_note_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.note_id} #{self.tag_id}"
+
+
+class NoteSummary(models.Model):
+    """
+    筆記 AI 摘要快取
+    content_hash 為正規化後純文字（含提示詞版本）的 SHA-256，筆記內容未變更時直接回傳
+    """
+    note = models.OneToOneField(StudentNote, primary_key=True, on_delete=models.CASCADE, related_name="ai_summary")
+    content_hash = models.CharField(max_length=64)
+    summary = models.TextField(blank=True, default="")
+    keywords = models.JSONField(default=list)
+    source = models.CharField(max_length=16, default="deepseek")  # deepseek | fallback
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"summary:{self.note_id} ({self.source})"
+
+
 class FileAttachment(models.Model):
     """
     文件附件模型，支援多態關聯到不同的模型（筆記、作業等）
@@ -111,8 +111,9 @@ class GetNotesSerializer(serializers.Serializer):
     search = serializers.CharField(required=False, allow_blank=True)
     classified_by = serializers.CharField(required=False, allow_blank=True)
     note_type = serializers.CharField(required=False, allow_blank=True)
-    tags = serializers.CharField(required=False, allow_blank=True)
+    tags = serializers.CharField(required=False, allow_blank=True)      # 多個標籤以逗號分隔，需全部符合
     priority = serializers.CharField(required=False, allow_blank=True)
+    facets = serializers.BooleanField(required=False, default=False)   # 是否回傳標籤統計
 
 class UpdateNoteSerializer(serializers.Serializer):
     line_user_id = serializers.CharField()
@@ -149,6 +150,11 @@ class GetNoteDetailSerializer(serializers.Serializer):
     line_user_id = serializers.CharField()
     note_id = serializers.UUIDField()  # 支援 UUID
 
+class TagAutocompleteSerializer(serializers.Serializer):
+    line_user_id = serializers.CharField()
+    prefix = serializers.CharField(required=False, allow_blank=True, default="")
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+
 # Google Calendar Serializers
 class CreateCalendarEventSerializer(serializers.Serializer):
     line_user_id = serializers.CharField()
@@ -0,0 +1,32 @@
+"""
+Course signals
+- StudentNote 儲存後同步標籤關聯（Tag / NoteTag）
+- 課程 / 課表變更後讓該使用者的筆記歸類索引失效
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .classifier import course_index_cache
+from .models import Course, CourseSchedule, StudentNote
+from .tags import sync_note_tags
+
+
+@receiver(post_save, sender=StudentNote)
+def sync_tags_on_note_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "tags" not in update_fields:
+        return
+    sync_note_tags(instance)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_index_on_course_change(sender, instance, **kwargs):
+    course_index_cache.invalidate(instance.owner_id)
+
+
+@receiver(post_save, sender=CourseSchedule)
+@receiver(post_delete, sender=CourseSchedule)
+def invalidate_index_on_schedule_change(sender, instance, **kwargs):
+    owner_id = Course.objects.filter(pk=instance.course_id).values_list("owner_id", flat=True).first()
+    if owner_id:
+        course_index_cache.invalidate(owner_id)
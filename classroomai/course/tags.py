@@ -0,0 +1,80 @@
+# course/tags.py
+"""
+筆記標籤正規化
+StudentNote.tags 仍保留逗號分隔字串（向後相容），儲存時同步到 Tag / NoteTag，
+標籤篩選、統計與自動完成都改查關聯表與索引
+"""
+import re
+from typing import Dict, Iterable, List
+
+from django.db.models import Count
+
+from .models import NoteTag, Tag
+
+TAG_SPLIT_RE = re.compile(r"[,，、]")
+MAX_TAG_LENGTH = 50
+AUTOCOMPLETE_LIMIT = 10
+
+
+def parse_tags(value: str) -> List[str]:
+    """把逗號分隔的標籤字串拆成去除重複、保留順序的標籤列表"""
+    names = (name.strip()[:MAX_TAG_LENGTH] for name in TAG_SPLIT_RE.split(value or ""))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _tag_ids(owner_id: str, names: Iterable[str], create: bool = False) -> Dict[str, int]:
+    names = list(names)
+    ids = dict(Tag.objects.filter(owner_id=owner_id, name__in=names).values_list("name", "id"))
+    missing = [name for name in names if name not in ids]
+    if create and missing:
+        # 併發建立同名標籤時忽略唯一鍵衝突，再重新查詢取得 id
+        Tag.objects.bulk_create([Tag(owner_id=owner_id, name=name) for name in missing], ignore_conflicts=True)
+        ids.update(Tag.objects.filter(owner_id=owner_id, name__in=missing).values_list("name", "id"))
+    return ids
+
+
+def sync_note_tags(note) -> None:
+    """依 note.tags 字串更新 NoteTag 關聯（只新增 / 刪除有差異的部分）"""
+    wanted = set(_tag_ids(note.author_id, parse_tags(note.tags), create=True).values())
+    current = set(NoteTag.objects.filter(note=note).values_list("tag_id", flat=True))
+    if current - wanted:
+        NoteTag.objects.filter(note=note, tag_id__in=current - wanted).delete()
+    if wanted - current:
+        NoteTag.objects.bulk_create(
+            [NoteTag(note=note, tag_id=tag_id) for tag_id in wanted - current], ignore_conflicts=True
+        )
+
+
+def filter_notes_by_tags(queryset, owner_id: str, names: List[str]):
+    """
+    只保留同時擁有所有指定標籤的筆記（精確比對，走 (tag, note) 索引）
+    """
+    ids = _tag_ids(owner_id, names)
+    if len(ids) < len(names):
+        return queryset.none()
+    for tag_id in ids.values():
+        queryset = queryset.filter(id__in=NoteTag.objects.filter(tag_id=tag_id).values("note_id"))
+    return queryset
+
+
+def tag_facets(queryset) -> List[Dict]:
+    """以一次分組查詢統計筆記集合中各標籤出現次數"""
+    return [
+        {"tag": row["tag__name"], "count": row["count"]}
+        for row in NoteTag.objects.filter(note__in=queryset.order_by().values("id"))
+        .values("tag__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "tag__name")
+    ]
+
+
+def autocomplete_tags(owner_id: str, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Dict]:
+    """依前綴查詢使用者的標籤（(owner, name) 唯一索引的範圍掃描），只回傳仍在使用的標籤"""
+    return [
+        {"tag": row["name"], "count": row["count"]}
+        for row in Tag.objects.filter(owner_id=owner_id, name__startswith=prefix.strip())
+        .annotate(count=Count("note_links"))
+        .filter(count__gt=0)
+        .order_by("name")
+        .values("name", "count")[:limit]
+    ]
@@ -17,6 +17,7 @@ from .views import (create_classroom,
                     create_note,
                     get_notes,
                     get_note_detail,
+                    autocomplete_note_tags,
                     update_note,
                     delete_note,
                     get_student_profile,
@@ -50,6 +51,7 @@ urlpatterns = [
     path("api/notes/delete/", delete_note, name="delete_note"),    # DELETE - 刪除筆記
     path("api/notes/list/", get_notes, name="get_notes"),          # GET - 查詢筆記列表
     path("api/notes/detail/", get_note_detail, name="get_note_detail"),  # GET - 取得單一筆記
+    path("api/notes/tags/", autocomplete_note_tags, name="autocomplete_note_tags"),  # GET - 標籤自動完成
     
     # Student Profile APIs - 查詢學生資料
     path("api/student/profile/", get_student_profile, name="get_student_profile"),
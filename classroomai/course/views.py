@@ -11,7 +11,7 @@ from typing import Optional
 from user.utils import get_valid_google_credentials
 from line_bot.utils import send_course_created_message, send_homework_created_message, send_multiple_homework_created_message, send_note_created_message, send_calendar_created_message
 from line_bot.models import GroupBinding, HomeworkStatisticsCache
-from .models import Course, Homework, CourseSchedule, StudentNote, FileAttachment
+from .models import Course, Homework, StudentNote, FileAttachment
 from .serializers import (
     CreateHomeworkSerializer,
     UpdateHomeworkSerializer,
@@ -28,8 +28,11 @@ from .serializers import (
     GetNotesSerializer,
     UpdateNoteSerializer,
     DeleteNoteSerializer,
-    GetNoteDetailSerializer
+    GetNoteDetailSerializer,
+    TagAutocompleteSerializer
 )
+from .classifier import course_index_cache
+from .tags import autocomplete_tags, filter_notes_by_tags, parse_tags, tag_facets
 
 # Helper functions to reduce code duplication
 def get_user_and_credentials(line_user_id):
@@ -1750,13 +1753,8 @@ def get_submissions_status(request):
         if teacher_results:
             try:
                 from line_bot.flex_templates import get_teacher_homework_statistics_flex
-                from linebot import LineBotApi
                 from linebot.models import FlexSendMessage
-                import os
-                
-                # 建立 LINE Bot API
-                CHANNEL_TOKEN = os.getenv("CHANNEL_TOKEN")
-                line_bot_api = LineBotApi(CHANNEL_TOKEN)
+                from services.line_messaging_service import line_messaging_service
                 
                 # 為每個教師查詢結果發送 Flex Message
                 for teacher_result in teacher_results:
@@ -1772,7 +1770,7 @@ def get_submissions_status(request):
                         )
                         
                         # 發送 Flex Message
-                        line_bot_api.push_message(
+                        line_messaging_service.push(
                             line_user_id,
                             FlexSendMessage(
                                 alt_text=flex_message['altText'],
@@ -1834,18 +1832,14 @@ def _find_course_by_time_or_name(author: LineProfile, captured_at, course_id: st
             local_dt = timezone.make_aware(local_dt, pytz.UTC)
         dow = local_dt.weekday()
         t = local_dt.time()
-        slots = CourseSchedule.objects.filter(day_of_week=dow, start_time__lte=t, end_time__gte=t).select_related("course")
-        for s in slots:
-            if s.course.owner_id == author.line_user_id:
-                return s.course
-        if slots:
-            return slots.first().course
-    # 3) 依名稱包含
+        matched_id = course_index_cache.get(author.line_user_id).course_at(dow, t)
+        if matched_id:
+            return Course.objects.filter(pk=matched_id).first()
+    # 3) 依名稱包含（只比對作者自己的課程）
     if text:
-        candidates = Course.objects.all()[:100]
-        for c in candidates:
-            if c.name and c.name in text:
-                return c
+        matched_id = course_index_cache.get(author.line_user_id).course_named_in(text)
+        if matched_id:
+            return Course.objects.filter(pk=matched_id).first()
     return None
 
 
@@ -1968,23 +1962,22 @@ def get_notes(request):
     # 基本查詢
     notes = StudentNote.objects.filter(**filters).select_related("course")
     
-    # 文本搜索（包含文字內容和標籤）
+    # 文本搜索（全文索引，涵蓋文字內容、標籤與類型）
     if ser.validated_data.get("search"):
-        from django.db.models import Q
-        search_text = ser.validated_data["search"]
+        from services.search_service import SearchService
         notes = notes.filter(
-            Q(text__icontains=search_text) | 
-            Q(tags__icontains=search_text) |
-            Q(note_type__icontains=search_text)
+            id__in=SearchService.matching_ids(author.line_user_id, ser.validated_data["search"], "note")
         )
     
-    # 標籤過濾
+    # 標籤過濾（精確比對，多個標籤需全部符合）
     if ser.validated_data.get("tags"):
-        tags = ser.validated_data["tags"]
-        notes = notes.filter(tags__icontains=tags)
+        notes = filter_notes_by_tags(notes, author.line_user_id, parse_tags(ser.validated_data["tags"]))
     
     # 總數
     total_count = notes.count()
+    
+    # 標籤統計（分頁前的完整結果）
+    facets = tag_facets(notes) if ser.validated_data.get("facets") else None
 
     # 是否回傳全部（跳過分頁）
     all_flag = str(request.GET.get("all", "")).lower() in ("1", "true", "yes")
@@ -2016,13 +2009,37 @@ def get_notes(request):
         }
         formatted_notes.append(formatted_note)
     
-    return Response({
+    response_data = {
         "total_count": total_count,
         "count": len(formatted_notes),
         "offset": 0 if all_flag else offset,
         "limit": total_count if all_flag else limit,
         "notes": formatted_notes,
-    }, status=200)
+    }
+    if facets is not None:
+        response_data["tag_facets"] = facets
+    
+    return Response(response_data, status=200)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def autocomplete_note_tags(request):
+    """
+    標籤自動完成
+    GET /api/notes/tags/?line_user_id=...&prefix=資&limit=10
+    """
+    ser = TagAutocompleteSerializer(data=request.GET)
+    ser.is_valid(raise_exception=True)
+    
+    if not LineProfile.objects.filter(pk=ser.validated_data["line_user_id"]).exists():
+        return Response({"error": "用戶不存在"}, status=404)
+    
+    tags = autocomplete_tags(
+        ser.validated_data["line_user_id"],
+        ser.validated_data["prefix"],
+        ser.validated_data["limit"],
+    )
+    return Response({"tags": tags}, status=200)
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -2471,4 +2488,4 @@ def create_file_upload(request):
             "error": "文件上傳失敗",
             "message": "創建文件附件時發生錯誤",
             "details": str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
\ No newline at end of file
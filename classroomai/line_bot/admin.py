@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import OneTimeBindCode, GroupBinding, ConversationMessage, HomeworkStatisticsCache
+from .models import OneTimeBindCode, GroupBinding, ConversationMessage, HomeworkStatisticsCache, FlexBatchJob
 
 
 @admin.register(OneTimeBindCode)
@@ -103,3 +103,11 @@ class HomeworkStatisticsCacheAdmin(admin.ModelAdmin):
         deleted_count = HomeworkStatisticsCache.cleanup_expired()
         self.message_user(request, f"已清理 {deleted_count} 筆過期的暫存資料")
     cleanup_expired_action.short_description = "清理所有過期的暫存資料"
+
+
+@admin.register(FlexBatchJob)
+class FlexBatchJobAdmin(admin.ModelAdmin):
+    list_display = ("job_id", "status", "total", "success_count", "failed_count", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("job_id",)
+    readonly_fields = ("job_id", "items", "created_at", "updated_at", "finished_at")
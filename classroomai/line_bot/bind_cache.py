@@ -0,0 +1,157 @@
+# line_bot/bind_cache.py
+"""
+群組綁定碼快取
+- 有效綁定碼雜湊的 Bloom filter：一般群組聊天不必查資料庫即可排除
+- 負向快取：記住查過但無效的雜湊（Bloom filter 的誤判）
+- 群組 → 課程綁定快取：以 group_id 為鍵，由 signals 失效
+以上都依賴共用 cache（Redis）通知其他行程；使用行程內 cache 時一律直接查資料庫
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# 6 碼綁定碼（避免 I O 1 0）
+BIND_CODE_RE = re.compile(r"\b([A-HJ-NP-Z2-9]{6})\b")
+
+GENERATION_KEY = "line_bot:bind_code_generation"
+GROUP_BINDING_KEY = "line_bot:group_binding:{}"
+GROUP_BINDING_TTL = 60 * 60
+# 未綁定群組的快取值（None 無法與 cache miss 區分）
+_UNBOUND = ""
+# 只在單一行程內有效的 cache 後端：失效通知到不了其他 worker
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def shared_cache_enabled() -> bool:
+    """default cache 是否由所有行程共用（Redis 等）"""
+    return settings.CACHES.get("default", {}).get("BACKEND", "") not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+class BloomFilter:
+    """固定大小的 Bloom filter，輸入為 sha256 hex 字串"""
+
+    def __init__(self, size_bits: int = 1 << 14, hash_count: int = 4):
+        self.size = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray(size_bits // 8)
+
+    def _positions(self, hex_digest: str):
+        # 雜湊本身已均勻分布，直接切片作為 k 個位置
+        for i in range(self.hash_count):
+            yield int(hex_digest[i * 8:(i + 1) * 8], 16) % self.size
+
+    def add(self, hex_digest: str) -> None:
+        for pos in self._positions(hex_digest):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, hex_digest: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(hex_digest))
+
+
+class BindCodeFilter:
+    """
+    每個行程持有一份有效綁定碼雜湊的 Bloom filter
+    綁定碼建立 / 使用時遞增共用快取中的 generation，其他行程下次查詢時重建
+    """
+
+    def __init__(self, max_age: int = 60, negative_size: int = 1024, negative_ttl: int = 300):
+        self.max_age = max_age
+        self.negative_size = negative_size
+        self.negative_ttl = negative_ttl
+        self._bloom: Optional[BloomFilter] = None
+        self._generation = None
+        self._built_at = 0.0
+        self._negative: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rebuild(self, generation) -> None:
+        from .models import OneTimeBindCode
+
+        bloom = BloomFilter()
+        hashes = OneTimeBindCode.objects.filter(
+            used=False, expires_at__gt=timezone.now()
+        ).values_list("code_hash", flat=True)
+        for code_hash in hashes:
+            bloom.add(code_hash)
+        self._bloom = bloom
+        self._generation = generation
+        self._built_at = time.monotonic()
+        self._negative.clear()
+
+    def _ensure_current(self) -> None:
+        generation = cache.get(GENERATION_KEY, 0)
+        stale = time.monotonic() - self._built_at > self.max_age
+        if self._bloom is None or generation != self._generation or stale:
+            with self._lock:
+                self._rebuild(generation)
+
+    def might_be_valid(self, code_hash: str) -> bool:
+        """False 代表一定不是有效綁定碼；True 需再查資料庫確認"""
+        if not shared_cache_enabled():
+            # 其他 worker 建立的綁定碼無法即時反映到本行程的 filter，改為每次查資料庫
+            return True
+        self._ensure_current()
+        if code_hash not in self._bloom:
+            return False
+        with self._lock:
+            expires = self._negative.get(code_hash)
+            if expires is not None:
+                if expires > time.monotonic():
+                    return False
+                self._negative.pop(code_hash, None)
+        return True
+
+    def mark_invalid(self, code_hash: str) -> None:
+        """記錄查過資料庫確認無效的雜湊"""
+        if not shared_cache_enabled():
+            return
+        with self._lock:
+            self._negative[code_hash] = time.monotonic() + self.negative_ttl
+            self._negative.move_to_end(code_hash)
+            while len(self._negative) > self.negative_size:
+                self._negative.popitem(last=False)
+
+    @staticmethod
+    def invalidate() -> None:
+        """綁定碼建立或使用後呼叫，通知所有行程重建"""
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 1, None)
+
+
+bind_code_filter = BindCodeFilter()
+
+
+def get_group_course_id(group_id: str) -> Optional[str]:
+    """取得群組綁定的課程 ID（未綁定回傳 None）"""
+    from .models import GroupBinding
+
+    def lookup():
+        return (
+            GroupBinding.objects.filter(group_id=group_id)
+            .values_list("course_id", flat=True)
+            .first()
+        ) or _UNBOUND
+
+    if not shared_cache_enabled():
+        return lookup() or None
+    key = GROUP_BINDING_KEY.format(group_id)
+    course_id = cache.get(key)
+    if course_id is None:
+        course_id = lookup()
+        cache.set(key, course_id, GROUP_BINDING_TTL)
+    return course_id or None
+
+
+def invalidate_group_binding(group_id: str) -> None:
+    cache.delete(GROUP_BINDING_KEY.format(group_id))
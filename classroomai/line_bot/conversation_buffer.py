@@ -0,0 +1,122 @@
+# line_bot/conversation_buffer.py
+"""
+ConversationMessage 延遲寫入緩衝區
+webhook 只把訊息放進記憶體，累積 N 筆或 T 毫秒後以 bulk_create 一次寫入
+行程正常結束時（atexit）會把剩餘訊息寫完
+批次寫入失敗時改為逐筆寫入，仍失敗的訊息放回緩衝區，最多重試 MAX_FLUSH_RETRIES 次
+"""
+import atexit
+import logging
+import os
+import threading
+from typing import List
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 單筆訊息寫入失敗後放回緩衝區重試的次數上限
+MAX_FLUSH_RETRIES = 3
+
+
+class ConversationWriteBuffer:
+    """執行緒安全的 ConversationMessage 寫入緩衝區"""
+
+    def __init__(self, max_rows: int = 50, max_delay_ms: int = 500):
+        """
+        Args:
+            max_rows: 累積多少筆立即寫入
+            max_delay_ms: 第一筆進入後最多等待多久寫入（毫秒）
+        """
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self._rows: List = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def add(self, **fields) -> None:
+        """加入一筆訊息（欄位同 ConversationMessage）"""
+        from .models import ConversationMessage
+
+        # 以加入緩衝區的時間為準，不同 worker 各自延遲寫入也不會打亂對話順序
+        fields.setdefault('created_at', timezone.now())
+        message = ConversationMessage(**fields)
+        message._flush_attempts = 0
+        with self._lock:
+            self._rows.append(message)
+            full = len(self._rows) >= self.max_rows
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def _schedule(self) -> None:
+        """尚未排程時啟動延遲寫入計時器（呼叫端需持有 _lock）"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self._flush_in_thread)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_thread(self) -> None:
+        close_old_connections()
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self) -> int:
+        """把緩衝區內容寫入資料庫，回傳寫入筆數"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not rows:
+            return 0
+
+        from .models import ConversationMessage
+
+        with self._flush_lock:
+            try:
+                # 整批在同一交易內寫入，失敗時不會留下部分批次，逐筆重寫才不會重複
+                with transaction.atomic():
+                    ConversationMessage.objects.bulk_create(rows, batch_size=self.max_rows)
+                return len(rows)
+            except Exception as e:
+                logger.warning(f"Bulk insert of {len(rows)} conversation messages failed, "
+                               f"retrying row by row: {str(e)}")
+
+            written = 0
+            failed = []
+            for row in rows:
+                row.pk = None
+                try:
+                    row.save(force_insert=True)
+                    written += 1
+                except Exception as e:
+                    row._flush_attempts += 1
+                    if row._flush_attempts >= MAX_FLUSH_RETRIES:
+                        logger.error(f"Dropping conversation message for {row.line_user_id} "
+                                     f"after {row._flush_attempts} failed writes: {str(e)}")
+                    else:
+                        failed.append(row)
+
+        if failed:
+            self._requeue(failed)
+        return written
+
+    def _requeue(self, rows: List) -> None:
+        """把寫入失敗的訊息放回緩衝區前端，等下一次排程重試"""
+        logger.warning(f"Requeued {len(rows)} conversation messages after failed write")
+        with self._lock:
+            self._rows[:0] = rows
+            self._schedule()
+
+
+conversation_buffer = ConversationWriteBuffer(
+    max_rows=int(os.getenv("CONVERSATION_BUFFER_ROWS", 50)),
+    max_delay_ms=int(os.getenv("CONVERSATION_BUFFER_MS", 500)),
+)
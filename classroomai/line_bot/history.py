@@ -0,0 +1,77 @@
+# line_bot/history.py
+"""
+對話歷史查詢（keyset / cursor 分頁）
+依 (line_user_id, created_at) 索引由新到舊讀取，以 (created_at, id) 作為游標，
+翻頁成本與歷史資料量無關
+"""
+import base64
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db.models import Q
+
+from .models import ConversationMessage
+
+HISTORY_FIELDS = ("id", "line_user_id", "message_type", "content", "intent", "raw_data", "created_at")
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: 游標格式錯誤
+    """
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _base_queryset(line_user_id: str, intent: Optional[str] = None, message_type: Optional[str] = None):
+    qs = ConversationMessage.objects.filter(line_user_id=line_user_id)
+    if intent:
+        qs = qs.filter(intent=intent)
+    if message_type:
+        qs = qs.filter(message_type=message_type)
+    return qs.order_by("-created_at", "-id")
+
+
+def get_history_page(line_user_id: str, cursor: Optional[str] = None, limit: int = 50,
+                     intent: Optional[str] = None, message_type: Optional[str] = None) -> Dict:
+    """
+    取得一頁對話歷史
+
+    Returns:
+        Dict: {"messages": [...], "next_cursor": str | None}
+    """
+    limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+    qs = _base_queryset(line_user_id, intent, message_type)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows: List[Dict] = list(qs.values(*HISTORY_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {"messages": rows, "next_cursor": next_cursor}
+
+
+def iter_history(line_user_id: str, intent: Optional[str] = None, message_type: Optional[str] = None,
+                 batch_size: int = MAX_PAGE_SIZE) -> Iterator[Dict]:
+    """逐頁走訪完整對話歷史（匯出用）"""
+    cursor = None
+    while True:
+        page = get_history_page(line_user_id, cursor, batch_size, intent, message_type)
+        yield from page["messages"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
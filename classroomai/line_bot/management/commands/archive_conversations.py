@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Django 管理命令：封存 / 清理過期的對話訊息（ConversationMessage）
+
+執行方式：
+python manage.py archive_conversations --retention-days 180 --archive-dir /var/backups/conversations
+
+- 早於保留期限的整月資料可先匯出為 NDJSON.gz（每月一檔），再從資料表移除
+- MySQL 已分割的資料表直接 DROP PARTITION，並預先建立未來月份的分割區
+- 其他資料庫以批次刪除
+
+設定 cron job 自動執行（每月 1 日凌晨 3 點）：
+0 3 1 * * cd /path/to/project && python manage.py archive_conversations
+"""
+
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from line_bot.models import ConversationMessage
+
+TABLE = ConversationMessage._meta.db_table
+
+
+def _month_start(year, month):
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def _to_days(d: date) -> int:
+    """對應 MySQL TO_DAYS()"""
+    return d.toordinal() + 365
+
+
+class Command(BaseCommand):
+    help = '封存並清理過期的對話訊息，維護每月分割區'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=180,
+            help='保留天數（早於此期限的整月資料會被封存），預設 180',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default='',
+            help='匯出 NDJSON.gz 的目錄；未指定則直接刪除不匯出',
+        )
+        parser.add_argument(
+            '--ahead-months',
+            type=int,
+            default=3,
+            help='MySQL 預先建立的未來月份分割區數量，預設 3',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='匯出 / 刪除的批次大小，預設 5000',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='預覽模式，不實際匯出或刪除資料',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        past = date.today() - timedelta(days=options['retention_days'])
+        cutoff = _month_start(past.year, past.month)
+        cutoff_dt = datetime(cutoff.year, cutoff.month, 1, tzinfo=dt_timezone.utc)
+
+        self.stdout.write(f"🗄️ 封存 {cutoff} 以前的對話訊息...")
+        expired = ConversationMessage.objects.filter(created_at__lt=cutoff_dt)
+        total_count = expired.count()
+        self.stdout.write(f"📊 發現 {total_count} 筆過期訊息")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("🔍 預覽模式：不會匯出或刪除任何資料"))
+            return
+
+        if total_count and options['archive_dir']:
+            exported = self._export(expired, options['archive_dir'], batch_size)
+            self.stdout.write(self.style.SUCCESS(f"✅ 已匯出 {exported} 筆訊息到 {options['archive_dir']}"))
+
+        partitions = self._partitions()
+        if partitions:
+            dropped = self._drop_partitions(partitions, cutoff)
+            self._ensure_future_partitions(partitions, options['ahead_months'])
+            # 分割邊界之外（例如 p_history 尚未到期）殘留的舊資料改用批次刪除
+            deleted = self._batched_delete(cutoff_dt, batch_size)
+            self.stdout.write(self.style.SUCCESS(f"✅ 已移除分割區：{', '.join(dropped) or '無'}；另刪除 {deleted} 筆"))
+        elif total_count:
+            deleted = self._batched_delete(cutoff_dt, batch_size)
+            self.stdout.write(self.style.SUCCESS(f"✅ 成功刪除 {deleted} 筆過期訊息"))
+
+        remaining_count = ConversationMessage.objects.count()
+        self.stdout.write(f"📈 剩餘對話訊息：{remaining_count} 筆")
+
+    def _export(self, queryset, archive_dir, batch_size) -> int:
+        """
+        依月份匯出為 conversations-YYYYMM.ndjson.gz，回傳新寫入的筆數
+
+        每個月份先寫入暫存檔，完成後才以 rename 取代正式檔；
+        已存在的封存檔內容會先複製到暫存檔，其中的 id 不再重複寫入（中斷後重跑不會重複匯出）
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        rows = queryset.order_by('created_at').values(
+            'id', 'line_user_id', 'message_type', 'content', 'intent', 'raw_data', 'created_at'
+        ).iterator(chunk_size=batch_size)
+
+        count = 0
+        current_month, fh, path, exported_ids = None, None, None, set()
+        try:
+            for row in rows:
+                month = row['created_at'].strftime('%Y%m')
+                if month != current_month:
+                    if fh:
+                        self._finish_month(fh, path)
+                    path = os.path.join(archive_dir, f"conversations-{month}.ndjson.gz")
+                    fh, exported_ids = self._start_month(path)
+                    current_month = month
+                if row['id'] in exported_ids:
+                    continue
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+                count += 1
+            if fh:
+                self._finish_month(fh, path)
+                fh = None
+        finally:
+            if fh:
+                # 匯出中斷：丟棄暫存檔，正式檔維持上次完整的內容
+                fh.close()
+                os.remove(path + '.tmp')
+        return count
+
+    def _start_month(self, path):
+        """開啟月份暫存檔並複製既有封存內容，回傳 (檔案, 已匯出的 id)"""
+        exported_ids = set()
+        fh = gzip.open(path + '.tmp', 'wt', encoding='utf-8')
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as existing:
+                for line in existing:
+                    if not line.strip():
+                        continue
+                    exported_ids.add(json.loads(line)['id'])
+                    fh.write(line if line.endswith("\n") else line + "\n")
+        return fh, exported_ids
+
+    def _finish_month(self, fh, path) -> None:
+        fh.close()
+        os.replace(path + '.tmp', path)
+
+    def _batched_delete(self, cutoff_dt, batch_size) -> int:
+        deleted = 0
+        while True:
+            ids = list(
+                ConversationMessage.objects.filter(created_at__lt=cutoff_dt)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            count, _ = ConversationMessage.objects.filter(id__in=ids).delete()
+            deleted += count
+
+    def _partitions(self):
+        """回傳 MySQL 分割區 [(名稱, TO_DAYS 上界或 None 表示 MAXVALUE)]；未分割則為空"""
+        if connection.vendor != 'mysql':
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION",
+                [TABLE],
+            )
+            return [
+                (name, None if description == 'MAXVALUE' else int(description))
+                for name, description in cursor.fetchall()
+            ]
+
+    def _drop_partitions(self, partitions, cutoff):
+        limit = _to_days(cutoff)
+        # 至少保留一個有上界的分割區，避免刪光後無法 REORGANIZE
+        droppable = [name for name, bound in partitions if bound is not None and bound <= limit]
+        bounded = [name for name, bound in partitions if bound is not None]
+        if len(droppable) >= len(bounded):
+            droppable = droppable[:-1]
+        if droppable:
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(droppable)}")
+        return droppable
+
+    def _ensure_future_partitions(self, partitions, ahead_months):
+        bounds = [bound for _, bound in partitions if bound is not None]
+        maxvalue = [name for name, bound in partitions if bound is None]
+        if not bounds or not maxvalue:
+            return
+        last_bound = date.fromordinal(max(bounds) - 365)
+        today = date.today()
+        target = _month_start(today.year, today.month + ahead_months + 1)
+
+        new_parts = []
+        start = last_bound
+        while start < target:
+            end = _month_start(start.year, start.month + 1)
+            new_parts.append(f"PARTITION p{start:%Y%m} VALUES LESS THAN (TO_DAYS('{end}'))")
+            start = end
+        if not new_parts:
+            return
+        new_parts.append(f"PARTITION {maxvalue[0]} VALUES LESS THAN MAXVALUE")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION {maxvalue[0]} INTO ({', '.join(new_parts)})"
+            )
+        self.stdout.write(f"🧩 新增 {len(new_parts) - 1} 個未來月份分割區")
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('line_bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlexBatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '處理中'), ('completed', '已完成'), ('partial', '部分失敗'), ('failed', '失敗')], default='pending', max_length=10)),
+                ('items', models.JSONField(default=list)),
+                ('total', models.IntegerField(default=0)),
+                ('success_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('chunk_size', models.IntegerField(default=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='line_bot_fbj_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.24 on 2026-10-19 10:30
+"""
+MySQL：ConversationMessage 依 created_at 做每月 RANGE 分割
+分割鍵必須包含在主鍵內，因此主鍵改為 (id, created_at)；Django 端仍以 id 作為主鍵
+其他資料庫（SQLite 開發環境）不做任何變更
+"""
+
+from datetime import date
+
+from django.db import migrations
+
+TABLE = "line_bot_conversationmessage"
+
+
+def _month_start(year, month):
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    today = date.today()
+    # 目前月份之前的資料放在 p_history，另外預先建立本月與之後兩個月
+    bounds = [_month_start(today.year, today.month + i) for i in range(4)]
+    partitions = [f"PARTITION p_history VALUES LESS THAN (TO_DAYS('{bounds[0]}'))"]
+    for start, end in zip(bounds, bounds[1:]):
+        partitions.append(f"PARTITION p{start:%Y%m} VALUES LESS THAN (TO_DAYS('{end}'))")
+    partitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(partitions)})"
+    )
+
+
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"ALTER TABLE {TABLE} REMOVE PARTITIONING")
+    schema_editor.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('line_bot', '0002_flexbatchjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('line_bot', '0003_partition_conversationmessage'),
+    ]
+
+    operations = [
+        # 對話歷史依意圖篩選並依時間排序；非覆蓋索引，content / raw_data 仍需回表讀取
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['line_user_id', 'intent', 'created_at'], name='line_bot_co_user_intent_idx'),
+        ),
+    ]
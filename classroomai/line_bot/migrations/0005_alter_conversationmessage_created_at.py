@@ -0,0 +1,20 @@
+# Generated by Django 4.2.24 on 2026-10-19 16:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('line_bot', '0004_conversationmessage_user_intent_idx'),
+    ]
+
+    operations = [
+        # 改由寫入緩衝區在收到訊息時填入時間（資料庫欄位不變）
+        migrations.AlterField(
+            model_name='conversationmessage',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
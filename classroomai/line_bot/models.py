@@ -1,4 +1,6 @@
 # line_bot/models.py
+import uuid
+
 from django.db import models
 from django.utils import timezone
 
@@ -11,7 +13,7 @@ class ConversationMessage(models.Model):
     - content: 訊息內容
     - intent: n8n識別的意圖（如果有的話）
     - raw_data: 原始訊息資料（JSON格式）
-    - created_at: 建立時間
+    - created_at: 收到訊息的時間
     """
     
     MESSAGE_TYPES = [
@@ -25,13 +27,16 @@ class ConversationMessage(models.Model):
     content = models.TextField()
     intent = models.CharField(max_length=50, blank=True, null=True)
     raw_data = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # 由寫入緩衝區於收到訊息時填入，延遲批次寫入不影響時間順序
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         indexes = [
             models.Index(fields=['line_user_id', 'created_at']),
             models.Index(fields=['message_type']),
             models.Index(fields=['intent']),
+            # 歷史查詢依意圖篩選時使用：只涵蓋篩選與排序欄位，content / raw_data 仍需回表讀取
+            models.Index(fields=['line_user_id', 'intent', 'created_at'], name='line_bot_co_user_intent_idx'),
         ]
         ordering = ['-created_at']
     
@@ -162,3 +167,47 @@ class HomeworkStatisticsCache(models.Model):
     
     def __str__(self) -> str:
         return f"{self.line_user_id} - {self.course_name} - {self.homework_title}"
+
+
+class FlexBatchJob(models.Model):
+    """
+    Flex Message 批次發送工作
+    - job_id: 對外公開的工作 ID
+    - status: 工作狀態
+    - items: 每位收件者的發送結果 [{line_user_id, template_name, status, error}]
+    - chunk_size: 每次處理的收件者數量
+    """
+
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '處理中'),
+        ('completed', '已完成'),
+        ('partial', '部分失敗'),
+        ('failed', '失敗'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    items = models.JSONField(default=list)
+    total = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    chunk_size = models.IntegerField(default=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="line_bot_fbj_status_idx"),
+        ]
+        ordering = ["-created_at"]
+
+    def refresh_counts(self) -> None:
+        """依 items 重新計算成功 / 失敗數"""
+        self.total = len(self.items)
+        self.success_count = sum(1 for item in self.items if item.get("status") == "sent")
+        self.failed_count = sum(1 for item in self.items if item.get("status") == "failed")
+
+    def __str__(self) -> str:
+        return f"{self.job_id} - {self.status} ({self.success_count}/{self.total})"
@@ -0,0 +1,19 @@
+# line_bot/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .bind_cache import BindCodeFilter, invalidate_group_binding
+from .models import OneTimeBindCode, GroupBinding
+
+
+@receiver(post_save, sender=OneTimeBindCode)
+@receiver(post_delete, sender=OneTimeBindCode)
+def refresh_bind_code_filter(sender, instance, **kwargs):
+    """綁定碼建立、使用或刪除後重建 Bloom filter"""
+    BindCodeFilter.invalidate()
+
+
+@receiver(post_save, sender=GroupBinding)
+@receiver(post_delete, sender=GroupBinding)
+def refresh_group_binding_cache(sender, instance, **kwargs):
+    invalidate_group_binding(instance.group_id)
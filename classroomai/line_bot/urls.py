@@ -1,6 +1,7 @@
 # line_bot/urls.py
 from django.urls import path
-from .views import (callback, api_create_bind_code, api_line_push, api_group_bindings, api_n8n_response, render_flex)
+from .views import (callback, api_create_bind_code, api_line_push, api_group_bindings, api_n8n_response, render_flex,
+                    api_send_flex_batch, api_flex_batch_job, api_conversation_history)
 
 urlpatterns = [
     path("line/webhook/", callback),
@@ -8,6 +9,10 @@ urlpatterns = [
     path("internal/api/line/push", api_line_push),
     path("internal/api/group-bindings", api_group_bindings),
     path("internal/api/n8n/response", api_n8n_response),
+    path("internal/api/flex/batch-send", api_send_flex_batch),
+    path("internal/api/flex/batch-jobs/<uuid:job_id>", api_flex_batch_job),
+    path("internal/api/flex/batch-jobs/<uuid:job_id>/retry", api_flex_batch_job),
+    path("internal/api/conversations/<str:line_user_id>", api_conversation_history),
     
     # ═══ 統一 Flex 模板渲染 API ═══
     path("line/render-flex/", render_flex, name="render_flex"),
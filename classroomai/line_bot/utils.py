@@ -5,6 +5,7 @@ from linebot.models import FlexSendMessage, TextSendMessage, QuickReply, QuickRe
 from googleapiclient.discovery import build
 from user.models import LineProfile
 from user.utils import get_valid_google_credentials
+from services.line_messaging_service import line_messaging_service
 
 # LINE Bot API 設定
 CHANNEL_TOKEN = os.getenv("CHANNEL_TOKEN")
@@ -24,7 +25,7 @@ def reply_text(reply_token: str, text: str) -> None:
 
 def push_to_group(group_id: str, text: str) -> bool:
     try:
-        line_bot_api.push_message(group_id, TextSendMessage(text=text))
+        line_messaging_service.push(group_id, TextSendMessage(text=text))
         return True
     except Exception as e:
         print(f"推播到群組失敗: {e}")
@@ -181,7 +182,7 @@ def send_course_created_message(line_user_id: str, course_name: str, gc_course_i
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="課程創建成功", contents=flex_message)
         )
@@ -398,7 +399,7 @@ def send_homework_created_message(line_user_id: str, homework_title: str, course
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="作業創建成功", contents=flex_message)
         )
@@ -425,7 +426,7 @@ def send_quick_reply(line_user_id: str):
     )
 
     try:
-        line_bot_api.push_message(line_user_id, message)
+        line_messaging_service.push(line_user_id, message)
         # print("Quick Reply 訊息已註解")
         return True
     except Exception as e:
@@ -623,7 +624,7 @@ def send_courses_list(line_user_id: str):
             }
         
         # 發送 Flex Message
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="課程列表", contents=flex_message)
         )
@@ -736,7 +737,7 @@ def send_create_course_guide(line_user_id: str):
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="建立課程指引", contents=flex_message)
         )
@@ -845,7 +846,7 @@ def send_add_homework_guide(line_user_id: str):
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="新增作業指引", contents=flex_message)
         )
@@ -960,7 +961,7 @@ def send_ask_question_guide(line_user_id: str):
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="課堂提問指引", contents=flex_message)
         )
@@ -1108,7 +1109,7 @@ def send_course_binding_success_message(group_id: str, course_id: str, bound_by_
             }
         }
         
-        line_bot_api.push_message(
+        line_messaging_service.push(
             group_id,
             FlexSendMessage(alt_text="課程綁定成功", contents=flex_message)
         )
@@ -1467,7 +1468,7 @@ def send_multiple_homework_created_message(line_user_id: str, homework_title: st
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="多個作業創建成功", contents=flex_message)
         )
@@ -1614,7 +1615,7 @@ def send_calendar_created_message(line_user_id: str, event_title: str, start_tim
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="行事曆創建成功", contents=flex_message)
         )
@@ -2094,7 +2095,7 @@ def send_note_created_message(line_user_id: str, note_id: int, text: str = "", i
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(alt_text="筆記創建成功", contents=flex_message)
         )
@@ -2528,7 +2529,7 @@ def send_homework_reminder_line(student_line_user_id: str, homework_title: str,
     }
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             student_line_user_id,
             FlexSendMessage(alt_text=f"作業提醒 - {homework_title}", contents=flex_message)
         )
@@ -2886,7 +2887,7 @@ def send_notification_result_to_teacher(teacher_line_user_id: str, homework_titl
     ])
     
     try:
-        line_bot_api.push_message(
+        line_messaging_service.push(
             teacher_line_user_id,
             FlexSendMessage(alt_text=f"通知發送完成 - {homework_title}", contents=flex_message)
         )
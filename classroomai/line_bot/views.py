@@ -1,10 +1,12 @@
 # line_bot/views.py
-import os, json, requests, secrets, re, time
+import os, json, requests, secrets, hmac
 from pathlib import Path
 from datetime import timedelta
 
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from linebot import LineBotApi, WebhookParser, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
@@ -14,7 +16,9 @@ from linebot.models import (
     LocationMessage, StickerMessage, PostbackEvent
 )
 from user.models import LineProfile  # 確保這是你的 LineProfile 模型
-from .models import OneTimeBindCode, GroupBinding, ConversationMessage
+from .models import OneTimeBindCode, GroupBinding
+from .bind_cache import BIND_CODE_RE, bind_code_filter, get_group_course_id
+from .conversation_buffer import conversation_buffer
 from line_bot.utils import (
     send_courses_list,
     send_create_course_guide,
@@ -23,6 +27,7 @@ from line_bot.utils import (
     send_ask_question_guide,
     hash_code,
 )
+from services.line_messaging_service import line_messaging_service
 from .flex_templates import (get_flex_template, create_custom_carousel, get_start_register_flex, get_register_done_flex, get_available_templates, get_template_categories)
 
 
@@ -181,25 +186,30 @@ def callback(request):
                 user_text = user_text_raw.strip().upper()
 
                 # 尋找 6 碼綁定碼（避免 I O 1 0）
-                match = re.search(r"\b([A-HJ-NP-Z2-9]{6})\b", user_text)
+                match = BIND_CODE_RE.search(user_text)
                 if match:
                     code = match.group(1)
                     code_hash_value = hash_code(code)
-                    bind_obj = OneTimeBindCode.objects.filter(code_hash=code_hash_value).order_by("-created_at").first()
+                    # Bloom filter / 負向快取先排除一般聊天內容，不查資料庫
+                    bind_obj = None
+                    if bind_code_filter.might_be_valid(code_hash_value):
+                        bind_obj = OneTimeBindCode.objects.filter(code_hash=code_hash_value).first()
+                        if not (bind_obj and bind_obj.is_valid()):
+                            bind_code_filter.mark_invalid(code_hash_value)
                     if bind_obj and bind_obj.is_valid():
-                        existing = GroupBinding.objects.filter(group_id=group_id).first()
-                        if existing:
-                            if existing.course_id == bind_obj.course_id:
+                        existing_course_id = get_group_course_id(group_id)
+                        if existing_course_id:
+                            if existing_course_id == bind_obj.course_id:
                                 # 已經綁定同一門課，提示即可，不消耗綁定碼
                                 line_bot_api.reply_message(
                                     ev.reply_token,
-                                    TextSendMessage(text=f"ℹ️ 本群已綁定課程 {existing.course_id}")
+                                    TextSendMessage(text=f"ℹ️ 本群已綁定課程 {existing_course_id}")
                                 )
                             else:
                                 # 已綁其他課程，禁止更換
                                 line_bot_api.reply_message(
                                     ev.reply_token,
-                                    TextSendMessage(text=f"❌ 本群已綁定其他課程 {existing.course_id}，如需更換請先解除綁定")
+                                    TextSendMessage(text=f"❌ 本群已綁定其他課程 {existing_course_id}，如需更換請先解除綁定")
                                 )
                         else:
                             # 建立綁定並消耗綁定碼
@@ -337,7 +347,7 @@ def callback(request):
                                 print(f"成功回覆 {template_name} Flex Message 給用戶 {line_user_id}")
                             except Exception as e:
                                 try:
-                                    line_bot_api.push_message(
+                                    line_messaging_service.push(
                                         line_user_id,
                                         FlexSendMessage(
                                             alt_text=template.get("altText", "功能選單"),
@@ -390,7 +400,7 @@ def callback(request):
 
                 # 儲存用戶訊息到資料庫
                 try:
-                    ConversationMessage.objects.create(
+                    conversation_buffer.add(
                         line_user_id=line_user_id,
                         message_type="user",
                         content=message_content,
@@ -445,33 +455,14 @@ def push_finish(line_user_id: str):
     
     try:
         profile = LineProfile.objects.get(pk=line_user_id)
-        # 發送註冊成功訊息
         register_done_flex = get_register_done_flex(profile.name, profile.role)
-        line_bot_api.push_message(
-            line_user_id,
-            FlexSendMessage(
-                alt_text=register_done_flex["altText"], 
-                contents=register_done_flex["contents"]
-            )
-        )
-        
-        # 延遲發送功能選單
-        time.sleep(1)  # 等待 1 秒
-        
-        main_menu_flex = get_flex_template("main_menu")
-        if main_menu_flex:
-            line_bot_api.push_message(
-                line_user_id,
-                FlexSendMessage(
-                    alt_text=main_menu_flex["altText"], 
-                    contents=main_menu_flex["contents"]
-                )
-            )
-            
     except LineProfile.DoesNotExist:
         # 找不到用戶資料時的處理
         register_done_flex = get_register_done_flex("使用者", "student")
-        line_bot_api.push_message(
+
+    # 註冊成功訊息與功能選單合併為同一次 push，依序送達
+    with line_messaging_service.coalesce():
+        line_messaging_service.push(
             line_user_id,
             FlexSendMessage(
                 alt_text=register_done_flex["altText"], 
@@ -479,12 +470,9 @@ def push_finish(line_user_id: str):
             )
         )
         
-        # 延遲發送功能選單
-        time.sleep(1)
-        
         main_menu_flex = get_flex_template("main_menu")
         if main_menu_flex:
-            line_bot_api.push_message(
+            line_messaging_service.push(
                 line_user_id,
                 FlexSendMessage(
                     alt_text=main_menu_flex["altText"], 
@@ -565,7 +553,7 @@ def api_line_push(request):
         return JsonResponse({"error": "missing to / text"}, status=400)
 
     try:
-        line_bot_api.push_message(to, TextSendMessage(text=text))
+        line_messaging_service.push(to, TextSendMessage(text=text))
         return JsonResponse({"ok": True})
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
@@ -643,7 +631,7 @@ def api_send_flex_message(request):
             alt_text=template.get("altText", "功能選單"),
             contents=template["contents"]
         )
-        line_bot_api.push_message(line_user_id, flex_message)
+        line_messaging_service.push(line_user_id, flex_message)
         
         return JsonResponse({
             "success": True,
@@ -744,7 +732,7 @@ def api_create_custom_carousel(request):
                     alt_text=carousel_template.get("altText", alt_text),
                     contents=carousel_template["contents"]
                 )
-                line_bot_api.push_message(send_to_user, flex_message)
+                line_messaging_service.push(send_to_user, flex_message)
                 response_data["sent_to_user"] = send_to_user
                 response_data["message"] += f" 並已發送給用戶 {send_to_user}"
             except Exception as e:
@@ -803,11 +791,20 @@ def api_get_template_categories(request):
             "message": f"獲取分類資訊失敗: {str(e)}"
         }, status=500)
 
+def _internal_token_valid(request) -> bool:
+    """設定 INTERNAL_API_TOKEN 時，檢查 X-Internal-Token 或 Bearer token（常數時間比較）"""
+    internal_token = getattr(settings, "INTERNAL_API_TOKEN", None)
+    if not internal_token:
+        return True
+    provided = request.headers.get("X-Internal-Token") or request.headers.get("Authorization", "").replace("Bearer ", "", 1)
+    return hmac.compare_digest(provided.encode("utf-8"), internal_token.encode("utf-8"))
+
+
 @csrf_exempt
 def api_send_flex_batch(request):
     """
-    API: 批量發送 Flex Message
-    POST /line_bot/api/flex/batch_send/
+    API: 批量發送 Flex Message（非同步）
+    POST /internal/api/flex/batch-send
     {
         "messages": [
             {
@@ -818,11 +815,15 @@ def api_send_flex_batch(request):
                 "line_user_id": "USER_ID_2", 
                 "template_name": "course_creation_guide"
             }
-        ]
+        ],
+        "chunk_size": 100  // 可選：每個區塊處理的收件者數量
     }
+    立即回傳 job_id，發送進度請查詢 GET /internal/api/flex/batch-jobs/<job_id>
     """
     if request.method != "POST":
         return JsonResponse({"error": "method_not_allowed"}, status=405)
+    if not _internal_token_valid(request):
+        return JsonResponse({"error": "unauthorized"}, status=401)
     
     try:
         data = json.loads(request.body.decode("utf-8")) if request.body else {}
@@ -834,68 +835,55 @@ def api_send_flex_batch(request):
     if not messages:
         return JsonResponse({"error": "missing_messages", "message": "需要提供訊息列表"}, status=400)
     
-    results = []
-    success_count = 0
-    failed_count = 0
-    
-    for msg in messages:
-        line_user_id = msg.get("line_user_id", "").strip()
-        template_name = msg.get("template_name", "").strip()
-        
-        if not line_user_id or not template_name:
-            results.append({
-                "line_user_id": line_user_id,
-                "template_name": template_name,
-                "success": False,
-                "error": "missing_required_fields"
-            })
-            failed_count += 1
-            continue
-        
-        # 獲取模板
-        template = get_flex_template(template_name)
-        if not template:
-            results.append({
-                "line_user_id": line_user_id,
-                "template_name": template_name,
-                "success": False,
-                "error": "template_not_found"
-            })
-            failed_count += 1
-            continue
-        
-        # 發送訊息
-        try:
-            flex_message = FlexSendMessage(
-                alt_text=template.get("altText", "功能選單"),
-                contents=template["contents"]
-            )
-            line_bot_api.push_message(line_user_id, flex_message)
-            
-            results.append({
-                "line_user_id": line_user_id,
-                "template_name": template_name,
-                "success": True,
-                "message": "發送成功"
-            })
-            success_count += 1
-            
-        except Exception as e:
-            results.append({
-                "line_user_id": line_user_id,
-                "template_name": template_name,
-                "success": False,
-                "error": f"send_failed: {str(e)}"
-            })
-            failed_count += 1
+    from services.flex_batch_service import FlexBatchService
+    from services.tasks import enqueue_task, send_flex_batch_job
+
+    job = FlexBatchService.create_job(messages, chunk_size=data.get("chunk_size"))
+    enqueue_task(send_flex_batch_job, str(job.job_id))
     
-    return JsonResponse({
-        "success": True,
-        "total_messages": len(messages),
-        "success_count": success_count,
-        "failed_count": failed_count,
-        "results": results
-    })
+    response = FlexBatchService.serialize(job, include_items=False)
+    response["success"] = True
+    return JsonResponse(response, status=202)
+
+
+@csrf_exempt
+def api_flex_batch_job(request, job_id):
+    """
+    API: 查詢批量發送工作狀態 / 重送失敗項目
+    GET  /internal/api/flex/batch-jobs/<job_id>        → 每位收件者的發送結果
+    POST /internal/api/flex/batch-jobs/<job_id>/retry  → 重送失敗項目
+    """
+    if not _internal_token_valid(request):
+        return JsonResponse({"error": "unauthorized"}, status=401)
+
+    from services.flex_batch_service import FlexBatchService
+    from .models import FlexBatchJob
+
+    job = FlexBatchJob.objects.filter(job_id=job_id).first()
+    if not job:
+        return JsonResponse({"error": "job_not_found"}, status=404)
+
+    if request.method == "GET":
+        response = FlexBatchService.serialize(job)
+        response["success"] = True
+        return JsonResponse(response)
+
+    if request.method == "POST" and request.path.rstrip("/").endswith("/retry"):
+        # 處理中超過 10 分鐘未更新視為 worker 已中斷，允許續傳
+        stalled = job.status == "running" and job.updated_at < timezone.now() - timedelta(minutes=10)
+        if job.status in ("pending", "running") and not stalled:
+            return JsonResponse({"error": "job_in_progress"}, status=409)
+
+        from services.tasks import enqueue_task, send_flex_batch_job
+
+        retried = FlexBatchService.retry_failed(job)
+        if retried:
+            enqueue_task(send_flex_batch_job, str(job.job_id))
+        response = FlexBatchService.serialize(job, include_items=False)
+        response.update({"success": True, "retried_count": retried})
+        return JsonResponse(response, status=202 if retried else 200)
+
+    return JsonResponse({"error": "method_not_allowed"}, status=405)
 
 def _get_template_description(template_name):
     """獲取模板描述"""
@@ -988,7 +976,7 @@ def api_n8n_response(request):
         
         # 儲存Bot回應到資料庫
         try:
-            ConversationMessage.objects.create(
+            conversation_buffer.add(
                 line_user_id=line_user_id,
                 message_type="bot",
                 content=cleaned_text,
@@ -1002,7 +990,7 @@ def api_n8n_response(request):
             print(f"儲存Bot回應失敗: {e}")
         
         # 發送給用戶
-        line_bot_api.push_message(
+        line_messaging_service.push(
             line_user_id, 
             TextSendMessage(text=cleaned_text)
         )
@@ -1019,6 +1007,52 @@ def api_n8n_response(request):
         return JsonResponse({"error": str(e)}, status=500)
 
 
+# 對話歷史查詢：keyset 分頁，format=ndjson 時串流匯出全部
+@csrf_exempt
+def api_conversation_history(request, line_user_id):
+    """
+    GET /internal/api/conversations/<line_user_id>?cursor=&limit=50&intent=&message_type=&format=ndjson
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "method_not_allowed"}, status=405)
+
+    if not _internal_token_valid(request):
+        return JsonResponse({"error": "unauthorized"}, status=401)
+
+    from .history import get_history_page, iter_history
+
+    intent = (request.GET.get("intent") or "").strip() or None
+    message_type = (request.GET.get("message_type") or "").strip() or None
+
+    if request.GET.get("format") == "ndjson":
+        rows = iter_history(line_user_id, intent=intent, message_type=message_type)
+        response = StreamingHttpResponse(
+            (json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n" for row in rows),
+            content_type="application/x-ndjson; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="conversations-{line_user_id}.ndjson"'
+        return response
+
+    try:
+        limit = int(request.GET.get("limit") or 50)
+        page = get_history_page(
+            line_user_id,
+            cursor=request.GET.get("cursor") or None,
+            limit=limit,
+            intent=intent,
+            message_type=message_type,
+        )
+    except ValueError:
+        return JsonResponse({"error": "invalid cursor / limit"}, status=400)
+
+    return JsonResponse({
+        "line_user_id": line_user_id,
+        "count": len(page["messages"]),
+        "messages": page["messages"],
+        "next_cursor": page["next_cursor"],
+    }, encoder=DjangoJSONEncoder, json_dumps_params={"ensure_ascii": False})
+
+
 # 群組綁定管理：GET 查詢、POST 建立/更新
 @csrf_exempt
 def api_group_bindings(request):
@@ -1177,7 +1211,7 @@ def render_flex(request):
             # 如果有 line_user_id，自動發送到 LINE
             if line_user_id:
                 try:
-                    line_bot_api.push_message(
+                    line_messaging_service.push(
                         line_user_id,
                         FlexSendMessage(
                             alt_text=flex_message.get('altText', '功能選單'),
@@ -1263,7 +1297,7 @@ def render_flex(request):
             # 發送訊息
             try:
                 if send_type == 'push':
-                    line_bot_api.push_message(
+                    line_messaging_service.push(
                         line_user_id,
                         FlexSendMessage(
                             alt_text=flex_message.get('altText', '功能選單'),
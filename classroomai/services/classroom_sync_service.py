@@ -399,7 +399,7 @@ class ClassroomSyncService:
             return timezone.now() + timezone.timedelta(days=7) 
    # Google API 呼叫方法（帶重試機制）
     
-    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0)
+    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0, endpoint='classroom.courses.list')
     def _get_courses_with_retry(self) -> Dict:
         """
         獲取課程列表（帶重試機制）
@@ -447,7 +447,7 @@ class ClassroomSyncService:
         response['courses'] = current_courses
         return response
     
-    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0)
+    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0, endpoint='classroom.courses.get')
     def _get_course_with_retry(self, course_id: str) -> Dict:
         """
         獲取單一課程資訊（帶重試機制）
@@ -460,7 +460,7 @@ class ClassroomSyncService:
         """
         return self.classroom_service.courses().get(id=course_id).execute()
     
-    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0)
+    @retry_on_error(max_retries=3, delay=1.0, backoff=2.0, endpoint='classroom.courseWork.list')
     def _get_coursework_with_retry(self, course_id: str) -> Dict:
         """
         獲取課程作業列表（帶重試機制）
@@ -639,4 +639,4 @@ class ClassroomSyncService:
             # 其他錯誤時，根據截止日期判斷狀態
             if due_date and timezone.now() > due_date:
                 return 'overdue'
-            return 'pending'
\ No newline at end of file
+            return 'pending'
\ No newline at end of file
@@ -0,0 +1,388 @@
+"""
+課程匯入服務
+- 課表時段衝突檢查：一次載入使用者既有課表，每個星期幾一棵區間樹，於記憶體中比對
+  匯入資料（包含同一批匯入彼此之間）的時段
+- 檔案匯入（CSV / iCal / Excel）：逐批驗證資料列、每批一次查詢比對既有課程去除重複
+- 通過檢查的課程與時段在同一個交易內以 bulk_create 寫入
+"""
+import logging
+from datetime import datetime, time as dt_time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+
+from api_v2.models import CourseV2, CourseScheduleV2
+from .dashboard_summary_service import DashboardSummaryService
+from .search_service import SearchService
+
+logger = logging.getLogger(__name__)
+
+# (day_of_week, start, end, 原始 start 字串, 原始 end 字串)
+ParsedSlot = Tuple[int, dt_time, dt_time, str, str]
+
+# 檔案匯入欄位長度上限（對應 CourseV2 欄位）
+COURSE_FIELD_LIMITS = {
+    'title': 255,
+    'instructor': 100,
+    'classroom': 100,
+}
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'payload', 'max_end', 'left', 'right')
+
+    def __init__(self, start: dt_time, end: dt_time, payload: Dict):
+        self.start = start
+        self.end = end
+        self.payload = payload
+        self.max_end = end
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+
+
+class IntervalTree:
+    """
+    以開始時間為鍵、節點記錄子樹最大結束時間的區間樹
+    初始資料以排序後取中位數的方式建立成平衡樹，之後的插入（同批匯入）數量很少
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[dt_time, dt_time, Dict]] = ()):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._root = self._build(items, 0, len(items))
+
+    def _build(self, items, lo: int, hi: int) -> Optional[_Node]:
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = _Node(*items[mid])
+        node.left = self._build(items, lo, mid)
+        node.right = self._build(items, mid + 1, hi)
+        for child in (node.left, node.right):
+            if child and child.max_end > node.max_end:
+                node.max_end = child.max_end
+        return node
+
+    def insert(self, start: dt_time, end: dt_time, payload: Dict) -> None:
+        new = _Node(start, end, payload)
+        if self._root is None:
+            self._root = new
+            return
+        node = self._root
+        while True:
+            if end > node.max_end:
+                node.max_end = end
+            side = 'left' if (start, end) < (node.start, node.end) else 'right'
+            child = getattr(node, side)
+            if child is None:
+                setattr(node, side, new)
+                return
+            node = child
+
+    def overlapping(self, start: dt_time, end: dt_time) -> List[Dict]:
+        """回傳與 [start, end) 重疊（start < 既有 end 且 end > 既有 start）的所有區間 payload"""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            # 子樹內所有區間都在查詢開始前結束
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append(node.payload)
+                stack.append(node.right)
+        return found
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_slots(schedule: Optional[List[Dict]]) -> List[ParsedSlot]:
+    """解析匯入資料中的時段（格式錯誤的時段直接略過）"""
+    slots = []
+    for sch in schedule or []:
+        try:
+            dow = int(sch.get('day_of_week'))
+            start = sch.get('start') or ''
+            end = sch.get('end') or ''
+            if 0 <= dow <= 6 and start and end:
+                slots.append((
+                    dow,
+                    datetime.strptime(start, '%H:%M').time(),
+                    datetime.strptime(end, '%H:%M').time(),
+                    start,
+                    end,
+                ))
+        except (TypeError, ValueError):
+            continue
+    return slots
+
+
+class ScheduleConflictEngine:
+    """使用者課表的時段衝突檢查"""
+
+    def __init__(self, existing: Iterable[Dict]):
+        """
+        Args:
+            existing: 既有時段，需含 day_of_week / start_time / end_time 與 conflicting_course 描述
+        """
+        by_day: Dict[int, List] = {}
+        for slot in existing:
+            by_day.setdefault(slot['day_of_week'], []).append(
+                (slot['start_time'], slot['end_time'], slot['conflicting_course'])
+            )
+        self._trees = {day: IntervalTree(intervals) for day, intervals in by_day.items()}
+
+    @classmethod
+    def for_user(cls, user) -> 'ScheduleConflictEngine':
+        """一次查詢載入使用者所有既有時段"""
+        rows = CourseScheduleV2.objects.filter(course__user=user).values(
+            'day_of_week', 'start_time', 'end_time',
+            'course_id', 'course__title', 'course__instructor', 'course__classroom',
+        )
+        return cls(
+            {
+                'day_of_week': row['day_of_week'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'conflicting_course': {
+                    'id': row['course_id'],
+                    'title': row['course__title'],
+                    'instructor': row['course__instructor'],
+                    'classroom': row['course__classroom'],
+                    'start_time': row['start_time'].strftime('%H:%M'),
+                    'end_time': row['end_time'].strftime('%H:%M'),
+                    'source': 'existing',
+                },
+            }
+            for row in rows
+        )
+
+    def conflicts(self, slots: List[ParsedSlot]) -> List[Dict]:
+        """列出每個時段衝突到的既有 / 已接受課程"""
+        result = []
+        for dow, st, et, start, end in slots:
+            tree = self._trees.get(dow)
+            if tree is None:
+                continue
+            for course in tree.overlapping(st, et):
+                result.append({
+                    'day_of_week': dow,
+                    'start_time': start,
+                    'end_time': end,
+                    'conflicting_course': course,
+                })
+        return result
+
+    def accept(self, item: Dict, index: int, slots: List[ParsedSlot]) -> None:
+        """把已接受的匯入課程時段加入樹中，後續項目會與其比對"""
+        for dow, st, et, start, end in slots:
+            course = {
+                'id': None,
+                'title': item.get('title', ''),
+                'instructor': item.get('instructor', ''),
+                'classroom': item.get('classroom', ''),
+                'start_time': start,
+                'end_time': end,
+                'source': 'import',
+                'import_index': index,
+            }
+            self._trees.setdefault(dow, IntervalTree()).insert(st, et, course)
+
+    def plan(self, items: List[Dict]) -> List[Dict]:
+        """
+        依序檢查匯入項目；沒有衝突的項目會被接受並參與後續項目的檢查
+
+        Returns:
+            List[Dict]: 每個項目 {'item', 'slots', 'conflicts'}
+        """
+        planned = []
+        for index, item in enumerate(items):
+            slots = parse_slots(item.get('schedule'))
+            conflicts = self.conflicts(slots)
+            if not conflicts:
+                self.accept(item, index, slots)
+            planned.append({'item': item, 'slots': slots, 'conflicts': conflicts})
+        return planned
+
+
+class CourseImportService:
+    """課程匯入服務"""
+
+    @staticmethod
+    def _dedupe_key(title: str, instructor: str) -> Tuple[str, str]:
+        return title.strip().casefold(), (instructor or '').strip().casefold()
+
+    @staticmethod
+    def preview_timetable(user, items: List[Dict]) -> List[Dict]:
+        """回傳附帶衝突資訊的匯入項目（不寫入資料庫）"""
+        planned = ScheduleConflictEngine.for_user(user).plan(items)
+        result = []
+        for entry in planned:
+            item = entry['item'].copy()
+            item['conflicts'] = entry['conflicts']
+            item['has_conflicts'] = bool(entry['conflicts'])
+            result.append(item)
+        return result
+
+    @staticmethod
+    def import_timetable(user, items: List[Dict]) -> Dict:
+        """
+        跳過有衝突的課程，其餘課程與時段在同一個交易內批次建立
+
+        Returns:
+            Dict: coursesCreated / courseIds / schedulesCreated / skippedCourses / totalProcessed
+        """
+        planned = ScheduleConflictEngine.for_user(user).plan(items)
+
+        courses, schedules, skipped = [], [], []
+        for entry in planned:
+            item = entry['item']
+            if entry['conflicts']:
+                skipped.append({
+                    'title': item.get('title', ''),
+                    'reason': '時段衝突',
+                    'conflicts': entry['conflicts'],
+                })
+                continue
+            course = CourseV2(
+                user=user,
+                title=(item.get('title') or '')[:255],
+                description='',
+                instructor=(item.get('instructor') or '')[:100],
+                classroom=(item.get('classroom') or '')[:100],
+            )
+            courses.append(course)
+            schedules.extend(
+                CourseScheduleV2(
+                    course=course,
+                    day_of_week=dow,
+                    start_time=st,
+                    end_time=et,
+                    location=course.classroom or '',
+                )
+                for dow, st, et, _, _ in entry['slots']
+            )
+
+        CourseImportService.bulk_persist(user, courses, schedules)
+        return {
+            'coursesCreated': len(courses),
+            'courseIds': [str(course.id) for course in courses],
+            'schedulesCreated': len(schedules),
+            'skippedCourses': skipped,
+            'totalProcessed': len(items),
+        }
+
+    @staticmethod
+    def import_courses(user, items: Iterable[Dict], dry_run: bool = False, batch_size: int = 500) -> Dict:
+        """
+        檔案匯入課程，每 batch_size 列一批：驗證 → 一次查詢比對既有課程去除重複 → bulk_create
+        所有批次在同一個交易內，寫入全部成功或全部失敗；驗證失敗的列只會列入 errors
+        items 可為解析器的 generator，記憶體用量與檔案大小無關
+
+        Args:
+            user: LineProfile
+            items: 解析器輸出的課程資料
+            dry_run: True 時只回傳驗證結果，不寫入資料庫
+            batch_size: 每批筆數
+
+        Returns:
+            Dict: count / ids / duplicates / errors / total / dryRun
+        """
+        result = {'count': 0, 'ids': [], 'duplicates': [], 'errors': [], 'total': 0, 'dryRun': dry_run}
+        seen = set()
+        created_ids = []
+        with transaction.atomic():
+            for chunk in _chunked(enumerate(items, start=1), batch_size):
+                result['total'] += len(chunk)
+                candidates = CourseImportService._validate_rows(chunk, result['errors'])
+                courses = CourseImportService._dedupe(user, candidates, seen, result['duplicates'])
+                result['count'] += len(courses)
+                if courses and not dry_run:
+                    CourseV2.objects.bulk_create(courses, batch_size=batch_size)
+                    created_ids.extend(course.id for course in courses)
+            if created_ids:
+                transaction.on_commit(lambda: CourseImportService._refresh_derived(user, created_ids))
+
+        result['ids'] = [str(pk) for pk in created_ids]
+        return result
+
+    @staticmethod
+    def _validate_rows(rows: List[Tuple[int, Dict]], errors: List[Dict]) -> List[Tuple[int, Dict]]:
+        candidates = []
+        for row, item in rows:
+            values = {
+                field: str(item.get(field) or '').strip()
+                for field in ('title', 'description', 'instructor', 'classroom')
+            }
+            if not values['title']:
+                errors.append({'row': row, 'title': '', 'error': '缺少課程名稱'})
+                continue
+            too_long = [
+                f'{field} 超過 {limit} 字' for field, limit in COURSE_FIELD_LIMITS.items()
+                if len(values[field]) > limit
+            ]
+            if too_long:
+                errors.append({'row': row, 'title': values['title'][:255], 'error': '、'.join(too_long)})
+                continue
+            candidates.append((row, values))
+        return candidates
+
+    @staticmethod
+    def _dedupe(user, candidates: List[Tuple[int, Dict]], seen: set, duplicates: List[Dict]) -> List[CourseV2]:
+        """去除與既有課程（一次查詢）或檔案內先前資料列重複的課程"""
+        # 以不分大小寫的標題查詢，與 _dedupe_key 一致（不依賴資料庫 collation）
+        existing = {
+            CourseImportService._dedupe_key(title, instructor)
+            for title, instructor in CourseV2.objects.filter(user=user).annotate(
+                title_key=Lower(Trim('title')),
+            ).filter(
+                title_key__in={values['title'].strip().lower() for _, values in candidates}
+            ).values_list('title', 'instructor')
+        } if candidates else set()
+
+        courses = []
+        for row, values in candidates:
+            key = CourseImportService._dedupe_key(values['title'], values['instructor'])
+            if key in existing or key in seen:
+                duplicates.append({
+                    'row': row,
+                    'title': values['title'],
+                    'reason': '課程已存在' if key in existing else '檔案內重複',
+                })
+                continue
+            seen.add(key)
+            courses.append(CourseV2(user=user, **values))
+        return courses
+
+    @staticmethod
+    def bulk_persist(user, courses: List[CourseV2], schedules: List[CourseScheduleV2],
+                     batch_size: int = 500) -> None:
+        """在單一交易內批次寫入課程與時段"""
+        if not courses:
+            return
+        with transaction.atomic():
+            CourseV2.objects.bulk_create(courses, batch_size=batch_size)
+            if schedules:
+                CourseScheduleV2.objects.bulk_create(schedules, batch_size=batch_size)
+            course_ids = [course.id for course in courses]
+            transaction.on_commit(lambda: CourseImportService._refresh_derived(user, course_ids))
+
+    @staticmethod
+    def _refresh_derived(user, course_ids: List, batch_size: int = 500) -> None:
+        """bulk_create 不會觸發 post_save，提交後重建儀表板統計並補建搜尋索引"""
+        try:
+            DashboardSummaryService.rebuild(user.line_user_id)
+            for chunk in _chunked(course_ids, batch_size):
+                SearchService.rebuild(CourseV2.objects.filter(id__in=chunk))
+        except Exception as e:
+            logger.error(f"Failed to refresh derived data after import for {user.line_user_id}: {str(e)}")
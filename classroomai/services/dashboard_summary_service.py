@@ -0,0 +1,132 @@
+"""
+儀表板統計服務
+以條件聚合一次算出課程 / 作業統計，並維護每位使用者的物化統計資料
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.db import IntegrityError
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from api_v2.models import CourseV2, AssignmentV2, UserDashboardSummary
+
+logger = logging.getLogger(__name__)
+
+# 增量只以 F() 更新、不會改動 updated_at；超過此時間未完整重算時讀取會重新計算，修正併發造成的偏差
+SUMMARY_MAX_AGE = timedelta(minutes=15)
+
+ASSIGNMENT_STATUS_FIELDS = {
+    'pending': 'assignments_pending',
+    'completed': 'assignments_completed',
+    'overdue': 'assignments_overdue',
+}
+
+
+class DashboardSummaryService:
+    """儀表板統計服務"""
+
+    @staticmethod
+    def compute_counts(user_id: str) -> Dict[str, int]:
+        """
+        以條件聚合計算統計（課程、作業各一次查詢）
+
+        Returns:
+            Dict: 對應 UserDashboardSummary 欄位的統計值
+        """
+        counts = CourseV2.objects.filter(user_id=user_id).aggregate(
+            courses_local=Count('id', filter=Q(is_google_classroom=False)),
+            courses_mirror=Count('id', filter=Q(is_google_classroom=True)),
+        )
+        counts.update(AssignmentV2.objects.filter(user_id=user_id).aggregate(
+            assignments_local=Count('id', filter=Q(google_coursework_id__isnull=True)),
+            assignments_mirror=Count('id', filter=Q(google_coursework_id__isnull=False)),
+            assignments_pending=Count('id', filter=Q(status='pending')),
+            assignments_completed=Count('id', filter=Q(status='completed')),
+            assignments_overdue=Count('id', filter=Q(status='overdue')),
+        ))
+        return counts
+
+    @staticmethod
+    def rebuild(user_id: str) -> UserDashboardSummary:
+        """重新計算並覆寫物化統計"""
+        summary, _ = UserDashboardSummary.objects.update_or_create(
+            user_id=user_id,
+            defaults=DashboardSummaryService.compute_counts(user_id),
+        )
+        return summary
+
+    @staticmethod
+    def get_summary(user_id: str) -> UserDashboardSummary:
+        """取得物化統計（單一主鍵查詢），不存在時建立，超過 SUMMARY_MAX_AGE 時重新計算"""
+        summary = UserDashboardSummary.objects.filter(user_id=user_id).first()
+        if summary is not None:
+            if summary.updated_at < timezone.now() - SUMMARY_MAX_AGE:
+                return DashboardSummaryService.rebuild(user_id)
+            return summary
+        try:
+            return UserDashboardSummary.objects.create(
+                user_id=user_id, **DashboardSummaryService.compute_counts(user_id)
+            )
+        except IntegrityError:
+            # 併發請求已先建立
+            return UserDashboardSummary.objects.get(user_id=user_id)
+
+    @staticmethod
+    def count_upcoming(user_id: str, days: int = 7) -> int:
+        """即將到期的待完成作業數（與時間相關，無法物化；使用 user/status/due_date 索引）"""
+        now = timezone.now()
+        return AssignmentV2.objects.filter(
+            user_id=user_id,
+            status='pending',
+            due_date__gte=now,
+            due_date__lte=now + timedelta(days=days),
+        ).count()
+
+    @staticmethod
+    def _apply(user_id: str, deltas: Dict[str, int]) -> None:
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not user_id or not deltas:
+            return
+        # 尚未建立的統計列不需更新，下次讀取時會完整計算
+        UserDashboardSummary.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+    @staticmethod
+    def course_changed(old: Optional[Dict], new: Optional[Dict]) -> None:
+        """
+        課程新增 / 修改 / 刪除後套用增量
+
+        Args:
+            old: 變更前 {'user_id', 'is_google_classroom'}，新增時為 None
+            new: 變更後同上，刪除時為 None
+        """
+        if old == new:
+            return
+        for state, sign in ((old, -1), (new, 1)):
+            if state:
+                field = 'courses_mirror' if state['is_google_classroom'] else 'courses_local'
+                DashboardSummaryService._apply(state['user_id'], {field: sign})
+
+    @staticmethod
+    def assignment_changed(old: Optional[Dict], new: Optional[Dict]) -> None:
+        """
+        作業新增 / 修改 / 刪除後套用增量
+
+        Args:
+            old: 變更前 {'user_id', 'google_coursework_id', 'status'}，新增時為 None
+            new: 變更後同上，刪除時為 None
+        """
+        if old == new:
+            return
+        for state, sign in ((old, -1), (new, 1)):
+            if not state:
+                continue
+            is_mirror = state['google_coursework_id'] is not None
+            deltas = {'assignments_mirror' if is_mirror else 'assignments_local': sign}
+            status_field = ASSIGNMENT_STATUS_FIELDS.get(state['status'])
+            if status_field:
+                deltas[status_field] = sign
+            DashboardSummaryService._apply(state['user_id'], deltas)
@@ -3,6 +3,8 @@ from typing import Optional
 
 from openai import OpenAI
 
+from services.llm_clients import get_openai_client, track_call
+
 
 def _get_api_key() -> str:
 	"""取得 DeepSeek API Key。
@@ -23,23 +25,29 @@ def is_available() -> bool:
 
 
 def _client() -> OpenAI:
+	"""共用的 DeepSeek 用戶端（每組 base_url + key 只建立一次，重複使用連線池）。"""
 	base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
-	return OpenAI(api_key=_get_api_key(), base_url=base_url)
+	return get_openai_client("deepseek", base_url, _get_api_key())
 
 
-def generate_json(prompt: str, system: Optional[str] = None, model: Optional[str] = None) -> str:
-	"""以 DeepSeek 產生嚴格 JSON 字串（非流式）。"""
+def generate_json(prompt: str, system: Optional[str] = None, model: Optional[str] = None,
+				  call_site: str = "deepseek.generate_json") -> str:
+	"""以 DeepSeek 產生嚴格 JSON 字串（非流式）。
+	call_site 用於統計各呼叫位置的延遲、token 與錯誤數（見 services.llm_clients）。
+	"""
 	client = _client()
 	model_name = model or os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 	sys_msg = (system or "") + "\nYou must output STRICT JSON only. No prose, no markdown."
-	r = client.chat.completions.create(
-		model=model_name,
-		messages=[
-			{"role": "system", "content": sys_msg},
-			{"role": "user", "content": prompt},
-		],
-		stream=False,
-	)
+	with track_call(call_site, "deepseek", model_name) as call:
+		r = client.chat.completions.create(
+			model=model_name,
+			messages=[
+				{"role": "system", "content": sys_msg},
+				{"role": "user", "content": prompt},
+			],
+			stream=False,
+		)
+		call.usage_from(r)
 	text = (r.choices[0].message.content or "").strip()
 	if text.startswith("```") and text.endswith("```"):
 		text = text.strip("`\n")
@@ -0,0 +1,49 @@
+"""
+嵌入向量快取（資料庫）
+以 (模型名稱, 文字 SHA-256) 為鍵，讓相同文字在不同請求、不同 worker 之間只嵌入一次
+"""
+import hashlib
+import logging
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# 單次 IN 查詢的鍵數上限
+LOOKUP_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_many(model_name: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+    """回傳已快取的 {文字雜湊: 向量}；資料庫無法使用時回傳空 dict"""
+    from api_v2.models import EmbeddingCache
+
+    hashes = list(hashes)
+    found: Dict[str, List[float]] = {}
+    try:
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            found.update(EmbeddingCache.objects.filter(
+                model_name=model_name,
+                text_sha256__in=hashes[start:start + LOOKUP_BATCH_SIZE],
+            ).values_list('text_sha256', 'vector'))
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {str(e)}")
+    return found
+
+
+def put_many(model_name: str, vectors: Dict[str, List[float]]) -> None:
+    """寫入 {文字雜湊: 向量}；其他 worker 同時寫入相同鍵時忽略"""
+    from api_v2.models import EmbeddingCache
+
+    if not vectors:
+        return
+    try:
+        EmbeddingCache.objects.bulk_create(
+            [EmbeddingCache(model_name=model_name, text_sha256=h, vector=v) for h, v in vectors.items()],
+            batch_size=LOOKUP_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    except Exception as e:
+        logger.warning(f"Embedding cache write failed: {str(e)}")
@@ -3,11 +3,18 @@
 統一處理 Google API 錯誤和業務邏輯錯誤
 """
 import logging
+import math
+import random
+import threading
 import time
-from typing import Dict, Any, Optional, Callable
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Tuple
 from functools import wraps
 from googleapiclient.errors import HttpError
-from django.utils import timezone
+from django.conf import settings
+from django.core.cache import caches
 from rest_framework.response import Response
 from rest_framework import status
 
@@ -199,44 +206,245 @@ class APIErrorHandler:
         return Response(error_dict, status=http_status)
 
 
-def retry_on_error(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0):
+# 可重試的 Google API 狀態碼（配額 / 伺服器暫時錯誤）
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# 連線層錯誤同樣視為暫時性錯誤
+RETRYABLE_EXCEPTIONS = (TimeoutError, ConnectionError)
+# 等待並行呼叫名額的最長秒數
+GOOGLE_API_SLOT_TIMEOUT = 30
+
+
+class GoogleAPIUnavailable(Exception):
+    """Google API 端點的斷路器開啟中，或並行呼叫名額已滿，請求未送出"""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(f'Google 服務暫時無法使用，請在 {retry_after} 秒後再試')
+
+
+def _is_user_quota_error(error: HttpError) -> bool:
+    """是否為單一使用者的配額限制（userRateLimitExceeded / 每使用者 quota），與服務本身是否正常無關"""
+    content = error.content.decode('utf-8', 'replace').lower() if error.content else ''
+    if 'userratelimitexceeded' in content:
+        return True
+    return 'rate_limit_exceeded' in content and 'peruser' in content
+
+
+def _retry_after_seconds(error: HttpError) -> Optional[float]:
+    """解析 Retry-After 標頭（秒數或 HTTP 日期）"""
+    value = error.resp.get('retry-after') if error.resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt_timezone.utc)
+    return max((when - datetime.now(dt_timezone.utc)).total_seconds(), 0.0)
+
+
+class CircuitBreakerRegistry:
     """
-    重試裝飾器，用於處理暫時性錯誤
-    
+    Google API 各端點的斷路器（狀態存放於 Django cache，所有 worker / Celery 行程共用）
+
+    - closed：window 秒內失敗達 threshold 次即開啟
+    - open：cooldown 秒內直接拋出 GoogleAPIUnavailable，不送出請求
+    - half_open：冷卻結束後只放行一個試探請求，成功即關閉，失敗則重新開啟
+    """
+
+    KEY_PREFIX = 'breaker'
+    DEFAULTS = {'threshold': 5, 'window': 60, 'cooldown': 30}
+
+    def __init__(self, cache_alias: str = 'default'):
+        self.cache_alias = cache_alias
+        self.endpoints = set()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def config(self) -> Dict[str, int]:
+        config = dict(self.DEFAULTS)
+        config.update(getattr(settings, 'GOOGLE_API_BREAKER', None) or {})
+        return config
+
+    def _keys(self, endpoint: str) -> Tuple[str, str, str]:
+        base = f'{self.KEY_PREFIX}:{endpoint}'
+        return f'{base}:failures', f'{base}:open_until', f'{base}:probe'
+
+    def register(self, endpoint: str) -> None:
+        self.endpoints.add(endpoint)
+
+    def before_call(self, endpoint: str, retrying: bool = False) -> None:
+        """
+        斷路器開啟時拋出 GoogleAPIUnavailable；半開時只讓一個請求通過
+
+        Args:
+            retrying: 同一次呼叫的重試，只檢查是否開啟，不再競爭半開的試探名額
+        """
+        _, open_key, probe_key = self._keys(endpoint)
+        try:
+            open_until = self.cache.get(open_key)
+            if open_until is None:
+                return
+            remaining = open_until - time.time()
+            if remaining > 0:
+                raise GoogleAPIUnavailable(endpoint, math.ceil(remaining))
+            if retrying or self.cache.add(probe_key, 1, timeout=self.config['cooldown']):
+                return
+        except GoogleAPIUnavailable:
+            raise
+        except Exception as e:
+            # cache 無法使用時不阻擋請求
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+            return
+        raise GoogleAPIUnavailable(endpoint, 1)
+
+    def record_success(self, endpoint: str) -> None:
+        try:
+            self.cache.delete_many(list(self._keys(endpoint)))
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+
+    def record_failure(self, endpoint: str) -> bool:
+        """記錄一次失敗的呼叫（重試用盡後才記錄），回傳斷路器是否因此開啟"""
+        failures_key, _, probe_key = self._keys(endpoint)
+        config = self.config
+        try:
+            self.cache.add(failures_key, 0, timeout=config['window'])
+            try:
+                failures = self.cache.incr(failures_key)
+            except ValueError:
+                self.cache.set(failures_key, 1, timeout=config['window'])
+                failures = 1
+            if failures >= config['threshold'] or self.cache.get(probe_key) is not None:
+                self.trip(endpoint, config['cooldown'])
+                return True
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+        return False
+
+    def trip(self, endpoint: str, seconds: float) -> None:
+        """開啟斷路器 seconds 秒"""
+        failures_key, open_key, probe_key = self._keys(endpoint)
+        try:
+            # 冷卻結束後保留一段時間的半開狀態，期間沒有請求則自動關閉
+            self.cache.set(open_key, time.time() + seconds, timeout=int(seconds) + 3600)
+            self.cache.delete_many([failures_key, probe_key])
+        except Exception as e:
+            logger.warning(f"Circuit breaker cache unavailable: {str(e)}")
+            return
+        logger.warning(f"Circuit breaker opened for {endpoint} ({seconds:.0f}s)")
+
+    def state(self, endpoint: str) -> Dict[str, Any]:
+        failures_key, open_key, _ = self._keys(endpoint)
+        try:
+            open_until = self.cache.get(open_key)
+            failures = self.cache.get(failures_key) or 0
+        except Exception:
+            return {'state': 'unknown', 'failures': 0, 'retry_after': 0}
+        if open_until is None:
+            return {'state': 'closed', 'failures': failures, 'retry_after': 0}
+        remaining = open_until - time.time()
+        if remaining > 0:
+            return {'state': 'open', 'failures': failures, 'retry_after': math.ceil(remaining)}
+        return {'state': 'half_open', 'failures': failures, 'retry_after': 0}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: self.state(endpoint) for endpoint in sorted(self.endpoints)}
+
+
+# 全域斷路器實例
+google_api_breakers = CircuitBreakerRegistry()
+
+_slots_lock = threading.Lock()
+_google_api_slots: Optional[threading.BoundedSemaphore] = None
+
+
+@contextmanager
+def _google_api_slot(endpoint: str):
+    """限制每個行程同時進行的 Google API 呼叫數（GOOGLE_API_MAX_CONCURRENCY）"""
+    global _google_api_slots
+    if _google_api_slots is None:
+        with _slots_lock:
+            if _google_api_slots is None:
+                _google_api_slots = threading.BoundedSemaphore(getattr(settings, 'GOOGLE_API_MAX_CONCURRENCY', 8))
+    if not _google_api_slots.acquire(timeout=GOOGLE_API_SLOT_TIMEOUT):
+        raise GoogleAPIUnavailable(endpoint, 1)
+    try:
+        yield
+    finally:
+        _google_api_slots.release()
+
+
+def retry_on_error(max_retries: int = 3, delay: float = 1.0, backoff: float = 2.0,
+                   endpoint: str = None, max_delay: float = 30.0):
+    """
+    Google API 重試裝飾器（共用重試策略）
+    - 只重試 429 / 5xx 與連線錯誤，其他錯誤直接拋出
+    - 等待時間採 full jitter（0 ~ delay * backoff^n 之間隨機），避免所有使用者同時重試
+    - 有 Retry-After 時至少等到該時間；超過 max_delay 則不再重試，並依 Retry-After 開啟斷路器
+    - 每次呼叫在重試用盡後才記錄一次失敗；單一使用者的配額限制（userRateLimitExceeded）不計入斷路器
+    - 斷路器開啟後（包括其他請求造成的）不再重試，之後的呼叫直接拋出 GoogleAPIUnavailable
+
     Args:
         max_retries: 最大重試次數
         delay: 初始延遲時間（秒）
         backoff: 延遲時間倍數
+        endpoint: 斷路器名稱，預設為函式名稱
+        max_delay: 單次等待上限（秒）
     """
     def decorator(func: Callable) -> Callable:
+        name = endpoint or func.__name__
+        google_api_breakers.register(name)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            current_delay = delay
-            
             for attempt in range(max_retries + 1):
+                google_api_breakers.before_call(name, retrying=attempt > 0)
+                retry_after = None
                 try:
-                    return func(*args, **kwargs)
+                    with _google_api_slot(name):
+                        result = func(*args, **kwargs)
                 except HttpError as e:
-                    last_exception = e
-                    
-                    # 只對特定錯誤進行重試
-                    if e.resp.status in [429, 500, 502, 503, 504]:
-                        if attempt < max_retries:
-                            logger.warning(f"Attempt {attempt + 1} failed with {e.resp.status}, retrying in {current_delay}s...")
-                            time.sleep(current_delay)
-                            current_delay *= backoff
-                            continue
-                    
-                    # 不可重試的錯誤直接拋出
-                    raise e
-                except Exception as e:
-                    # 其他錯誤不重試
-                    raise e
-            
-            # 所有重試都失敗
-            raise last_exception
-        
+                    if e.resp.status not in RETRYABLE_STATUSES:
+                        # 服務有回應，只是請求本身無效（權限、找不到資源等）
+                        google_api_breakers.record_success(name)
+                        raise
+                    user_quota = _is_user_quota_error(e)
+                    retry_after = _retry_after_seconds(e)
+                    if retry_after is not None and retry_after > max_delay:
+                        if not user_quota:
+                            # 服務要求的等待時間過長，直接開啟斷路器，其他請求也不再送出
+                            google_api_breakers.trip(name, retry_after)
+                        raise
+                    if attempt >= max_retries:
+                        if not user_quota:
+                            google_api_breakers.record_failure(name)
+                        raise
+                    reason = e.resp.status
+                except RETRYABLE_EXCEPTIONS as e:
+                    if attempt >= max_retries:
+                        google_api_breakers.record_failure(name)
+                        raise
+                    reason = type(e).__name__
+                else:
+                    google_api_breakers.record_success(name)
+                    return result
+
+                wait = random.uniform(0, min(max_delay, delay * backoff ** attempt))
+                if retry_after is not None:
+                    wait = max(wait, retry_after)
+                logger.warning(f"{name} attempt {attempt + 1} failed with {reason}, retrying in {wait:.1f}s...")
+                time.sleep(wait)
+
         return wrapper
     return decorator
 
@@ -255,6 +463,17 @@ def handle_api_errors(func: Callable) -> Callable:
             error_dict = APIErrorHandler.handle_google_api_error(e)
             return APIErrorHandler.create_error_response(error_dict)
         
+        except GoogleAPIUnavailable as e:
+            logger.warning(f"Google API unavailable in {func.__name__}: {e.endpoint}")
+            response = APIErrorHandler.create_error_response({
+                'error': 'google_api_unavailable',
+                'message': str(e),
+                'code': 'GOOGLE_SERVICE_UNAVAILABLE',
+                'retry_after': e.retry_after
+            }, status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+        
         except ValueError as e:
             error_dict = APIErrorHandler.handle_validation_error(e)
             return APIErrorHandler.create_error_response(error_dict)
@@ -278,58 +497,122 @@ def handle_api_errors(func: Callable) -> Callable:
 
 class RateLimiter:
     """
-    簡單的速率限制器
+    滑動視窗速率限制器（存放於 Django cache，所有 worker / Celery 行程共用）
+
+    每個鍵只保存目前與上一個固定視窗的兩個計數器，以上一視窗計數依重疊比例加權估算滑動視窗內的請求數；
+    計數以 cache.add + cache.incr 原子遞增，兩個視窗後由 TTL 自動清除。
+    需使用共用的 cache 後端（Redis）；本機預設的 LocMemCache 只在單一行程內有效。
     """
-    
-    def __init__(self):
-        self.requests = {}
-    
-    def is_allowed(self, key: str, limit: int, window: int) -> bool:
+
+    KEY_PREFIX = 'ratelimit'
+
+    def __init__(self, cache_alias: str = 'default'):
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _incr(self, cache_key: str, ttl: int) -> int:
+        self.cache.add(cache_key, 0, timeout=ttl)
+        try:
+            return self.cache.incr(cache_key)
+        except ValueError:
+            # add 與 incr 之間剛好過期
+            self.cache.set(cache_key, 1, timeout=ttl)
+            return 1
+
+    def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
         """
-        檢查是否允許請求
-        
+        記錄一次請求並檢查是否超過限制
+
         Args:
-            key: 限制鍵（如使用者 ID）
+            key: 限制鍵（如 路由:使用者 ID）
             limit: 限制次數
             window: 時間窗口（秒）
-            
+
+        Returns:
+            Tuple[bool, int]: (是否允許, 建議重試秒數)
+        """
+        now = time.time()
+        bucket = int(now // window)
+        elapsed = now - bucket * window
+        current_key = f'{self.KEY_PREFIX}:{key}:{window}:{bucket}'
+        previous_key = f'{self.KEY_PREFIX}:{key}:{window}:{bucket - 1}'
+
+        try:
+            count = self._incr(current_key, window * 2)
+            previous = self.cache.get(previous_key) or 0
+        except Exception as e:
+            # cache 無法使用時不阻擋請求
+            logger.warning(f"Rate limiter cache unavailable: {str(e)}")
+            return True, 0
+
+        weight = (window - elapsed) / window
+        if previous * weight + count <= limit:
+            return True, 0
+
+        # 被拒絕的請求不計入，避免持續重試的用戶端永遠無法恢復
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        count -= 1
+        remaining = window - elapsed
+        if count < limit:
+            # 上一視窗的權重隨時間遞減，等到 previous * weight + count + 1 <= limit
+            retry_after = remaining - (limit - count - 1) * window / previous
+        else:
+            # 本視窗已滿：等到下一視窗，且本視窗計數的權重降到 (limit - 1) / count 以下
+            retry_after = remaining + window - (limit - 1) * window / max(count, 1)
+        return False, max(1, math.ceil(retry_after))
+
+    def is_allowed(self, key: str, limit: int, window: int) -> bool:
+        """
+        檢查是否允許請求（並記錄一次請求）
+
         Returns:
             bool: 是否允許請求
         """
-        now = timezone.now().timestamp()
-        
-        if key not in self.requests:
-            self.requests[key] = []
-        
-        # 清理過期的請求記錄
-        self.requests[key] = [
-            req_time for req_time in self.requests[key]
-            if now - req_time < window
-        ]
-        
-        # 檢查是否超過限制
-        if len(self.requests[key]) >= limit:
-            return False
-        
-        # 記錄新請求
-        self.requests[key].append(now)
-        return True
+        return self.hit(key, limit, window)[0]
+
+    def user_role(self, line_user_id: str) -> Optional[str]:
+        """查詢使用者角色（用於分級限制），結果快取 5 分鐘"""
+        cache_key = f'{self.KEY_PREFIX}:role:{line_user_id}'
+        try:
+            role = self.cache.get(cache_key)
+        except Exception:
+            role = None
+        if role is None:
+            from user.models import LineProfile
+
+            role = LineProfile.objects.filter(pk=line_user_id).values_list('role', flat=True).first() or ''
+            try:
+                self.cache.set(cache_key, role, timeout=300)
+            except Exception:
+                pass
+        return role or None
 
 
 # 全域速率限制器實例
 rate_limiter = RateLimiter()
 
 
-def rate_limit(limit: int = 60, window: int = 60, key_func: Callable = None):
+def rate_limit(limit: int = 60, window: int = 60, key_func: Callable = None,
+               scope: str = None, tiers: Optional[Dict[str, Tuple[int, int]]] = None):
     """
     速率限制裝飾器
-    
+
     Args:
         limit: 限制次數
         window: 時間窗口（秒）
         key_func: 生成限制鍵的函數
+        scope: 計數範圍，預設為各路由獨立；多個路由使用相同 scope 時共用同一組計數
+        tiers: 依使用者角色覆寫 (limit, window)，例如 {'teacher': (10, 300)}
     """
     def decorator(func: Callable) -> Callable:
+        route_scope = scope or f'{func.__module__}.{func.__name__}'
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             # 生成限制鍵
@@ -338,15 +621,26 @@ def rate_limit(limit: int = 60, window: int = 60, key_func: Callable = None):
             else:
                 # 預設使用 line_user_id
                 key = request.data.get('line_user_id') or request.GET.get('line_user_id')
-            
-            if key and not rate_limiter.is_allowed(key, limit, window):
-                return Response({
-                    'error': 'rate_limit_exceeded',
-                    'message': f'請求頻率過高，請在 {window} 秒後再試',
-                    'code': 'RATE_LIMIT_EXCEEDED'
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
+
+            if key:
+                user_limit, user_window = limit, window
+                if tiers:
+                    role = rate_limiter.user_role(key)
+                    if role in tiers:
+                        user_limit, user_window = tiers[role]
+
+                allowed, retry_after = rate_limiter.hit(f'{route_scope}:{key}', user_limit, user_window)
+                if not allowed:
+                    response = Response({
+                        'error': 'rate_limit_exceeded',
+                        'message': f'請求頻率過高，請在 {retry_after} 秒後再試',
+                        'code': 'RATE_LIMIT_EXCEEDED',
+                        'retry_after': retry_after
+                    }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+
             return func(request, *args, **kwargs)
-        
+
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
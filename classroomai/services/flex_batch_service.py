@@ -0,0 +1,199 @@
+"""
+Flex Message 批次發送服務
+將大量收件者拆成多個區塊處理，相同模板的使用者合併為 multicast，並保存每位收件者的結果
+"""
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+from linebot.models import FlexSendMessage
+
+from line_bot.flex_templates import get_flex_template
+from line_bot.models import FlexBatchJob
+from .line_messaging_service import line_messaging_service, MAX_MULTICAST_RECIPIENTS
+
+logger = logging.getLogger(__name__)
+
+
+class FlexBatchService:
+    """Flex Message 批次發送服務"""
+
+    DEFAULT_CHUNK_SIZE = 100
+
+    @staticmethod
+    def create_job(messages: List[Dict], chunk_size: Optional[int] = None) -> FlexBatchJob:
+        """
+        建立批次工作（缺少必要欄位的項目直接標記失敗）
+
+        Args:
+            messages: [{line_user_id, template_name}]
+            chunk_size: 每個區塊處理的收件者數量
+
+        Returns:
+            FlexBatchJob: 新建立的工作
+        """
+        items = []
+        for msg in messages:
+            line_user_id = (msg.get("line_user_id") or "").strip()
+            template_name = (msg.get("template_name") or "").strip()
+            item = {
+                "line_user_id": line_user_id,
+                "template_name": template_name,
+                "status": "pending",
+                "error": "",
+            }
+            if not line_user_id or not template_name:
+                item["status"] = "failed"
+                item["error"] = "missing_required_fields"
+            items.append(item)
+
+        size = min(max(int(chunk_size or FlexBatchService.DEFAULT_CHUNK_SIZE), 1), MAX_MULTICAST_RECIPIENTS)
+        job = FlexBatchJob(items=items, chunk_size=size)
+        job.refresh_counts()
+        job.save()
+        return job
+
+    @staticmethod
+    def _render(template_name: str, cache: Dict) -> Optional[FlexSendMessage]:
+        """每個模板在同一批次內只渲染一次"""
+        if template_name not in cache:
+            template = get_flex_template(template_name)
+            cache[template_name] = FlexSendMessage(
+                alt_text=template.get("altText", "功能選單"),
+                contents=template["contents"]
+            ) if template else None
+        return cache[template_name]
+
+    @staticmethod
+    def _send_group(template_name: str, indexes: List[int], items: List[Dict], rendered: Dict) -> None:
+        """發送同一模板的一組收件者，並就地更新結果"""
+        message = FlexBatchService._render(template_name, rendered)
+        if message is None:
+            for i in indexes:
+                items[i].update(status="failed", error="template_not_found")
+            return
+
+        # multicast 僅支援使用者 ID，群組（C 開頭）與聊天室（R 開頭）改用 push
+        user_indexes = [i for i in indexes if items[i]["line_user_id"].startswith("U")]
+        other_indexes = [i for i in indexes if not items[i]["line_user_id"].startswith("U")]
+
+        if user_indexes:
+            recipients = [items[i]["line_user_id"] for i in user_indexes]
+            try:
+                if len(recipients) == 1:
+                    line_messaging_service.push(recipients[0], message)
+                else:
+                    line_messaging_service.multicast(recipients, message)
+                for i in user_indexes:
+                    items[i].update(status="sent", error="")
+            except Exception as e:
+                for i in user_indexes:
+                    items[i].update(status="failed", error=f"send_failed: {str(e)}")
+
+        for i in other_indexes:
+            try:
+                line_messaging_service.push(items[i]["line_user_id"], message)
+                items[i].update(status="sent", error="")
+            except Exception as e:
+                items[i].update(status="failed", error=f"send_failed: {str(e)}")
+
+    @staticmethod
+    def process_job(job_id: str) -> Dict:
+        """
+        處理批次工作中所有 pending 的項目，每完成一個區塊就寫回資料庫
+        只處理狀態為 pending 的工作；中途失敗時已送出的項目不會重送，重設為 pending 後可續傳
+
+        Returns:
+            Dict: 工作狀態摘要
+        """
+        # 以條件更新取得工作，重複投遞的任務不會同時處理同一個工作
+        claimed = FlexBatchJob.objects.filter(job_id=job_id, status="pending").update(
+            status="running", updated_at=timezone.now()
+        )
+        job = FlexBatchJob.objects.get(job_id=job_id)
+        if not claimed:
+            logger.info(f"Flex batch job {job_id} is {job.status}, skipping")
+            return FlexBatchService.serialize(job, include_items=False)
+
+        items = job.items
+        pending = [i for i, item in enumerate(items) if item.get("status") == "pending"]
+        rendered: Dict = {}
+
+        try:
+            for start in range(0, len(pending), job.chunk_size):
+                chunk = pending[start:start + job.chunk_size]
+
+                groups: "OrderedDict[str, List[int]]" = OrderedDict()
+                for i in chunk:
+                    groups.setdefault(items[i]["template_name"], []).append(i)
+
+                for template_name, indexes in groups.items():
+                    FlexBatchService._send_group(template_name, indexes, items, rendered)
+
+                job.items = items
+                job.refresh_counts()
+                job.save(update_fields=["items", "total", "success_count", "failed_count", "updated_at"])
+        except Exception as e:
+            logger.error(f"Flex batch job {job_id} aborted: {str(e)}")
+            job.status = "failed"
+            job.save(update_fields=["status", "updated_at"])
+            raise
+
+        job.refresh_counts()
+        if job.failed_count == 0:
+            job.status = "completed"
+        elif job.success_count == 0:
+            job.status = "failed"
+        else:
+            job.status = "partial"
+        job.finished_at = timezone.now()
+        job.save()
+        logger.info(f"Flex batch job {job_id} finished: {job.success_count}/{job.total} sent")
+        return FlexBatchService.serialize(job, include_items=False)
+
+    @staticmethod
+    def retry_failed(job: FlexBatchJob) -> int:
+        """
+        將失敗項目（缺少欄位者除外）重設為 pending，中斷時殘留的 pending 項目一併續傳
+
+        Returns:
+            int: 待重送的項目數
+        """
+        count = 0
+        for item in job.items:
+            if item.get("status") == "failed" and item.get("error") != "missing_required_fields":
+                item.update(status="pending", error="")
+            if item.get("status") == "pending":
+                count += 1
+        if count:
+            job.status = "pending"
+            job.finished_at = None
+            job.refresh_counts()
+            job.save()
+        return count
+
+    @staticmethod
+    def serialize(job: FlexBatchJob, include_items: bool = True) -> Dict:
+        data = {
+            "job_id": str(job.job_id),
+            "status": job.status,
+            "total_messages": job.total,
+            "success_count": job.success_count,
+            "failed_count": job.failed_count,
+            "pending_count": job.total - job.success_count - job.failed_count,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+        if include_items:
+            data["results"] = [
+                {
+                    "line_user_id": item["line_user_id"],
+                    "template_name": item["template_name"],
+                    "success": item["status"] == "sent",
+                    "status": item["status"],
+                    "error": item.get("error", ""),
+                }
+                for item in job.items
+            ]
+        return data
@@ -1,7 +1,15 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 
+from services.llm_clients import configure_genai, get_genai_model, track_call
+
+# batchEmbedContents 單次請求最多 100 筆
+EMBED_BATCH_SIZE = 100
+# 同時送出的 batch 請求數
+EMBED_MAX_CONCURRENCY = 4
+
 
 def _get_api_key() -> str:
     """Return Gemini API key.
@@ -15,21 +23,18 @@ def _get_api_key() -> str:
 
 
 def _configure():
-    """Configure and return the google.generativeai module.
+    """Configure (once per API key) and return the google.generativeai module.
     支援環境變數名稱：Gemini_API_KEY / GEMINI_API_KEY
     """
-    import google.generativeai as genai  # type: ignore
-    genai.configure(api_key=_get_api_key())
-    return genai
+    return configure_genai(_get_api_key())
 
 
 def get_model(model_name: Optional[str] = None):
-    """Get a configured GenerativeModel instance.
+    """Get a shared, configured GenerativeModel instance.
     Default model can be overridden by env 'GEMINI_MODEL', else 'gemini-1.5-flash'.
     """
-    genai = _configure()
     name = model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-    return genai.GenerativeModel(name)
+    return get_genai_model(name, _get_api_key())
 
 
 def _safe_json(text: str) -> Dict:
@@ -56,7 +61,9 @@ def generate_learning_resources(topic: str, max_items: int = 5) -> List[Dict]:
         '{"items":[{"title":string,"url":string,"snippet":string}]}'
         "。請回傳高品質、可直接學習的資源。"
     )
-    resp = model.generate_content([{"role": "user", "parts": [system, f"Topic: {topic}"]}])
+    with track_call("gemini.learning_resources", "gemini", model.model_name) as call:
+        resp = model.generate_content([{"role": "user", "parts": [system, f"Topic: {topic}"]}])
+        call.usage_from(resp)
     try:
         data = _safe_json(resp.text or "{}")
         items = data.get("items", [])
@@ -73,17 +80,46 @@ def generate_learning_resources(topic: str, max_items: int = 5) -> List[Dict]:
         return []
 
 
+def _embed_chunk(genai, model: str, chunk: List[str]) -> List[List[float]]:
+    """以單一 batch 請求嵌入一組文字"""
+    with track_call("gemini.embed", "gemini", model):
+        res = genai.embed_content(model=model, content=chunk, task_type="retrieval_document")
+    return res["embedding"]  # type: ignore[index]
+
+
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """Create embeddings via Gemini text-embedding-004.
     Caller should handle similarity scoring.
+
+    - 相同文字只嵌入一次，並先查詢 (模型, 文字 SHA-256) 的資料庫快取
+    - 未命中的文字每 EMBED_BATCH_SIZE 筆一個 batch 請求，多個 batch 同時送出
     """
-    genai = _configure()
+    from services.embedding_cache import get_many, put_many, text_hash
+
+    if not texts:
+        return []
     model = os.getenv("GEMINI_EMBED_MODEL", "text-embedding-004")
-    # The SDK supports single-content embedding; do simple batching
-    vectors: List[List[float]] = []
-    for content in texts:
-        res = genai.embed_content(model=model, content=content, task_type="retrieval_document")
-        vectors.append(res["embedding"])  # type: ignore[index]
-    return vectors
+    hashes = [text_hash(t) for t in texts]
+    vectors: Dict[str, List[float]] = get_many(model, set(hashes))
+
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in vectors:
+            missing.setdefault(h, t)
 
+    if missing:
+        genai = _configure()
+        keys = list(missing)
+        chunks = [keys[i:i + EMBED_BATCH_SIZE] for i in range(0, len(keys), EMBED_BATCH_SIZE)]
+        fresh: Dict[str, List[float]] = {}
+        if len(chunks) == 1:
+            results = [_embed_chunk(genai, model, [missing[h] for h in chunks[0]])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(EMBED_MAX_CONCURRENCY, len(chunks))) as pool:
+                results = list(pool.map(lambda chunk: _embed_chunk(genai, model, [missing[h] for h in chunk]), chunks))
+        for chunk, chunk_vectors in zip(chunks, results):
+            fresh.update(zip(chunk, chunk_vectors))
+        put_many(model, fresh)
+        vectors.update(fresh)
 
+    return [vectors[h] for h in hashes]
@@ -2,6 +2,11 @@ import os
 import json
 from typing import List, Dict, Optional
 
+from services.llm_clients import get_genai_model, track_call
+
+# 課表解析提示詞、圖片前處理或輸出後處理變更時遞增，讓舊的解析結果快取失效
+TIMETABLE_PROMPT_VERSION = "2"
+
 
 def _get_api_key() -> str:
 	"""取得 Google Generative AI API Key（沿用 Gemini 的 key）。
@@ -17,24 +22,35 @@ def is_available() -> bool:
 	return bool(os.getenv("Gemini_API_KEY") or os.getenv("GEMINI_API_KEY"))
 
 
-def _get_model(model_name: Optional[str] = None):
-    """回傳已設定好的 google.generativeai GenerativeModel。"""
-    import google.generativeai as genai  # type: ignore
-    genai.configure(api_key=_get_api_key())
-    name = (
+def resolve_model_name(model_name: Optional[str] = None) -> str:
+    """實際使用的模型名稱（也是解析結果快取鍵的一部分）。"""
+    return (
         model_name
         or os.getenv("GEMINI_MODEL")
         or os.getenv("GEMMA_MODEL")
         or "gemini-2.5-pro"
     )
-    return genai.GenerativeModel(name)
 
 
-def extract_timetable_from_image(image_bytes: bytes, model: Optional[str] = None) -> List[Dict]:
-	"""以 Google 的 Gemma 模型解析課表圖片並回傳課程清單。"""
+def _get_model(model_name: Optional[str] = None):
+    """回傳共用、已設定好的 google.generativeai GenerativeModel。"""
+    return get_genai_model(resolve_model_name(model_name), _get_api_key())
+
+
+def extract_timetable_from_image(image_bytes: bytes, model: Optional[str] = None, preprocess: bool = True) -> List[Dict]:
+	"""以 Google 的 Gemma 模型解析課表圖片並回傳課程清單。
+	preprocess=True 時先轉正、轉灰階、裁邊並縮小圖片（見 services.image_preprocessing），
+	否則僅依檔頭判斷 MIME 類型後原樣上傳。
+	"""
 	if not is_available():
 		raise RuntimeError("Google Generative AI Key 未設定。")
 
+	from services.image_preprocessing import preprocess_image, sniff_mime_type
+	if preprocess:
+		image_bytes, mime_type = preprocess_image(image_bytes)
+	else:
+		mime_type = sniff_mime_type(image_bytes) or "image/png"
+
 	model_inst = _get_model(model)
 	system = (
 		"""
@@ -77,16 +93,18 @@ def extract_timetable_from_image(image_bytes: bytes, model: Optional[str] = None
 	)
 
 	# google.generativeai 支援以 bytes 傳入圖片
-	resp = model_inst.generate_content([
-		{"role": "user", "parts": [
-			system,
-			"Extract the timetable as structured JSON.",
-			{"mime_type": "image/png", "data": image_bytes},
-		]},
-	])
+	with track_call("gemma.extract_timetable", "gemini", resolve_model_name(model)) as call:
+		resp = model_inst.generate_content([
+			{"role": "user", "parts": [
+				system,
+				"Extract the timetable as structured JSON.",
+				{"mime_type": mime_type, "data": image_bytes},
+			]},
+		])
+		call.usage_from(resp)
 
 	text = (getattr(resp, "text", None) or "").strip()
-	print("[gemma.extract] model:", os.getenv("GEMINI_MODEL") or os.getenv("GEMMA_MODEL") or "gemini-2.0-flash-exp")
+	print("[gemma.extract] model:", resolve_model_name(model))
 	print("[gemma.extract] raw_text:\n" + text)
 	if text.startswith("```"):
 		# 去除可能的 markdown 圍欄
@@ -0,0 +1,108 @@
+"""
+視覺模型上傳前的圖片前處理
+- 依檔頭判斷實際 MIME 類型（不信任副檔名或前端宣告）
+- 依 EXIF 方向轉正、轉灰階、裁掉四周空白、縮到模型實際使用的解析度
+- 重新編碼：相片（JPEG 來源）以 JPEG，其餘（截圖、掃描）以 PNG
+未安裝 Pillow 或無法解碼時原樣回傳，只修正 MIME 類型
+"""
+import io
+import logging
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 長邊上限；Gemini 會把更大的圖片縮小後再切塊，超過的像素只增加上傳量
+DEFAULT_MAX_SIDE = 2048
+# 灰階值高於此值視為空白邊界
+WHITE_THRESHOLD = 235
+# 裁切後保留的邊界像素
+CROP_PADDING = 16
+JPEG_QUALITY = 85
+EXIF_ORIENTATION = 0x0112
+
+# (檔頭, MIME 類型)；WEBP 另外判斷
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+_HEIF_BRANDS = {b'heic', b'heix', b'hevc', b'heim', b'heis', b'mif1', b'msf1'}
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """依檔頭判斷圖片類型，無法辨識時回傳 None"""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp' and data[8:12] in _HEIF_BRANDS:
+        return 'image/heic'
+    return None
+
+
+def _max_side() -> int:
+    return int(getattr(settings, 'TIMETABLE_IMAGE_MAX_SIDE', DEFAULT_MAX_SIDE))
+
+
+def preprocess_image(data: bytes, max_side: Optional[int] = None) -> Tuple[bytes, str]:
+    """
+    前處理圖片
+
+    Args:
+        data: 原始上傳內容
+        max_side: 長邊上限，None 為設定值 TIMETABLE_IMAGE_MAX_SIDE
+
+    Returns:
+        Tuple[bytes, str]: (處理後的內容, MIME 類型)
+    """
+    mime_type = sniff_mime_type(data) or 'image/png'
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning("Pillow is not installed; sending image without preprocessing")
+        return data, mime_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+            gray = ImageOps.exif_transpose(image).convert('L')
+    except Exception as e:
+        # HEIC 等 Pillow 無法解碼的格式直接交給模型
+        logger.warning(f"Image preprocessing skipped ({mime_type}): {str(e)}")
+        return data, mime_type
+
+    # 非空白像素的範圍（加上少許邊界），整張空白時不裁切
+    bbox = gray.point(lambda p: 255 if p < WHITE_THRESHOLD else 0).getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        gray = gray.crop((
+            max(left - CROP_PADDING, 0),
+            max(top - CROP_PADDING, 0),
+            min(right + CROP_PADDING, gray.width),
+            min(bottom + CROP_PADDING, gray.height),
+        ))
+
+    limit = max_side or _max_side()
+    if max(gray.size) > limit:
+        gray.thumbnail((limit, limit), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if mime_type == 'image/jpeg':
+        gray.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        out_type = 'image/jpeg'
+    else:
+        gray.save(buffer, format='PNG', optimize=True)
+        out_type = 'image/png'
+    processed = buffer.getvalue()
+
+    # 原檔已經更小（例如小張的截圖）、方向正確且格式可直接上傳時保留原檔
+    if not rotated and len(processed) >= len(data) and mime_type in ('image/png', 'image/jpeg', 'image/webp'):
+        return data, mime_type
+
+    logger.info(f"Image preprocessed: {mime_type} {len(data)} bytes -> {out_type} {len(processed)} bytes, {gray.size[0]}x{gray.size[1]}")
+    return processed, out_type
@@ -1,10 +1,54 @@
+import codecs
 import csv
 import io
-from typing import List, Dict
+import re
+from html.parser import HTMLParser
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
 
+# 串流解析每次讀取的位元組數
+READ_CHUNK_SIZE = 64 * 1024
+# DeepSeek 後備最多送出的表格列數（只在一般解析完全沒有結果時使用）
+FALLBACK_MAX_LINES = 500
+
+
+def _iter_file_chunks(fileobj: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_decoded_chunks(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """以增量解碼器逐塊解碼（多位元組字元跨塊也不會被切壞），UTF-8 會自動去除 BOM"""
+    if codecs.lookup(encoding).name == "utf-8":
+        encoding = "utf-8-sig"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _iter_decoded_lines(fileobj: BinaryIO, encoding: str = "utf-8",
+                        chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """逐塊讀取檔案並逐行輸出（保留行尾），不會一次載入整個檔案。"""
+    pending = ""
+    for text in _iter_decoded_chunks(_iter_file_chunks(fileobj, chunk_size), encoding):
+        # 最後一段可能尚未讀完，留到下一塊；只以 \n 切行，\r\n 不會被拆開
+        *lines, pending = (pending + text).split("\n")
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
 
-def parse_courses_csv(data: bytes, encoding: str = "utf-8") -> List[Dict]:
-    """Parse CSV bytes to course dicts.
+
+def iter_courses_csv(fileobj: BinaryIO, encoding: str = "utf-8") -> Iterator[Dict]:
+    """Stream course dicts from a CSV file object.
 
     Expected headers (case-insensitive, optional):
     - title (required)
@@ -12,156 +56,509 @@ def parse_courses_csv(data: bytes, encoding: str = "utf-8") -> List[Dict]:
     - instructor
     - classroom
     """
-    text = data.decode(encoding, errors="ignore")
-    reader = csv.DictReader(io.StringIO(text))
-    out: List[Dict] = []
+    reader = csv.DictReader(_iter_decoded_lines(fileobj, encoding))
     for row in reader:
         if not row:
             continue
         title = (row.get("title") or row.get("Title") or row.get("課程名稱") or "").strip()
         if not title:
             continue
-        out.append({
+        yield {
             "title": title,
             "description": (row.get("description") or row.get("Description") or row.get("說明") or "").strip(),
             "instructor": (row.get("instructor") or row.get("Instructor") or row.get("教師") or "").strip(),
             "classroom": (row.get("classroom") or row.get("Classroom") or row.get("教室") or "").strip(),
-        })
-    return out
+        }
 
 
-def parse_courses_ical(data: bytes) -> List[Dict]:
-    """Parse iCalendar bytes to course dicts using VEVENT summary/description/location.
-    We only extract basic metadata for course creation.
+def parse_courses_csv(data: bytes, encoding: str = "utf-8") -> List[Dict]:
+    """Parse CSV bytes to course dicts (see iter_courses_csv)."""
+    return list(iter_courses_csv(io.BytesIO(data), encoding))
+
+
+def iter_courses_ical(fileobj: BinaryIO) -> Iterator[Dict]:
+    """Stream course dicts from an iCalendar file object, one VEVENT at a time.
+    只保留目前這個 VEVENT 的內容列，交給 icalendar 解析後即丟棄。
     """
-    from icalendar import Calendar
+    from icalendar import Event
 
-    cal = Calendar.from_ical(data)
-    out: List[Dict] = []
-    for component in cal.walk():
-        if component.name != "VEVENT":
+    block: List[str] = []
+    in_event = False
+    for line in _iter_decoded_lines(fileobj):
+        # 折行（以空白開頭）不會是 BEGIN / END
+        marker = line.strip().upper()
+        if not in_event:
+            if marker == "BEGIN:VEVENT":
+                in_event = True
+                block = [line]
             continue
+        block.append(line)
+        if marker != "END:VEVENT":
+            continue
+        in_event = False
+        try:
+            component = Event.from_ical("".join(block))
+        except Exception as e:
+            print(f"[ical] skip malformed VEVENT: {e}")
+            continue
+        finally:
+            block = []
         title = str(component.get("SUMMARY", "")).strip()
         if not title:
             continue
-        desc = str(component.get("DESCRIPTION", "")).strip()
-        loc = str(component.get("LOCATION", "")).strip()
-        out.append({
+        yield {
             "title": title,
-            "description": desc,
+            "description": str(component.get("DESCRIPTION", "")).strip(),
             "instructor": "",
-            "classroom": loc,
-        })
-    return out
+            "classroom": str(component.get("LOCATION", "")).strip(),
+        }
 
 
-def parse_courses_xlsx(data: bytes) -> List[Dict]:
-    """Parse Excel (.xlsx) bytes to course dicts.
+def parse_courses_ical(data: bytes) -> List[Dict]:
+    """Parse iCalendar bytes to course dicts using VEVENT summary/description/location.
+    We only extract basic metadata for course creation.
+    """
+    return list(iter_courses_ical(io.BytesIO(data)))
+
+
+def _cell(row, idx: int) -> str:
+    if idx < 0 or idx >= len(row) or row[idx] is None:
+        return ""
+    return str(row[idx]).strip()
+
+
+# 表頭（不分大小寫/中英）對應到的課程欄位
+HEADER_ALIASES = {
+    "title": {"title", "課程名稱", "name"},
+    "description": {"description", "說明", "desc"},
+    "instructor": {"instructor", "教師", "teacher"},
+    "classroom": {"classroom", "教室", "location"},
+}
+
+
+def _header_mapping(headers: List[str]) -> Dict[str, int]:
+    """表頭列 -> {欄位: 欄索引}（.xlsx / .xls / HTML 表格共用）"""
+    mapping: Dict[str, int] = {}
+    for idx, h in enumerate(headers):
+        key = (h or "").strip().lower()
+        for field, aliases in HEADER_ALIASES.items():
+            if key in aliases:
+                mapping[field] = idx
+                break
+    return mapping
+
+
+def _xlsx_course(title: str, desc: str, instr: str, room: str) -> Dict:
+    return {
+        "title": title[:255],
+        "description": desc[:1000],
+        "instructor": instr[:100],
+        "classroom": room[:100],
+    }
+
+
+def iter_courses_xlsx(fileobj: BinaryIO) -> Iterator[Dict]:
+    """Stream course dicts from an Excel (.xlsx) file object.
+    以 read-only 模式逐列讀取工作表，不會把所有列載入記憶體。
     支援表頭（不分大小寫/中英）：title/課程名稱、description/說明、instructor/教師、classroom/教室。
     若讀不到表頭，會嘗試使用首行作為表頭。
     若完全無法解析且已設定 DEEPSEEK_API_KEY，回退以 DeepSeek 協助抽取結構（仍相容 Gemini 舊設定）。
+    已輸出部分課程後才發生的解析錯誤會拋出 ValueError，避免呼叫端把截斷的結果當成完整匯入。
     """
-    out: List[Dict] = []
+    yielded = 0
+    # 尚未解析出任何課程前，保留前幾列文字給 DeepSeek 後備使用
+    sample: List[str] = []
     try:
         from openpyxl import load_workbook  # type: ignore
-        import io as _io
-        wb = load_workbook(filename=_io.BytesIO(data), read_only=True, data_only=True)
-        ws = wb.active
-        rows = list(ws.iter_rows(values_only=True))
-        if not rows:
-            return out
-        headers = [str(h).strip() if h is not None else "" for h in rows[0]]
-        # 若表頭全空，視為無表頭，嘗試以固定欄位序：title, description, instructor, classroom
-        has_header = any(h for h in headers)
-        if has_header:
+        wb = load_workbook(filename=fileobj, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            first = next(rows, None)
+            if first is None:
+                return
+            headers = [str(h).strip() if h is not None else "" for h in first]
+            # 若表頭全空，視為無表頭，嘗試以固定欄位序：title, description, instructor, classroom
+            has_header = any(h for h in headers)
             mapping = {}
-            for idx, h in enumerate(headers):
-                key = (h or "").strip().lower()
-                if key in {"title", "課程名稱", "name"}:
-                    mapping["title"] = idx
-                elif key in {"description", "說明", "desc"}:
-                    mapping["description"] = idx
-                elif key in {"instructor", "教師", "teacher"}:
-                    mapping["instructor"] = idx
-                elif key in {"classroom", "教室", "location"}:
-                    mapping["classroom"] = idx
-            data_rows = rows[1:]
+            if has_header:
+                mapping = _header_mapping(headers)
+                data_rows = rows
+            else:
+                data_rows = chain([first], rows)
+
+            if has_header:
+                _keep_sample(sample, first)
             for r in data_rows:
-                title = str(r[mapping.get("title", -1)]).strip() if mapping.get("title", -1) >= 0 and r[mapping.get("title", -1)] is not None else ""
-                if not title:
-                    continue
-                desc = str(r[mapping.get("description", -1)]).strip() if mapping.get("description", -1) >= 0 and r[mapping.get("description", -1)] is not None else ""
-                instr = str(r[mapping.get("instructor", -1)]).strip() if mapping.get("instructor", -1) >= 0 and r[mapping.get("instructor", -1)] is not None else ""
-                room = str(r[mapping.get("classroom", -1)]).strip() if mapping.get("classroom", -1) >= 0 and r[mapping.get("classroom", -1)] is not None else ""
-                out.append({
-                    "title": title[:255],
-                    "description": desc[:1000],
-                    "instructor": instr[:100],
-                    "classroom": room[:100],
-                })
-        else:
-            for r in rows:
-                vals = [(str(v).strip() if v is not None else "") for v in r]
-                if not any(vals):
-                    continue
-                title = vals[0]
-                if not title:
+                if not yielded:
+                    _keep_sample(sample, r)
+                if has_header:
+                    course = _xlsx_course(
+                        _cell(r, mapping.get("title", -1)),
+                        _cell(r, mapping.get("description", -1)),
+                        _cell(r, mapping.get("instructor", -1)),
+                        _cell(r, mapping.get("classroom", -1)),
+                    )
+                else:
+                    course = _xlsx_course(_cell(r, 0), _cell(r, 1), _cell(r, 2), _cell(r, 3))
+                if not course["title"]:
                     continue
-                desc = vals[1] if len(vals) > 1 else ""
-                instr = vals[2] if len(vals) > 2 else ""
-                room = vals[3] if len(vals) > 3 else ""
-                out.append({
-                    "title": title[:255],
-                    "description": desc[:1000],
-                    "instructor": instr[:100],
-                    "classroom": room[:100],
-                })
-        if out:
-            return out
+                yielded += 1
+                sample = []
+                yield course
+        finally:
+            wb.close()
     except Exception as e:
-        # 記錄但不拋出，讓後備流程接手
+        if yielded:
+            raise ValueError(f"Excel 檔案在第 {yielded} 門課程之後解析失敗：{e}") from e
+        # 尚未輸出任何課程：記錄但不拋出，讓後備流程接手
         print(f"[xlsx] parse error: {e}")
 
-    # 後備：DeepSeek 協助從表格文字抽取（將每列串為文字）
+    if not yielded:
+        yield from _deepseek_extract_courses("\n".join(sample))
+
+
+def _keep_sample(sample: List[str], row) -> None:
+    if len(sample) >= FALLBACK_MAX_LINES:
+        return
+    vals = [(str(v).strip() if v is not None else "") for v in row]
+    if any(vals):
+        sample.append("\t".join(vals))
+
+
+def _deepseek_extract_courses(table_text: str) -> Iterator[Dict]:
+    """後備：DeepSeek 協助從表格文字抽取（每列以 tab 串為文字）"""
     try:
         import os, json
-        if os.getenv("DEEPSEEK") or os.getenv("DEEPSEEK_API_KEY") or os.getenv("DeepSeek_API_KEY"):
+        if table_text and (os.getenv("DEEPSEEK") or os.getenv("DEEPSEEK_API_KEY") or os.getenv("DeepSeek_API_KEY")):
             from services.deepseek_client import generate_json  # type: ignore
             system = (
                 "Extract course list from the given table content. Output STRICT JSON only: "
                 "{\"items\":[{\"title\":string,\"description\":string,\"instructor\":string,\"classroom\":string}]}"
             )
-            # 為避免複雜處理，直接將二維表格轉純文字給 Gemini
-            lines = []
-            try:
-                from openpyxl import load_workbook  # type: ignore
-                import io as _io
-                wb = load_workbook(filename=_io.BytesIO(data), read_only=True, data_only=True)
-                ws = wb.active
-                for row in ws.iter_rows(values_only=True):
-                    vals = [(str(v).strip() if v is not None else "") for v in row]
-                    if any(vals):
-                        lines.append("\t".join(vals))
-            except Exception as e:
-                print(f"[xlsx] load workbook for deepseek text failed: {e}")
-            table_text = "\n".join(lines)
-            content = generate_json(prompt=table_text, system=system)
+            content = generate_json(prompt=table_text, system=system, call_site="importers.xlsx_fallback")
             data = json.loads(content or "{}")
             for it in data.get("items", []) or []:
                 title = (it.get("title") or "").strip()
                 if not title:
                     continue
-                out.append({
-                    "title": title[:255],
-                    "description": (it.get("description") or "")[:1000],
-                    "instructor": (it.get("instructor") or "")[:100],
-                    "classroom": (it.get("classroom") or "")[:100],
-                })
+                yield _xlsx_course(
+                    title,
+                    it.get("description") or "",
+                    it.get("instructor") or "",
+                    it.get("classroom") or "",
+                )
         # 不再保留 Gemini 後備
     except Exception as e:
-        print(f"[xlsx] gemini fallback error: {e}")
+        print(f"[xlsx] deepseek fallback error: {e}")
+
+
+def parse_courses_xlsx(data: bytes) -> List[Dict]:
+    """Parse Excel (.xlsx) bytes to course dicts (see iter_courses_xlsx)."""
+    return list(iter_courses_xlsx(io.BytesIO(data)))
+
+
+# ── HTML 表格（偽 .xls）：html.parser 逐標籤解析，不先轉成純文字 ────────────
+
+HTML_SNIFF_BYTES = 1024
+HTML_CHARSET_RE = re.compile(rb'charset\s*=\s*["\']?([A-Za-z0-9_\-]+)', re.I)
+# 儲存格內的空白（含全形空白、&nbsp;）；換行只來自 <br> 等區塊標籤
+HTML_SPACE_RE = re.compile(r"[^\S\n]+|\u3000")
+HTML_LINE_TAGS = {"br", "p", "div", "li"}
+HTML_SKIP_TAGS = {"script", "style"}
+# HTML 規範的上限：colspan 1000、rowspan 65534
+HTML_MAX_COLSPAN = 1000
+HTML_MAX_ROWSPAN = 65534
+# 課表格式的星期表頭儲存格長度上限（避免把課名中的「一」「日」當成星期）
+GRID_DAY_HEADER_MAX_LEN = 12
+# 結構化解析沒有結果時，交給課表文字解析的字詞數上限
+HTML_FALLBACK_MAX_TOKENS = 20000
+
+
+def looks_like_html(head: bytes) -> bool:
+    """偵測偽 Excel（其實是 HTML 表格）"""
+    sniff = head[:200].lower()
+    return b"<html" in sniff or b"<table" in sniff or b"<td" in sniff
+
+
+def html_encoding(head: bytes) -> str:
+    """依 <meta charset> 判斷編碼；未宣告時，開頭不是合法 UTF-8 就視為 Big5"""
+    match = HTML_CHARSET_RE.search(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    try:
+        # 開頭可能切在多位元組字元中間，用增量解碼器容許結尾不完整
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "big5"
+
+
+def _span(value, limit: int) -> int:
+    if not value:
+        return 1
+    try:
+        return min(max(int(value), 1), limit)
+    except (TypeError, ValueError):
+        return 1
+
+
+class _HTMLTableParser(HTMLParser):
+    """逐標籤走訪 <table>/<tr>/<td>，每完成一列就放入 rows：(表格序號, 各欄文字)
+    - rowspan：儲存格文字延續到下方各列的同一欄
+    - colspan：儲存格文字複製到橫跨的每一欄
+    - 巢狀表格各自獨立，內層文字不併入外層儲存格
+    - 容許省略 </td>、</tr> 的匯出檔
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[Tuple[int, List[str]]] = []
+        self._tables: List[Dict] = []
+        self._table_count = 0
+        self._skip = 0
+
+    def drain(self) -> List[Tuple[int, List[str]]]:
+        rows, self.rows = self.rows, []
+        return rows
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIP_TAGS:
+            self._skip += 1
+            return
+        if tag == "table":
+            self._tables.append({"id": self._table_count, "spans": {}, "row": None, "cell": None})
+            self._table_count += 1
+            return
+        if not self._tables:
+            return
+        table = self._tables[-1]
+        if tag == "tr":
+            self._end_row(table)
+            self._start_row(table)
+        elif tag in ("td", "th"):
+            self._end_cell(table)
+            if table["row"] is None:
+                self._start_row(table)
+            attrs = dict(attrs)
+            table["cell"] = {
+                "parts": [],
+                "rowspan": _span(attrs.get("rowspan"), HTML_MAX_ROWSPAN),
+                "colspan": _span(attrs.get("colspan"), HTML_MAX_COLSPAN),
+            }
+        elif tag in HTML_LINE_TAGS and table["cell"] is not None:
+            table["cell"]["parts"].append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if not self._tables:
+            return
+        table = self._tables[-1]
+        if tag == "table":
+            self._end_row(table)
+            self._tables.pop()
+        elif tag == "tr":
+            self._end_row(table)
+        elif tag in ("td", "th"):
+            self._end_cell(table)
+        elif tag in HTML_LINE_TAGS and tag != "br" and table["cell"] is not None:
+            table["cell"]["parts"].append("\n")
+
+    def handle_data(self, data):
+        if self._skip or not self._tables:
+            return
+        cell = self._tables[-1]["cell"]
+        if cell is not None:
+            # 原始碼中的換行只是空白
+            cell["parts"].append(data.replace("\r", " ").replace("\n", " "))
+
+    def close(self):
+        super().close()
+        while self._tables:
+            self._end_row(self._tables.pop())
+
+    @staticmethod
+    def _start_row(table: Dict) -> None:
+        table["row"] = {}
+        table["col"] = 0
+        table["new_spans"] = {}
+
+    def _end_cell(self, table: Dict) -> None:
+        cell = table["cell"]
+        if cell is None:
+            return
+        table["cell"] = None
+        lines = (HTML_SPACE_RE.sub(" ", line).strip() for line in "".join(cell["parts"]).split("\n"))
+        text = "\n".join(line for line in lines if line)
+
+        row, spans = table["row"], table["spans"]
+        col = table["col"]
+        # 跳過上方 rowspan 佔用的欄位
+        while col in row or col in spans:
+            if col in spans:
+                row[col] = spans[col][1]
+            col += 1
+        for offset in range(cell["colspan"]):
+            row[col + offset] = text
+            if cell["rowspan"] > 1:
+                table["new_spans"][col + offset] = (cell["rowspan"] - 1, text)
+        table["col"] = col + cell["colspan"]
+
+    def _end_row(self, table: Dict) -> None:
+        self._end_cell(table)
+        row = table["row"]
+        if row is None:
+            return
+        table["row"] = None
+        # 本列結尾仍被上方 rowspan 佔用的欄位
+        remaining = {}
+        for col, (left, text) in table["spans"].items():
+            row.setdefault(col, text)
+            if left > 1:
+                remaining[col] = (left - 1, text)
+        remaining.update(table["new_spans"])
+        table["spans"] = remaining
+        if row and any(row.values()):
+            cells = [""] * (max(row) + 1)
+            for col, text in row.items():
+                cells[col] = text
+            self.rows.append((table["id"], cells))
 
-    return out
+
+def iter_html_table_rows(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Tuple[int, List[str]]]:
+    """逐塊解碼並解析 HTML，依序輸出完成的表格列 (表格序號, 各欄文字)"""
+    parser = _HTMLTableParser()
+    for text in _iter_decoded_chunks(chunks, encoding):
+        parser.feed(text)
+        yield from parser.drain()
+    parser.close()
+    yield from parser.drain()
+
+
+def _grid_day_columns(cells: List[str]) -> Dict[int, int]:
+    """課表格式表頭列：{欄索引: day_of_week}"""
+    days = {}
+    for idx, text in enumerate(cells):
+        if not text or len(text) > GRID_DAY_HEADER_MAX_LEN:
+            continue
+        found = detect_day(text)
+        if found:
+            days[idx] = found[0]
+    return days
+
+
+def _grid_course(text: str):
+    """課表格子（例：人工智慧應用 / 蔡文隆P / 電708(承曦樓)）-> 課程；節次、時間格回傳 None"""
+    lines = text.split("\n")
+    if TIME_RANGE_RE.search(lines[0]) or TIME_ONLY_RE.match(lines[0]):
+        return None
+    title = COURSE_NAME_CLEAN_RE.sub("", lines[0]).strip()
+    if not title:
+        return None
+    instructor = classroom = ""
+    extra = []
+    for line in lines[1:]:
+        if not classroom and (VERTICAL_CLASSROOM_RE.search(line) or any(p.search(line) for p in CLASSROOM_PATTERNS[:5])):
+            classroom = line
+        elif not instructor:
+            instructor = line
+        else:
+            extra.append(line)
+    return _xlsx_course(title, " ".join(extra), instructor, classroom)
+
+
+def iter_courses_html(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Dict]:
+    """Stream course dicts from an HTML table export (e.g. a school system's fake .xls).
+    單次走訪：每個表格先找表頭列——
+    - 具有 title/課程名稱 等欄位：之後各列依與 .xlsx 相同的欄位對應轉為課程
+    - 含兩個以上星期欄：視為課表格式，星期欄下的每個格子為一門課（rowspan 重複的格子只輸出一次）
+    找不到表頭的列先保留文字；整份文件都沒有結構化結果時，改用課表文字解析。
+    """
+    layouts: Dict[int, Dict] = {}
+    grid_seen = set()
+    tokens: List[str] = []
+    yielded = False
+
+    for table_id, cells in iter_html_table_rows(chunks, encoding):
+        layout = layouts.get(table_id)
+        if layout is None:
+            mapping = _header_mapping(cells)
+            days = _grid_day_columns(cells)
+            if "title" in mapping:
+                layouts[table_id] = {"mapping": mapping}
+            elif len(days) >= 2:
+                layouts[table_id] = {"days": days}
+            elif not yielded and len(tokens) < HTML_FALLBACK_MAX_TOKENS:
+                for text in cells:
+                    tokens.extend(text.split())
+            continue
+
+        if "mapping" in layout:
+            mapping = layout["mapping"]
+            title = _cell(cells, mapping["title"])
+            if title.lower() in HEADER_ALIASES["title"] and _header_mapping(cells) == mapping:
+                # 分頁匯出時重複出現的表頭列
+                continue
+            course = _xlsx_course(
+                title,
+                _cell(cells, mapping.get("description", -1)),
+                _cell(cells, mapping.get("instructor", -1)),
+                _cell(cells, mapping.get("classroom", -1)),
+            )
+            if not course["title"]:
+                continue
+            yielded = True
+            tokens = []
+            yield course
+            continue
+
+        for col in layout["days"]:
+            text = _cell(cells, col)
+            course = _grid_course(text) if text else None
+            if course is None or course["title"] in grid_seen:
+                continue
+            grid_seen.add(course["title"])
+            yielded = True
+            tokens = []
+            yield course
+
+    if yielded or not tokens:
+        return
+    print("[xls] HTML 找不到表頭，改用課表文字解析")
+    try:
+        items = parse_multiple_courses_from_timetable(" \n".join(tokens))
+    except Exception as e:
+        print(f"[xls] HTML 解析失敗: {e}")
+        return
+    # 僅回傳基本欄位（title/instructor/classroom/description），時間表先不寫入
+    for it in items:
+        title = (it.get("title") or it.get("name") or "").strip()
+        if title:
+            yield _xlsx_course(title, it.get("description") or "", it.get("instructor") or "", it.get("classroom") or "")
+
+
+def iter_courses(fileobj: BinaryIO, filename: str) -> Iterator[Dict]:
+    """依副檔名選擇串流解析器；.xls 若其實是 HTML 表格也以串流解析，真正的 .xls 讀入整個檔案後交給 xlrd。
+    不支援的副檔名拋出 ValueError。
+    """
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_courses_csv(fileobj)
+    if name.endswith(".ics") or name.endswith(".ical"):
+        return iter_courses_ical(fileobj)
+    if name.endswith(".xlsx"):
+        return iter_courses_xlsx(fileobj)
+    if name.endswith(".xls"):
+        head = fileobj.read(HTML_SNIFF_BYTES)
+        if looks_like_html(head):
+            return iter_courses_html(chain([head], _iter_file_chunks(fileobj)), html_encoding(head))
+        # xlrd 需要完整檔案內容
+        return iter(parse_courses_xls(head + fileobj.read()))
+    raise ValueError("unsupported course file type")
 
 
 def parse_courses_xls(data: bytes) -> List[Dict]:
@@ -172,45 +569,16 @@ def parse_courses_xls(data: bytes) -> List[Dict]:
     print(f"[xls] 開始解析，檔案大小: {len(data)} bytes")
     
     # 偵測偽 Excel（其實是 HTML 表格）
-    try:
-        sniff = data[:200].lower()
-        if b"<html" in sniff or b"<table" in sniff or b"<td" in sniff:
-            print("[xls] 偵測到 HTML 內容，使用 HTML 解析器")
-            # 將 HTML 轉純文字，再重用課表文字解析
-            try:
-                html = data.decode("utf-8", errors="ignore")
-            except Exception:
-                html = data.decode("big5", errors="ignore")
-            import re
-            # 保留換行
-            html = re.sub(r"<br\s*/?>", "\n", html, flags=re.I)
-            # 將單元格關閉視為換行，避免內容黏在一起
-            html = re.sub(r"</td>", "\n", html, flags=re.I)
-            text = re.sub(r"<[^>]+>", " ", html)
-            text = re.sub(r"\s+", " \n", text)
-            try:
-                items = parse_multiple_courses_from_timetable(text)
-                print(f"[xls] HTML 解析到 {len(items)} 個項目")
-            except Exception as e:
-                print(f"[xls] HTML 解析失敗: {e}")
-                items = []
-            # 僅回傳基本欄位（title/instructor/classroom/description），時間表先不寫入
-            basic: List[Dict] = []
-            for it in items:
-                title = (it.get("title") or it.get("name") or "").strip()
-                if not title:
-                    continue
-                basic.append({
-                    "title": title[:255],
-                    "description": (it.get("description") or "")[:1000],
-                    "instructor": (it.get("instructor") or "")[:100],
-                    "classroom": (it.get("classroom") or "")[:100],
-                })
-            if basic:
-                print(f"[xls] HTML 解析成功，回傳 {len(basic)} 個課程")
-                return basic
-    except Exception as e:
-        print(f"[xls] html sniff error: {e}")
+    if looks_like_html(data):
+        print("[xls] 偵測到 HTML 內容，使用 HTML 表格解析器")
+        try:
+            basic = list(iter_courses_html([data], html_encoding(data[:HTML_SNIFF_BYTES])))
+        except Exception as e:
+            print(f"[xls] HTML 解析失敗: {e}")
+            basic = []
+        if basic:
+            print(f"[xls] HTML 解析成功，回傳 {len(basic)} 個課程")
+            return basic
 
     try:
         import xlrd  # type: ignore
@@ -224,17 +592,7 @@ def parse_courses_xls(data: bytes) -> List[Dict]:
         print(f"[xls] 標題行: {headers}")
         has_header = any(headers)
         if has_header:
-            mapping = {}
-            for idx, h in enumerate(headers):
-                key = (h or "").strip().lower()
-                if key in {"title", "課程名稱", "name"}:
-                    mapping["title"] = idx
-                elif key in {"description", "說明", "desc"}:
-                    mapping["description"] = idx
-                elif key in {"instructor", "教師", "teacher"}:
-                    mapping["instructor"] = idx
-                elif key in {"classroom", "教室", "location"}:
-                    mapping["classroom"] = idx
+            mapping = _header_mapping(headers)
             print(f"[xls] 欄位對應: {mapping}")
             for r in range(1, sheet.nrows):
                 rowvals = [sheet.cell_value(r, c) for c in range(sheet.ncols)]
@@ -341,7 +699,7 @@ def parse_courses_xml(data: bytes) -> List[Dict]:
                 "Extract course list from the given XML. Output STRICT JSON only: "
                 "{\"items\":[{\"title\":string,\"description\":string,\"instructor\":string,\"classroom\":string}]}"
             )
-            content = generate_json(prompt=text, system=system)
+            content = generate_json(prompt=text, system=system, call_site="importers.xml_fallback")
             data = json.loads(content or "{}")
             for it in data.get("items", []) or []:
                 title = (it.get("title") or "").strip()
@@ -358,14 +716,79 @@ def parse_courses_xml(data: bytes) -> List[Dict]:
         print(f"[xml] gemini fallback error: {e}")
 
     return out
+# ── 文字 / OCR 課表解析：樣式於模組載入時編譯一次 ─────────────────────────
+
+LABELED_LINE_PATTERNS = [
+    ("title", re.compile(r"^(課程名稱|課程|title|course)\s*[:：]\s*(.+)$", re.I)),
+    ("instructor", re.compile(r"^(教師|老師|instructor|teacher)\s*[:：]\s*(.+)$", re.I)),
+    ("classroom", re.compile(r"^(教室|地點|location|classroom)\s*[:：]\s*(.+)$", re.I)),
+    ("description", re.compile(r"^(說明|描述|description)\s*[:：]\s*(.+)$", re.I)),
+]
+
+# 星期標記；同一行出現多個標記時，以此順序中較前面者為準
+DAY_PATTERNS = {
+    '週一': 0, '星期一': 0, '一': 0, 'Monday': 0,
+    '週二': 1, '星期二': 1, '二': 1, 'Tuesday': 1,
+    '週三': 2, '星期三': 2, '三': 2, 'Wednesday': 2,
+    '週四': 3, '星期四': 3, '四': 3, 'Thursday': 3,
+    '週五': 4, '星期五': 4, '五': 4, 'Friday': 4,
+    '週六': 5, '星期六': 5, '六': 5, 'Saturday': 5,
+    '週日': 6, '星期日': 6, '日': 6, 'Sunday': 6,
+}
+_DAY_PRIORITY = {key: index for index, key in enumerate(DAY_PATTERNS)}
+# 單一交替樣式一次掃描整行；較長的標記在前，被長標記包住的短標記（如「星期一」中的「一」）必屬同一天
+DAY_RE = re.compile("|".join(re.escape(key) for key in sorted(DAY_PATTERNS, key=len, reverse=True)))
+
+# Time patterns (HH:MM-HH:MM, HH:MM HH:MM, etc.)
+TIME_RANGE_RE = re.compile(r'(\d{1,2}:\d{2})\s*[-~—至到]\s*(\d{1,2}:\d{2})')
+TIME_ONLY_RE = re.compile(r'^\d{1,2}:\d{2}$')
+
+# Course name patterns (Chinese characters + alphanumeric)
+COURSE_NAME_RE = re.compile(r'[一-龥][一-龥A-Za-z0-9\s\-\(\)]{2,30}')
+
+# Classroom patterns（依序嘗試）
+CLASSROOM_PATTERNS = [
+    re.compile(r'(電\d{3}[^(]*\([^)]+\))', re.I),  # 電708(承曦樓)
+    re.compile(r'(電\d{3})', re.I),  # 電101, 電203
+    re.compile(r'(\d{3}教室)', re.I),  # 101教室
+    re.compile(r'(教\d{3})', re.I),  # 教101
+    re.compile(r'(實驗室\d*)', re.I),  # 實驗室, 實驗室1
+    re.compile(r'(\d{3})', re.I),  # 101, 203
+    re.compile(r'(教室)', re.I),  # 教室
+]
+
+# Instructor patterns
+INSTRUCTOR_RE = re.compile(r'([^\s]{2,4}[P]?)\s*$')  # 蔡文隆P, 許晉龍
+
+# 直式課表（節次欄）使用的較嚴格樣式
+VERTICAL_COURSE_RE = re.compile(r'[一-龥]{2,20}(?:應用|設計|實務|專題|安全|倫理|法律|管理|智慧|人工|多媒體|電腦|資訊)')
+VERTICAL_INSTRUCTOR_RE = re.compile(r'([一-龥]{2,4}[P]?)\s*$')
+VERTICAL_CLASSROOM_RE = re.compile(r'(電\d{3}[^(]*\([^)]+\)|藝\d{3}|教\d{3}|實驗室\d*|\d{3}教室)')
+COURSE_NAME_CLEAN_RE = re.compile(r'[^一-龥A-Za-z0-9\s\-\(\)]')
+INSTRUCTOR_CLEAN_RE = re.compile(r'[^一-龥A-Za-z]')
+CLASSROOM_CLEAN_RE = re.compile(r'[^一-龥A-Za-z0-9\(\)]')
+
+MAX_TIMETABLE_COURSES = 15
+
+
+def detect_day(line: str):
+    """回傳行內的星期標記 (day_of_week, 標記)，沒有則回傳 None"""
+    best = None
+    for match in DAY_RE.finditer(line):
+        key = match.group(0)
+        if best is None or _DAY_PRIORITY[key] < _DAY_PRIORITY[best]:
+            best = key
+            if _DAY_PRIORITY[key] == 0:
+                break
+    return (DAY_PATTERNS[best], best) if best is not None else None
+
+
 def parse_course_from_text(text: str) -> Dict:
     """Parse a free-form OCR text into a course dict (best-effort).
     Heuristics:
     - Prefer labeled lines like: 課程名稱/Title, 教師/Instructor, 教室/Location/Classroom, 說明/Description
     - Fallback: first non-empty line as title; the rest become description.
     """
-    import re
-
     lines = [ln.strip() for ln in (text or "").splitlines()]
     lines = [ln for ln in lines if ln]
 
@@ -374,16 +797,9 @@ def parse_course_from_text(text: str) -> Dict:
     classroom = ""
     desc_parts: List[str] = []
 
-    patterns = [
-        ("title", re.compile(r"^(課程名稱|課程|title|course)\s*[:：]\s*(.+)$", re.I)),
-        ("instructor", re.compile(r"^(教師|老師|instructor|teacher)\s*[:：]\s*(.+)$", re.I)),
-        ("classroom", re.compile(r"^(教室|地點|location|classroom)\s*[:：]\s*(.+)$", re.I)),
-        ("description", re.compile(r"^(說明|描述|description)\s*[:：]\s*(.+)$", re.I)),
-    ]
-
     consumed = set()
     for idx, ln in enumerate(lines):
-        for key, pat in patterns:
+        for key, pat in LABELED_LINE_PATTERNS:
             m = pat.match(ln)
             if m:
                 val = m.group(2).strip()
@@ -429,77 +845,45 @@ def parse_multiple_courses_from_timetable(text: str) -> List[Dict]:
     3. Extract course names, times, and locations
     4. Group by course and create schedule entries
     """
-    import re
-    from datetime import datetime
-    
     txt = (text or '').replace('\r', '\n').strip()
     if not txt:
         return []
     
-    courses = []
     lines = [ln.strip() for ln in txt.split('\n') if ln.strip()]
     
-    # Enhanced patterns for Chinese timetables
-    day_patterns = {
-        '週一': 0, '星期一': 0, '一': 0, 'Monday': 0,
-        '週二': 1, '星期二': 1, '二': 1, 'Tuesday': 1,
-        '週三': 2, '星期三': 2, '三': 2, 'Wednesday': 2,
-        '週四': 3, '星期四': 3, '四': 3, 'Thursday': 3,
-        '週五': 4, '星期五': 4, '五': 4, 'Friday': 4,
-        '週六': 5, '星期六': 5, '六': 5, 'Saturday': 5,
-        '週日': 6, '星期日': 6, '日': 6, 'Sunday': 6,
-    }
-    
-    # Time patterns (HH:MM-HH:MM, HH:MM HH:MM, etc.)
-    time_pattern = re.compile(r'(\d{1,2}:\d{2})\s*[-~—至到]\s*(\d{1,2}:\d{2})')
-    single_time_pattern = re.compile(r'(\d{1,2}:\d{2})')
-    
-    # Course name patterns (Chinese characters + alphanumeric)
-    course_name_pattern = re.compile(r'[\u4e00-\u9fa5][\u4e00-\u9fa5A-Za-z0-9\s\-\(\)]{2,30}')
-    
-    # Classroom patterns
-    classroom_patterns = [
-        re.compile(r'(電\d{3}[^(]*\([^)]+\))', re.I),  # 電708(承曦樓)
-        re.compile(r'(電\d{3})', re.I),  # 電101, 電203
-        re.compile(r'(\d{3}教室)', re.I),  # 101教室
-        re.compile(r'(教\d{3})', re.I),  # 教101
-        re.compile(r'(實驗室\d*)', re.I),  # 實驗室, 實驗室1
-        re.compile(r'(\d{3})', re.I),  # 101, 203
-        re.compile(r'(教室)', re.I),  # 教室
-    ]
-    
-    # Instructor patterns
-    instructor_pattern = re.compile(r'([^\s]{2,4}[P]?)\s*$')  # 蔡文隆P, 許晉龍
-    
     # Check if this is a vertical timetable format (like the test image)
     has_vertical_format = any('節次' in line or '第一節' in line for line in lines)
     
     if has_vertical_format:
-        return _parse_vertical_timetable(lines, day_patterns, time_pattern, 
-                                       course_name_pattern, classroom_patterns, 
-                                       instructor_pattern)
+        return _parse_vertical_timetable(lines)
     else:
-        return _parse_horizontal_timetable(lines, day_patterns, time_pattern, 
-                                         course_name_pattern, classroom_patterns, 
-                                         instructor_pattern)
+        return _parse_horizontal_timetable(lines)
 
 
-def _parse_vertical_timetable(lines, day_patterns, time_pattern, course_name_pattern, 
-                            classroom_patterns, instructor_pattern):
-    """Parse vertical timetable format where courses are listed in columns."""
-    import re
-    
+def _timetable_courses(current_courses: Dict[str, Dict]) -> List[Dict]:
     courses = []
+    for course_data in current_courses.values():
+        if (course_data['schedule'] and
+                course_data['title'] and
+                len(course_data['title']) >= 2):
+            courses.append({
+                'title': course_data['title'][:255],
+                'description': course_data['description'][:1000],
+                'instructor': course_data['instructor'][:100],
+                'classroom': course_data['classroom'][:100],
+                'schedule': course_data['schedule']
+            })
+        if len(courses) >= MAX_TIMETABLE_COURSES:
+            break
+    return courses
+
+
+def _parse_vertical_timetable(lines: List[str]) -> List[Dict]:
+    """Parse vertical timetable format where courses are listed in columns."""
     current_courses = {}  # title -> course_data
     
-    # Enhanced course name pattern for better Chinese recognition
-    enhanced_course_pattern = re.compile(r'[\u4e00-\u9fa5]{2,20}(?:應用|設計|實務|專題|安全|倫理|法律|管理|智慧|人工|多媒體|電腦|資訊)')
-    
-    # Enhanced instructor pattern
-    enhanced_instructor_pattern = re.compile(r'([\u4e00-\u9fa5]{2,4}[P]?)\s*$')
-    
-    # Enhanced classroom pattern
-    enhanced_classroom_pattern = re.compile(r'(電\d{3}[^(]*\([^)]+\)|藝\d{3}|教\d{3}|實驗室\d*|\d{3}教室)')
+    # 每行的星期標記只偵測一次
+    line_days = [detect_day(line) for line in lines]
     
     # Find day markers and course information
     current_day = -1
@@ -508,36 +892,33 @@ def _parse_vertical_timetable(lines, day_patterns, time_pattern, course_name_pat
     # Process lines to find course blocks
     i = 0
     while i < len(lines):
-        line = lines[i].strip()
+        line = lines[i]
         
         # Check for day markers
-        for day_str, day_num in day_patterns.items():
-            if day_str in line:
-                current_day = day_num
-                break
+        if line_days[i] is not None:
+            current_day = line_days[i][0]
         
         # Look for course information blocks
         if current_day != -1 and line:
             # Check if this line contains course information
-            if (enhanced_course_pattern.search(line) or 
-                enhanced_instructor_pattern.search(line) or 
-                enhanced_classroom_pattern.search(line)):
+            if (VERTICAL_COURSE_RE.search(line) or
+                    VERTICAL_INSTRUCTOR_RE.search(line) or
+                    VERTICAL_CLASSROOM_RE.search(line)):
                 
                 # Collect course information in this block
                 course_info = []
                 j = i
-                while (j < len(lines) and 
-                       lines[j].strip() and 
-                       not any(day_str in lines[j] for day_str in day_patterns.keys()) and
-                       not lines[j].strip().startswith('第') and  # Skip period markers
-                       not re.match(r'^\d{1,2}:\d{2}$', lines[j].strip())):  # Skip time markers
-                    if lines[j].strip():
-                        course_info.append(lines[j].strip())
+                while (j < len(lines) and
+                       lines[j] and
+                       line_days[j] is None and
+                       not lines[j].startswith('第') and  # Skip period markers
+                       not TIME_ONLY_RE.match(lines[j])):  # Skip time markers
+                    course_info.append(lines[j])
                     j += 1
                 
                 if course_info:
                     course_blocks.append((current_day, course_info))
-                i = j - 1  # Skip processed lines
+                    i = j - 1  # Skip processed lines
         
         i += 1
     
@@ -550,34 +931,35 @@ def _parse_vertical_timetable(lines, day_patterns, time_pattern, course_name_pat
         
         # Process each piece of information
         for info in course_info:
-            info = info.strip()
-            if not info:
-                continue
-                
             # Check for course name (usually longer Chinese text)
-            if not course_name and enhanced_course_pattern.search(info):
-                course_name = enhanced_course_pattern.search(info).group(0).strip()
+            match = None if course_name else VERTICAL_COURSE_RE.search(info)
+            if match:
+                course_name = match.group(0).strip()
+                continue
             
             # Check for instructor (usually 2-4 Chinese characters with optional P)
-            elif not instructor and enhanced_instructor_pattern.search(info):
-                instructor = enhanced_instructor_pattern.search(info).group(1).strip()
+            match = None if instructor else VERTICAL_INSTRUCTOR_RE.search(info)
+            if match:
+                instructor = match.group(1).strip()
+                continue
             
             # Check for classroom (usually contains numbers and specific keywords)
-            elif not classroom and enhanced_classroom_pattern.search(info):
-                classroom = enhanced_classroom_pattern.search(info).group(1).strip()
+            match = None if classroom else VERTICAL_CLASSROOM_RE.search(info)
+            if match:
+                classroom = match.group(1).strip()
         
         # Only create course if we have a valid course name
         if course_name and len(course_name) >= 2:
             # Clean up course name (remove extra characters)
-            course_name = re.sub(r'[^\u4e00-\u9fa5A-Za-z0-9\s\-\(\)]', '', course_name).strip()
+            course_name = COURSE_NAME_CLEAN_RE.sub('', course_name).strip()
             
             # Clean up instructor
             if instructor:
-                instructor = re.sub(r'[^\u4e00-\u9fa5A-Za-z]', '', instructor).strip()
+                instructor = INSTRUCTOR_CLEAN_RE.sub('', instructor).strip()
             
             # Clean up classroom
             if classroom:
-                classroom = re.sub(r'[^\u4e00-\u9fa5A-Za-z0-9\(\)]', '', classroom).strip()
+                classroom = CLASSROOM_CLEAN_RE.sub('', classroom).strip()
             
             # Create or update course
             if course_name not in current_courses:
@@ -598,64 +980,47 @@ def _parse_vertical_timetable(lines, day_patterns, time_pattern, course_name_pat
             current_courses[course_name]['schedule'].append(schedule_entry)
     
     # Convert to list and filter out invalid courses
-    for course_data in current_courses.values():
-        if (course_data['schedule'] and 
-            course_data['title'] and 
-            len(course_data['title']) >= 2):
-            courses.append({
-                'title': course_data['title'][:255],
-                'description': course_data['description'][:1000],
-                'instructor': course_data['instructor'][:100],
-                'classroom': course_data['classroom'][:100],
-                'schedule': course_data['schedule']
-            })
-    
-    return courses[:15]
+    return _timetable_courses(current_courses)
 
 
-def _parse_horizontal_timetable(lines, day_patterns, time_pattern, course_name_pattern, 
-                              classroom_patterns, instructor_pattern):
+def _parse_horizontal_timetable(lines: List[str]) -> List[Dict]:
     """Parse horizontal timetable format (original logic)."""
-    courses = []
     current_courses = {}  # title -> course_data
     current_day = -1
     
     for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
         # Check for day markers
-        for day_str, day_num in day_patterns.items():
-            if day_str in line:
-                current_day = day_num
-                line = re.sub(rf'^{re.escape(day_str)}\s*', '', line).strip()
-                break
+        found = detect_day(line)
+        if found is not None:
+            current_day, day_str = found
+            if line.startswith(day_str):
+                line = line[len(day_str):]
+            line = line.strip()
         
         if current_day == -1:
             continue
         
         # Look for time patterns
-        time_match = time_pattern.search(line)
+        time_match = TIME_RANGE_RE.search(line)
         if time_match:
             start_time, end_time = time_match.groups()
             course_text = line[time_match.end():].strip()
             
             course_name = ""
-            course_match = course_name_pattern.search(course_text)
+            course_match = COURSE_NAME_RE.search(course_text)
             if course_match:
                 course_name = course_match.group(0).strip()
             
             if course_name:
                 classroom = ""
-                for pattern in classroom_patterns:
+                for pattern in CLASSROOM_PATTERNS:
                     classroom_match = pattern.search(course_text)
                     if classroom_match:
                         classroom = classroom_match.group(0)
                         break
                 
                 instructor = ""
-                instructor_match = instructor_pattern.search(course_text)
+                instructor_match = INSTRUCTOR_RE.search(course_text)
                 if instructor_match:
                     instructor = instructor_match.group(1)
                 
@@ -676,16 +1041,4 @@ def _parse_horizontal_timetable(lines, day_patterns, time_pattern, course_name_p
                 current_courses[course_name]['schedule'].append(schedule_entry)
     
     # Convert to list
-    for course_data in current_courses.values():
-        if course_data['schedule']:
-            courses.append({
-                'title': course_data['title'][:255],
-                'description': course_data['description'][:1000],
-                'instructor': course_data['instructor'][:100],
-                'classroom': course_data['classroom'][:100],
-                'schedule': course_data['schedule']
-            })
-    
-    return courses[:15]
-
-
+    return _timetable_courses(current_courses)
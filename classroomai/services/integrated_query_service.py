@@ -2,19 +2,85 @@
 整合查詢服務
 提供 Classroom 和本地資料的整合查詢功能
 """
+import functools
+import heapq
 import logging
-from typing import Dict, List, Optional
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db import close_old_connections, connection
 from django.utils import timezone
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from user.models import LineProfile
 from user.utils import get_valid_google_credentials
-from api_v2.models import CourseV2, AssignmentV2
+from api_v2.models import CourseV2, CourseScheduleV2, AssignmentV2
 from course.models import Course, Homework
+from .dashboard_summary_service import DashboardSummaryService
+from .search_service import SearchService
 
 logger = logging.getLogger(__name__)
 
+# Classroom 即時資料快取：新鮮 5 分鐘，過期資料最多保留 1 天
+LIVE_CACHE_KEY = "integrated:live:{kind}:{user}"
+LIVE_CACHE_LOCK_KEY = "integrated:live:{kind}:{user}:refreshing"
+LIVE_CACHE_FRESH = 5 * 60
+LIVE_CACHE_STALE = 24 * 60 * 60
+LIVE_CACHE_LOCK_TIMEOUT = 2 * 60
+
+# 串流列表：每批讀取筆數與 values() 欄位
+STREAM_CHUNK_SIZE = 500
+COURSE_STREAM_FIELDS = (
+    'id', 'title', 'description', 'instructor', 'classroom', 'color',
+    'is_google_classroom', 'google_classroom_id', 'created_at', 'updated_at',
+)
+SCHEDULE_STREAM_FIELDS = (
+    'day_of_week', 'start_time', 'end_time', 'location', 'schedule_source', 'is_default_schedule',
+)
+ASSIGNMENT_STREAM_FIELDS = (
+    'id', 'title', 'description', 'due_date', 'type', 'status', 'google_coursework_id', 'course_id', 'course__title', 'course__is_google_classroom',
+    'created_at', 'updated_at',
+)
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _instrumented(method):
+    """
+    記錄公開查詢方法的耗時，分為 Google 認證 / 建立 client（auth）與資料庫查詢（db）
+    結果寫入 self.timings 並以 debug 等級輸出
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        auth_before = self.timings['auth_ms']
+        db_before = self.timings['db_ms']
+        queries_before = self.timings['queries']
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._time_query):
+                return method(self, *args, **kwargs)
+        finally:
+            logger.debug(
+                f"IntegratedQueryService.{method.__name__} user={self.user.line_user_id} "
+                f"total={(time.perf_counter() - started) * 1000:.1f}ms "
+                f"auth={self.timings['auth_ms'] - auth_before:.1f}ms "
+                f"db={self.timings['db_ms'] - db_before:.1f}ms "
+                f"queries={self.timings['queries'] - queries_before}"
+            )
+    return wrapper
+
 
 class IntegratedQueryService:
     """整合查詢服務"""
@@ -22,18 +88,53 @@ class IntegratedQueryService:
     def __init__(self, line_user_id: str):
         """
         初始化查詢服務
+        Google client 延遲到第一次使用時才建立，只查資料庫的路徑不會有任何外部 I/O
         
         Args:
             line_user_id: LINE 使用者 ID
         """
-        self.user = LineProfile.objects.get(line_user_id=line_user_id)
+        self.timings = {'auth_ms': 0.0, 'db_ms': 0.0, 'queries': 0}
+        with connection.execute_wrapper(self._time_query):
+            self.user = LineProfile.objects.get(line_user_id=line_user_id)
+        self._classroom_service = None
+        self._classroom_resolved = False
+        self._classroom_lock = threading.Lock()
+    
+    @property
+    def classroom_service(self):
+        """Classroom API client（第一次存取時才更新憑證並建立，之後沿用；失敗時為 None）"""
+        if not self._classroom_resolved:
+            with self._classroom_lock:
+                if not self._classroom_resolved:
+                    with self._timed('auth_ms'):
+                        try:
+                            self.credentials = get_valid_google_credentials(self.user)
+                            self._classroom_service = build(
+                                'classroom', 'v1', credentials=self.credentials, cache_discovery=False
+                            )
+                        except Exception as e:
+                            logger.warning(
+                                f"Failed to initialize Google services for {self.user.line_user_id}: {str(e)}"
+                            )
+                            self._classroom_service = None
+                    self._classroom_resolved = True
+        return self._classroom_service
+    
+    @contextmanager
+    def _timed(self, bucket: str):
+        started = time.perf_counter()
         try:
-            self.credentials = get_valid_google_credentials(self.user)
-            self.classroom_service = build('classroom', 'v1', credentials=self.credentials, cache_discovery=False)
-        except Exception as e:
-            logger.warning(f"Failed to initialize Google services for {line_user_id}: {str(e)}")
-            self.classroom_service = None
+            yield
+        finally:
+            self.timings[bucket] += (time.perf_counter() - started) * 1000
+    
+    def _time_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper：累計資料庫查詢時間與次數"""
+        self.timings['queries'] += 1
+        with self._timed('db_ms'):
+            return execute(sql, params, many, context)
     
+    @_instrumented
     def get_integrated_courses(self, include_classroom: bool = True) -> List[Dict]:
         """
         獲取整合的課程列表（V2 本地 + Classroom 即時）
@@ -44,51 +145,64 @@ class IntegratedQueryService:
         Returns:
             List[Dict]: 整合的課程列表
         """
-        result = []
-        
-        # 1. 獲取 V2 本地資料（包含鏡像）
-        v2_courses = CourseV2.objects.filter(user=self.user).prefetch_related('schedules').order_by('-created_at')
-        
-        for course in v2_courses:
-            course_data = {
-                'id': str(course.id),
-                'title': course.title,
-                'description': course.description or '',
-                'instructor': course.instructor or '',
-                'classroom': course.classroom or '',
-                'color': course.color,
-                'source': 'classroom_mirror' if course.is_google_classroom else 'local',
-                'is_google_classroom': course.is_google_classroom,
-                'google_classroom_id': course.google_classroom_id,
-                'created_at': course.created_at.isoformat(),
-                'updated_at': course.updated_at.isoformat(),
-                'schedules': []
-            }
+        return list(self.iter_integrated_courses(include_classroom=include_classroom))
+    
+    def iter_integrated_courses(self, include_classroom: bool = True,
+                                chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Dict]:
+        """
+        逐筆產生整合的課程（串流輸出用）
+        本地資料以 values() + iterator() 分批讀取，每批只額外查一次課程時間，
+        記憶體用量與課程總數無關
+        
+        Args:
+            include_classroom: 是否包含 Classroom 即時資料
+            chunk_size: 每批讀取筆數
+        """
+        # 1. V2 本地資料（包含鏡像）
+        rows = CourseV2.objects.filter(user=self.user).order_by('-created_at').values(
+            *COURSE_STREAM_FIELDS
+        ).iterator(chunk_size=chunk_size)
+        
+        for chunk in _chunked(rows, chunk_size):
+            schedules = defaultdict(list)
+            for schedule in CourseScheduleV2.objects.filter(
+                course_id__in=[row['id'] for row in chunk]
+            ).values('course_id', *SCHEDULE_STREAM_FIELDS):
+                schedules[schedule['course_id']].append({
+                    'day_of_week': schedule['day_of_week'],
+                    'start_time': schedule['start_time'].strftime('%H:%M:%S'),
+                    'end_time': schedule['end_time'].strftime('%H:%M:%S'),
+                    'location': schedule['location'] or '',
+                    'schedule_source': schedule['schedule_source'],
+                    'is_default_schedule': schedule['is_default_schedule']
+                })
             
-            # 添加課程時間
-            for schedule in course.schedules.all():
-                schedule_data = {
-                    'day_of_week': schedule.day_of_week,
-                    'start_time': schedule.start_time.strftime('%H:%M:%S'),
-                    'end_time': schedule.end_time.strftime('%H:%M:%S'),
-                    'location': schedule.location or '',
-                    'schedule_source': schedule.schedule_source,
-                    'is_default_schedule': schedule.is_default_schedule
+            for row in chunk:
+                yield {
+                    'id': str(row['id']),
+                    'title': row['title'],
+                    'description': row['description'] or '',
+                    'instructor': row['instructor'] or '',
+                    'classroom': row['classroom'] or '',
+                    'color': row['color'],
+                    'source': 'classroom_mirror' if row['is_google_classroom'] else 'local',
+                    'is_google_classroom': row['is_google_classroom'],
+                    'google_classroom_id': row['google_classroom_id'],
+                    'created_at': row['created_at'].isoformat(),
+                    'updated_at': row['updated_at'].isoformat(),
+                    'schedules': schedules.get(row['id'], [])
                 }
-                course_data['schedules'].append(schedule_data)
-            
-            result.append(course_data)
         
-        # 2. 如果需要，獲取 Classroom 即時資料（未同步的課程）
-        if include_classroom and self.classroom_service:
+        # 2. 如果需要，附加 Classroom 即時資料（未同步的課程）
+        if include_classroom:
             try:
                 classroom_courses = self._get_classroom_courses_not_in_v2()
-                result.extend(classroom_courses)
             except Exception as e:
                 logger.error(f"Failed to fetch classroom courses: {str(e)}")
-        
-        return result
+                classroom_courses = []
+            yield from classroom_courses
     
+    @_instrumented
     def get_integrated_assignments(self, **filters) -> List[Dict]:
         """
         獲取整合的作業列表（V2 本地 + Classroom 即時）
@@ -99,10 +213,19 @@ class IntegratedQueryService:
         Returns:
             List[Dict]: 整合的作業列表
         """
-        result = []
+        return list(self.iter_integrated_assignments(**filters))
+    
+    def iter_integrated_assignments(self, chunk_size: int = STREAM_CHUNK_SIZE, **filters) -> Iterator[Dict]:
+        """
+        依截止日期逐筆產生整合的作業（串流輸出用）
+        本地資料由資料庫依 due_date 排序後分批讀取，再與（少量的）Classroom 即時資料合併排序
         
-        # 1. 獲取 V2 本地資料（包含鏡像）
-        queryset = AssignmentV2.objects.filter(user=self.user).select_related('course')
+        Args:
+            chunk_size: 每批讀取筆數
+            **filters: 篩選條件
+        """
+        # 1. V2 本地資料（包含鏡像）
+        queryset = AssignmentV2.objects.filter(user=self.user)
         
         # 應用篩選條件
         if 'status' in filters:
@@ -113,94 +236,80 @@ class IntegratedQueryService:
             end_date = timezone.now() + timedelta(days=days)
             queryset = queryset.filter(due_date__lte=end_date, due_date__gte=timezone.now())
         
-        assignments = queryset.order_by('due_date')
-        
-        for assignment in assignments:
-            assignment_data = {
-                'id': str(assignment.id),
-                'title': assignment.title,
-                'description': assignment.description or '',
-                'due_date': assignment.due_date.isoformat(),
-                'type': assignment.type,
-                'status': assignment.status,
-                'source': 'classroom_mirror' if assignment.is_google_classroom else 'local',
-                'is_google_classroom': assignment.is_google_classroom,
-                'google_coursework_id': assignment.google_coursework_id,
-                'course': {
-                    'id': str(assignment.course.id),
-                    'title': assignment.course.title,
-                    'is_google_classroom': assignment.course.is_google_classroom
-                },
-                'created_at': assignment.created_at.isoformat(),
-                'updated_at': assignment.updated_at.isoformat()
-            }
-            result.append(assignment_data)
+        rows = queryset.order_by('due_date').values(*ASSIGNMENT_STREAM_FIELDS).iterator(chunk_size=chunk_size)
+        local_assignments = (self._format_assignment_row(row) for row in rows)
         
-        # 2. 如果需要，獲取 Classroom 即時資料（未同步的作業）
-        if self.classroom_service:
-            try:
-                classroom_assignments = self._get_classroom_assignments_not_in_v2(**filters)
-                result.extend(classroom_assignments)
-            except Exception as e:
-                logger.error(f"Failed to fetch classroom assignments: {str(e)}")
-        
-        # 3. 重新排序
-        result.sort(key=lambda x: x['due_date'])
+        # 2. Classroom 即時資料（未同步的作業）
+        try:
+            classroom_assignments = self._get_classroom_assignments_not_in_v2(**filters)
+        except Exception as e:
+            logger.error(f"Failed to fetch classroom assignments: {str(e)}")
+            classroom_assignments = []
+        classroom_assignments.sort(key=lambda x: x['due_date'])
         
-        return result
+        # 3. 兩個已排序的來源合併
+        yield from heapq.merge(local_assignments, classroom_assignments, key=lambda x: x['due_date'])
+    
+    @staticmethod
+    def _format_assignment_row(row: Dict) -> Dict:
+        """values() 列轉為 API 格式（is_google_classroom 與 AssignmentV2.is_google_classroom 相同規則）"""
+        is_google_classroom = bool(row['google_coursework_id']) or row['course__is_google_classroom']
+        return {
+            'id': str(row['id']),
+            'title': row['title'],
+            'description': row['description'] or '',
+            'due_date': row['due_date'].isoformat(),
+            'type': row['type'],
+            'status': row['status'],
+            'source': 'classroom_mirror' if is_google_classroom else 'local',
+            'is_google_classroom': is_google_classroom,
+            'google_coursework_id': row['google_coursework_id'],
+            'course': {
+                'id': str(row['course_id']),
+                'title': row['course__title'],
+                'is_google_classroom': row['course__is_google_classroom']
+            },
+            'created_at': row['created_at'].isoformat(),
+            'updated_at': row['updated_at'].isoformat()
+        }
     
+    @_instrumented
     def get_course_summary(self) -> Dict:
         """
         獲取課程摘要統計
+        計數來自物化的 UserDashboardSummary（單一主鍵查詢），僅即將到期數需即時計算
         
         Returns:
             Dict: 課程統計資訊
         """
-        v2_courses = CourseV2.objects.filter(user=self.user)
-        v2_assignments = AssignmentV2.objects.filter(user=self.user)
-        
-        # 統計本地和鏡像資料
-        local_courses = v2_courses.filter(is_google_classroom=False).count()
-        mirror_courses = v2_courses.filter(is_google_classroom=True).count()
-        
-        local_assignments = v2_assignments.filter(google_coursework_id__isnull=True).count()
-        mirror_assignments = v2_assignments.filter(google_coursework_id__isnull=False).count()
-        
-        # 統計作業狀態
-        pending_assignments = v2_assignments.filter(status='pending').count()
-        completed_assignments = v2_assignments.filter(status='completed').count()
-        overdue_assignments = v2_assignments.filter(status='overdue').count()
+        summary = DashboardSummaryService.get_summary(self.user.line_user_id)
         
         # 統計即將到期的作業（7天內）
-        upcoming_deadline = timezone.now() + timedelta(days=7)
-        upcoming_assignments = v2_assignments.filter(
-            due_date__lte=upcoming_deadline,
-            due_date__gte=timezone.now(),
-            status='pending'
-        ).count()
+        upcoming_assignments = DashboardSummaryService.count_upcoming(self.user.line_user_id, days=7)
         
         return {
             'courses': {
-                'total': local_courses + mirror_courses,
-                'local': local_courses,
-                'classroom_mirror': mirror_courses
+                'total': summary.courses_local + summary.courses_mirror,
+                'local': summary.courses_local,
+                'classroom_mirror': summary.courses_mirror
             },
             'assignments': {
-                'total': local_assignments + mirror_assignments,
-                'local': local_assignments,
-                'classroom_mirror': mirror_assignments,
+                'total': summary.assignments_local + summary.assignments_mirror,
+                'local': summary.assignments_local,
+                'classroom_mirror': summary.assignments_mirror,
                 'by_status': {
-                    'pending': pending_assignments,
-                    'completed': completed_assignments,
-                    'overdue': overdue_assignments
+                    'pending': summary.assignments_pending,
+                    'completed': summary.assignments_completed,
+                    'overdue': summary.assignments_overdue
                 },
                 'upcoming_7_days': upcoming_assignments
             }
         }
     
+    @_instrumented
     def search_courses_and_assignments(self, query: str) -> Dict:
         """
-        搜尋課程和作業
+        搜尋課程和作業（全文索引，依相關度排序）
         
         Args:
             query: 搜尋關鍵字
@@ -208,28 +317,94 @@ class IntegratedQueryService:
         Returns:
             Dict: 搜尋結果
         """
+        ranked = SearchService.search(self.user.line_user_id, query, ['course', 'assignment'], limit=None)
+        course_ids = [r['id'] for r in ranked if r['type'] == 'course']
+        assignment_ids = [r['id'] for r in ranked if r['type'] == 'assignment']
+        
         # 搜尋課程
-        courses = CourseV2.objects.filter(
-            user=self.user,
-            title__icontains=query
-        ).values('id', 'title', 'is_google_classroom')
+        courses = {
+            str(course['id']): course
+            for course in CourseV2.objects.filter(user=self.user, id__in=course_ids).values(
+                'id', 'title', 'is_google_classroom'
+            )
+        }
         
         # 搜尋作業
-        assignments = AssignmentV2.objects.filter(
-            user=self.user,
-            title__icontains=query
-        ).select_related('course').values(
-            'id', 'title', 'due_date', 'status',
-            'course__title', 'course__is_google_classroom'
-        )
+        assignments = {
+            str(assignment['id']): assignment
+            for assignment in AssignmentV2.objects.filter(user=self.user, id__in=assignment_ids).values(
+                'id', 'title', 'due_date', 'status',
+                'course__title', 'course__is_google_classroom'
+            )
+        }
         
+        courses = [courses[pk] for pk in course_ids if pk in courses]
+        assignments = [assignments[pk] for pk in assignment_ids if pk in assignments]
         return {
             'query': query,
-            'courses': list(courses),
-            'assignments': list(assignments),
+            'courses': courses,
+            'assignments': assignments,
             'total_results': len(courses) + len(assignments)
         }
     
+    # ── Classroom 即時資料快取（stale-while-revalidate）─────────────
+    
+    def _get_live_slice(self, kind: str) -> List[Dict]:
+        """
+        取得 Classroom 即時資料的快取
+        - 新鮮（LIVE_CACHE_FRESH 秒內）：直接回傳
+        - 過期但仍保留：立即回傳舊資料，並在背景更新（每位使用者同時只有一個更新）
+        - 完全沒有快取：同步向 Google 取得
+        
+        Args:
+            kind: 'courses' 或 'assignments'
+        """
+        key = LIVE_CACHE_KEY.format(kind=kind, user=self.user.line_user_id)
+        entry = cache.get(key)
+        if entry is None:
+            return self._refresh_live_slice(kind)
+        
+        if time.time() - entry['fetched_at'] > LIVE_CACHE_FRESH:
+            self._schedule_live_refresh(kind)
+        return entry['data']
+    
+    def _refresh_live_slice(self, kind: str) -> List[Dict]:
+        """向 Google 取得最新資料並寫入快取（失敗時不覆蓋舊快取）"""
+        if not self.classroom_service:
+            return []
+        fetcher = self._fetch_live_courses if kind == 'courses' else self._fetch_live_assignments
+        try:
+            data = fetcher()
+        except HttpError as e:
+            logger.error(f"Failed to fetch classroom {kind}: {str(e)}")
+            return []
+        cache.set(
+            LIVE_CACHE_KEY.format(kind=kind, user=self.user.line_user_id),
+            {'data': data, 'fetched_at': time.time()},
+            LIVE_CACHE_STALE
+        )
+        return data
+    
+    def _schedule_live_refresh(self, kind: str) -> None:
+        """背景更新快取；以 cache.add 作為每位使用者的 single-flight 鎖"""
+        line_user_id = self.user.line_user_id
+        lock_key = LIVE_CACHE_LOCK_KEY.format(kind=kind, user=line_user_id)
+        if not cache.add(lock_key, 1, LIVE_CACHE_LOCK_TIMEOUT):
+            return
+        
+        def refresh():
+            try:
+                IntegratedQueryService(line_user_id)._refresh_live_slice(kind)
+            except Exception as e:
+                logger.warning(f"Background classroom {kind} refresh failed for {line_user_id}: {str(e)}")
+            finally:
+                cache.delete(lock_key)
+                close_old_connections()
+        
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+    
     def _get_classroom_courses_not_in_v2(self) -> List[Dict]:
         """
         獲取尚未同步到 V2 的 Classroom 課程
@@ -237,71 +412,20 @@ class IntegratedQueryService:
         Returns:
             List[Dict]: 未同步的課程列表
         """
-        try:
-            # 獲取所有 Classroom 課程（學生身份）
-            # 只獲取 ACTIVE 狀態的課程，排除 ARCHIVED 等過期課程
-            courses_response = self.classroom_service.courses().list(
-                studentId='me',
-                courseStates=['ACTIVE']
-            ).execute()
-            
-            # 過濾當前學期的課程（過去6個月內創建的課程）
-            current_time = timezone.now()
-            six_months_ago = current_time - timezone.timedelta(days=180)
-            current_courses = []
-            
-            for course in courses_response.get('courses', []):
-                try:
-                    creation_time_str = course.get('creationTime')
-                    if creation_time_str:
-                        from dateutil import parser
-                        creation_time = parser.parse(creation_time_str)
-                        if creation_time >= six_months_ago:
-                            current_courses.append(course)
-                    else:
-                        current_courses.append(course)
-                except Exception:
-                    current_courses.append(course)
-            
-            courses_response['courses'] = current_courses
-            
-            classroom_courses = courses_response.get('courses', [])
-            
-            # 獲取已同步的課程 ID
-            synced_course_ids = set(
-                CourseV2.objects.filter(
-                    user=self.user,
-                    is_google_classroom=True,
-                    google_classroom_id__isnull=False
-                ).values_list('google_classroom_id', flat=True)
-            )
-            
-            # 篩選未同步的課程
-            unsynced_courses = []
-            for course in classroom_courses:
-                if course['id'] not in synced_course_ids:
-                    course_data = {
-                        'id': f"classroom_{course['id']}",  # 臨時 ID
-                        'title': course['name'],
-                        'description': course.get('description', ''),
-                        'instructor': course.get('ownerId', ''),
-                        'classroom': '',
-                        'color': '#fbbf24',  # 黃色表示未同步
-                        'source': 'classroom_live',
-                        'is_google_classroom': True,
-                        'google_classroom_id': course['id'],
-                        'created_at': course.get('creationTime', ''),
-                        'updated_at': course.get('updateTime', ''),
-                        'schedules': [],
-                        'sync_status': 'not_synced'
-                    }
-                    unsynced_courses.append(course_data)
-            
-            return unsynced_courses
-            
-        except HttpError as e:
-            logger.error(f"Failed to fetch classroom courses: {str(e)}")
+        live_courses = self._get_live_slice('courses')
+        if not live_courses:
             return []
+        
+        # 獲取已同步的課程 ID（讀取時過濾，快取期間新同步的課程不會重複出現）
+        synced_course_ids = set(
+            CourseV2.objects.filter(
+                user=self.user,
+                is_google_classroom=True,
+                google_classroom_id__isnull=False
+            ).values_list('google_classroom_id', flat=True)
+        )
+        
+        return [course for course in live_courses if course['google_classroom_id'] not in synced_course_ids]
     
     def _get_classroom_assignments_not_in_v2(self, **filters) -> List[Dict]:
         """
@@ -313,75 +437,131 @@ class IntegratedQueryService:
         Returns:
             List[Dict]: 未同步的作業列表
         """
-        try:
-            # 獲取已同步的作業 ID
-            synced_assignment_ids = set(
-                AssignmentV2.objects.filter(
-                    user=self.user,
-                    google_coursework_id__isnull=False
-                ).values_list('google_coursework_id', flat=True)
-            )
-            
-            # 獲取所有 Classroom 課程的作業
-            unsynced_assignments = []
-            
-            courses_response = self.classroom_service.courses().list(
-                studentId='me',
-                courseStates=['ACTIVE']
-            ).execute()
-            
-            for course in courses_response.get('courses', []):
-                try:
-                    coursework_response = self.classroom_service.courses().courseWork().list(
-                        courseId=course['id'],
-                        courseWorkStates=['PUBLISHED']
-                    ).execute()
-                    
-                    for coursework in coursework_response.get('courseWork', []):
-                        if coursework['id'] not in synced_assignment_ids:
-                            # 解析截止日期
-                            due_date = self._parse_classroom_due_date(
-                                coursework.get('dueDate'),
-                                coursework.get('dueTime')
-                            )
-                            
-                            # 應用篩選條件
-                            if 'upcomingWithinDays' in filters:
-                                days = int(filters['upcomingWithinDays'])
-                                end_date = timezone.now() + timedelta(days=days)
-                                if due_date > end_date or due_date < timezone.now():
-                                    continue
-                            
-                            assignment_data = {
-                                'id': f"classroom_{coursework['id']}",  # 臨時 ID
-                                'title': coursework['title'],
-                                'description': coursework.get('description', ''),
-                                'due_date': due_date.isoformat(),
-                                'type': 'assignment',
-                                'status': 'pending',
-                                'source': 'classroom_live',
-                                'is_google_classroom': True,
-                                'google_coursework_id': coursework['id'],
-                                'course': {
-                                    'id': f"classroom_{course['id']}",
-                                    'title': course['name'],
-                                    'is_google_classroom': True
-                                },
-                                'created_at': coursework.get('creationTime', ''),
-                                'updated_at': coursework.get('updateTime', ''),
-                                'sync_status': 'not_synced'
-                            }
-                            unsynced_assignments.append(assignment_data)
-                            
-                except HttpError as e:
-                    logger.warning(f"Failed to fetch coursework for course {course['id']}: {str(e)}")
-                    continue
-            
-            return unsynced_assignments
-            
-        except HttpError as e:
-            logger.error(f"Failed to fetch classroom assignments: {str(e)}")
+        live_assignments = self._get_live_slice('assignments')
+        if not live_assignments:
             return []
+        
+        # 獲取已同步的作業 ID
+        synced_assignment_ids = set(
+            AssignmentV2.objects.filter(
+                user=self.user,
+                google_coursework_id__isnull=False
+            ).values_list('google_coursework_id', flat=True)
+        )
+        
+        result = [a for a in live_assignments if a['google_coursework_id'] not in synced_assignment_ids]
+        
+        # 應用篩選條件
+        if 'upcomingWithinDays' in filters:
+            now = timezone.now()
+            end_date = now + timedelta(days=int(filters['upcomingWithinDays']))
+            result = [a for a in result if now <= datetime.fromisoformat(a['due_date']) <= end_date]
+        
+        return result
+    
+    def _fetch_live_courses(self) -> List[Dict]:
+        """
+        向 Google 取得目前學期的 Classroom 課程（未過濾已同步者）
+        
+        Raises:
+            HttpError: Google API 錯誤
+        """
+        # 獲取所有 Classroom 課程（學生身份）
+        # 只獲取 ACTIVE 狀態的課程，排除 ARCHIVED 等過期課程
+        courses_response = self.classroom_service.courses().list(
+            studentId='me',
+            courseStates=['ACTIVE']
+        ).execute()
+        
+        # 過濾當前學期的課程（過去6個月內創建的課程）
+        current_time = timezone.now()
+        six_months_ago = current_time - timezone.timedelta(days=180)
+        current_courses = []
+        
+        for course in courses_response.get('courses', []):
+            try:
+                creation_time_str = course.get('creationTime')
+                if creation_time_str:
+                    from dateutil import parser
+                    creation_time = parser.parse(creation_time_str)
+                    if creation_time >= six_months_ago:
+                        current_courses.append(course)
+                else:
+                    current_courses.append(course)
+            except Exception:
+                current_courses.append(course)
+        
+        return [
+            {
+                'id': f"classroom_{course['id']}",  # 臨時 ID
+                'title': course['name'],
+                'description': course.get('description', ''),
+                'instructor': course.get('ownerId', ''),
+                'classroom': '',
+                'color': '#fbbf24',  # 黃色表示未同步
+                'source': 'classroom_live',
+                'is_google_classroom': True,
+                'google_classroom_id': course['id'],
+                'created_at': course.get('creationTime', ''),
+                'updated_at': course.get('updateTime', ''),
+                'schedules': [],
+                'sync_status': 'not_synced'
+            }
+            for course in current_courses
+        ]
+    
+    def _fetch_live_assignments(self) -> List[Dict]:
+        """
+        向 Google 取得所有進行中課程的已發布作業（未過濾已同步者）
+        
+        Raises:
+            HttpError: 取得課程列表失敗
+        """
+        live_assignments = []
+        
+        courses_response = self.classroom_service.courses().list(
+            studentId='me',
+            courseStates=['ACTIVE']
+        ).execute()
+        
+        for course in courses_response.get('courses', []):
+            try:
+                coursework_response = self.classroom_service.courses().courseWork().list(
+                    courseId=course['id'],
+                    courseWorkStates=['PUBLISHED']
+                ).execute()
+            except HttpError as e:
+                logger.warning(f"Failed to fetch coursework for course {course['id']}: {str(e)}")
+                continue
+            
+            for coursework in coursework_response.get('courseWork', []):
+                # 解析截止日期
+                due_date = self._parse_classroom_due_date(
+                    coursework.get('dueDate'),
+                    coursework.get('dueTime')
+                )
+                
+                live_assignments.append({
+                    'id': f"classroom_{coursework['id']}",  # 臨時 ID
+                    'title': coursework['title'],
+                    'description': coursework.get('description', ''),
+                    'due_date': due_date.isoformat(),
+                    'type': 'assignment',
+                    'status': 'pending',
+                    'source': 'classroom_live',
+                    'is_google_classroom': True,
+                    'google_coursework_id': coursework['id'],
+                    'course': {
+                        'id': f"classroom_{course['id']}",
+                        'title': course['name'],
+                        'is_google_classroom': True
+                    },
+                    'created_at': coursework.get('creationTime', ''),
+                    'updated_at': coursework.get('updateTime', ''),
+                    'sync_status': 'not_synced'
+                })
+        
+        return live_assignments
     
     def _parse_classroom_due_date(self, due_date_dict: Optional[Dict], due_time_dict: Optional[Dict]) -> datetime:
         """
@@ -410,4 +590,4 @@ class IntegratedQueryService:
         try:
             return timezone.make_aware(datetime(year, month, day, hour, minute))
         except ValueError:
-            return timezone.now() + timedelta(days=7)
\ No newline at end of file
+            return timezone.now() + timedelta(days=7)
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+LINE Messaging API 發送服務
+統一處理推播的速率限制、429 重試、同一收件者訊息合併與每月訊息額度
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from linebot import LineBotApi
+from linebot.exceptions import LineBotApiError
+
+logger = logging.getLogger(__name__)
+
+# LINE 單次 push / reply 最多 5 則訊息，multicast 最多 500 位收件者
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_MULTICAST_RECIPIENTS = 500
+
+
+class LinePushSuppressedError(Exception):
+    """每月訊息額度即將用盡，已降級為僅回覆（reply-only）模式"""
+    pass
+
+
+class TokenBucket:
+    """
+    執行緒安全的 Token Bucket 限流器
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒補充的 token 數
+            capacity: 桶容量（預設等於 rate，即允許一秒的突發量）
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        取得 token，不足時阻塞等待
+
+        Args:
+            tokens: 需要的 token 數
+            timeout: 最長等待秒數（None 表示一直等待）
+
+        Returns:
+            bool: 是否成功取得
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LineQuotaMeter:
+    """
+    每月訊息額度監控
+    定期查詢 LINE quota / consumption 端點（背景執行緒，不阻塞發送），剩餘額度低於門檻時切換為僅回覆模式
+    LINE 以收件者人數計費：每次 push 計 1，multicast 計收件者人數
+    """
+
+    def __init__(self, api: LineBotApi, refresh_interval: int = 300, reserve: int = 0):
+        """
+        Args:
+            api: LineBotApi 實例
+            refresh_interval: 重新查詢額度的間隔（秒）
+            reserve: 保留的訊息數，剩餘額度低於此值即降級
+        """
+        self.api = api
+        self.refresh_interval = refresh_interval
+        self.reserve = reserve
+        self.limit: Optional[int] = None
+        self.used: int = 0
+        self._forced_reply_only = False
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        """查詢目前額度與已使用量（同步呼叫 LINE API，失敗時保留舊值）"""
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = time.monotonic()
+        try:
+            quota = self.api.get_message_quota()
+            consumption = self.api.get_message_quota_consumption()
+            with self._lock:
+                self.limit = quota.value if quota.type == 'limited' else None
+                self.used = consumption.total_usage or 0
+                # 新的計費週期額度恢復後自動解除降級
+                if self.limit is None or self.used < self.limit:
+                    self._forced_reply_only = False
+        except Exception as e:
+            logger.warning(f"Failed to refresh LINE message quota: {str(e)}")
+
+    def refresh_in_background(self) -> None:
+        """額度資料過期時以背景執行緒重新查詢，呼叫端沿用目前的數值"""
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(force=True)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='line-quota-refresh', daemon=True).start()
+
+    def record(self, count: int) -> None:
+        """記錄本地送出的計費訊息數（收件者人數），避免兩次查詢之間超用"""
+        with self._lock:
+            self.used += count
+
+    def mark_exhausted(self) -> None:
+        """LINE 回報已達每月上限時強制降級"""
+        with self._lock:
+            self._forced_reply_only = True
+        logger.warning("LINE monthly message quota exhausted, switching to reply-only mode")
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.limit is None:
+            return None
+        return max(self.limit - self.used, 0)
+
+    def is_reply_only(self) -> bool:
+        """是否應停止推播，只允許 reply"""
+        self.refresh_in_background()
+        if self._forced_reply_only:
+            return True
+        remaining = self.remaining
+        return remaining is not None and remaining <= self.reserve
+
+    def status(self) -> Dict:
+        return {
+            'limit': self.limit,
+            'used': self.used,
+            'remaining': self.remaining,
+            'reply_only': self.is_reply_only(),
+        }
+
+
+class LineMessagingService:
+    """LINE 訊息發送服務"""
+
+    # LINE 官方各端點速率限制（每秒請求數）
+    DEFAULT_RATE_LIMITS = {
+        'push': 2000,
+        'multicast': 200,
+        'reply': 2000,
+    }
+
+    def __init__(self, channel_token: Optional[str] = None, rate_limits: Optional[Dict[str, float]] = None,
+                 max_retries: int = 3, quota_reserve: int = 0, quota_refresh_interval: int = 300):
+        """
+        Args:
+            channel_token: LINE Channel access token
+            rate_limits: 各端點每秒請求數上限
+            max_retries: 429 / 5xx 的最大重試次數
+            quota_reserve: 保留給推播以外用途的訊息數
+            quota_refresh_interval: 額度查詢間隔（秒）
+        """
+        self.api = LineBotApi(channel_token or getattr(settings, 'CHANNEL_TOKEN', None) or os.getenv("CHANNEL_TOKEN"))
+        limits = dict(self.DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or {})
+        self.buckets = {endpoint: TokenBucket(rate) for endpoint, rate in limits.items()}
+        self.max_retries = max_retries
+        self.quota = LineQuotaMeter(self.api, refresh_interval=quota_refresh_interval, reserve=quota_reserve)
+        self._local = threading.local()
+
+    # ── 內部工具 ─────────────────────────────────────────
+
+    @staticmethod
+    def _as_list(messages) -> List:
+        return list(messages) if isinstance(messages, (list, tuple)) else [messages]
+
+    @staticmethod
+    def _retry_after(error: LineBotApiError, default: float) -> float:
+        headers = getattr(error, 'headers', None) or {}
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        try:
+            return max(float(value), 0.0) if value is not None else default
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def _is_monthly_limit(error: LineBotApiError) -> bool:
+        message = getattr(getattr(error, 'error', None), 'message', '') or ''
+        return error.status_code == 429 and 'monthly limit' in message.lower()
+
+    def _call(self, endpoint: str, func, *args, **kwargs):
+        """
+        依端點限流後呼叫 API，遇 429 依 Retry-After 重試、5xx 指數退避重試
+        push / multicast 帶 X-Line-Retry-Key，確保重試不會重複送達
+        """
+        if endpoint in ('push', 'multicast'):
+            kwargs.setdefault('retry_key', str(uuid.uuid4()))
+
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            self.buckets[endpoint].acquire()
+            try:
+                return func(*args, **kwargs)
+            except LineBotApiError as e:
+                if self._is_monthly_limit(e):
+                    self.quota.mark_exhausted()
+                    raise LinePushSuppressedError("LINE 每月訊息額度已用盡") from e
+                # 409 代表相同 retry key 的請求已被接受，視為成功
+                if e.status_code == 409 and 'retry_key' in kwargs:
+                    return None
+                retryable = e.status_code == 429 or e.status_code >= 500
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                wait = self._retry_after(e, delay)
+                logger.warning(f"LINE {endpoint} failed with {e.status_code}, retrying in {wait}s "
+                               f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(wait)
+                delay *= 2
+
+    def _ensure_push_allowed(self) -> None:
+        if self.quota.is_reply_only():
+            raise LinePushSuppressedError("LINE 訊息額度不足，目前僅允許回覆訊息")
+
+    # ── 對外 API ─────────────────────────────────────────
+
+    def push(self, to: str, messages, notification_disabled: bool = False) -> None:
+        """
+        推播訊息給單一收件者（使用者或群組）
+        若正處於 coalesce() 區塊內，訊息會先暫存，於區塊結束時合併送出
+
+        Raises:
+            LinePushSuppressedError: 已降級為僅回覆模式
+            LineBotApiError: 重試後仍失敗
+        """
+        messages = self._as_list(messages)
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.setdefault(to, []).extend(messages)
+            return
+        self._ensure_push_allowed()
+        for start in range(0, len(messages), MAX_MESSAGES_PER_REQUEST):
+            chunk = messages[start:start + MAX_MESSAGES_PER_REQUEST]
+            self._call('push', self.api.push_message, to, chunk, notification_disabled=notification_disabled)
+            # 一次請求內的多則訊息只計一次
+            self.quota.record(1)
+
+    def multicast(self, to: List[str], messages, notification_disabled: bool = False) -> None:
+        """
+        以 multicast 一次送給多位使用者（自動切成每批 500 人）
+        """
+        messages = self._as_list(messages)[:MAX_MESSAGES_PER_REQUEST]
+        self._ensure_push_allowed()
+        recipients = list(dict.fromkeys(to))
+        for start in range(0, len(recipients), MAX_MULTICAST_RECIPIENTS):
+            chunk = recipients[start:start + MAX_MULTICAST_RECIPIENTS]
+            self._call('multicast', self.api.multicast, chunk, messages, notification_disabled=notification_disabled)
+            self.quota.record(len(chunk))
+
+    def reply(self, reply_token: str, messages) -> None:
+        """回覆訊息（不計入每月額度，降級模式下仍可使用）"""
+        messages = self._as_list(messages)[:MAX_MESSAGES_PER_REQUEST]
+        self._call('reply', self.api.reply_message, reply_token, messages)
+
+    @contextmanager
+    def coalesce(self):
+        """
+        合併區塊內對同一收件者的推播，結束時每人以每次最多 5 則的 push 送出
+
+        用法：
+            with line_messaging_service.coalesce():
+                line_messaging_service.push(user_id, msg1)
+                line_messaging_service.push(user_id, msg2)
+        """
+        outer = getattr(self._local, 'pending', None)
+        if outer is not None:
+            # 巢狀使用時併入最外層一起送出
+            yield
+            return
+        self._local.pending = {}
+        try:
+            yield
+            pending = self._local.pending
+        finally:
+            self._local.pending = None
+        for to, messages in pending.items():
+            self.push(to, messages)
+
+    def quota_status(self) -> Dict:
+        """回傳每月額度使用狀況"""
+        return self.quota.status()
+
+
+# 全域發送服務實例
+line_messaging_service = LineMessagingService(
+    rate_limits=getattr(settings, 'LINE_RATE_LIMITS', None),
+    quota_reserve=getattr(settings, 'LINE_QUOTA_RESERVE', 0),
+)
@@ -0,0 +1,181 @@
+"""
+LLM 用戶端共用層
+- 每組 (provider, base_url, api_key) 只建立一個 OpenAI 相容用戶端，沿用其 HTTP 連線池（執行緒安全）
+- google.generativeai 只在 API key 變更時重新 configure，GenerativeModel 依模型名稱重複使用
+- 依呼叫位置（call site）統計呼叫次數、錯誤數、延遲與 token 用量
+"""
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# OpenAI 相容 API 的逾時與 SDK 內建重試次數
+OPENAI_TIMEOUT_SECONDS = 60.0
+OPENAI_MAX_RETRIES = 2
+
+_lock = threading.Lock()
+_openai_clients: Dict[Tuple[str, str, str], object] = {}
+_genai_key_fingerprint: Optional[str] = None
+_genai_models: Dict[Tuple[str, str], object] = {}
+
+
+def _fingerprint(api_key: str) -> str:
+    """以雜湊值作為登錄鍵，避免 API key 原文出現在日誌或除錯輸出中"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+def get_openai_client(provider: str, base_url: str, api_key: str):
+    """
+    取得共用的 OpenAI 相容用戶端
+
+    Args:
+        provider: 供應商名稱（僅作為登錄鍵與日誌使用）
+        base_url: API 位址
+        api_key: API key
+    """
+    key = (provider, base_url, _fingerprint(api_key))
+    client = _openai_clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=OPENAI_TIMEOUT_SECONDS,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _openai_clients[key] = client
+            logger.info(f"Created {provider} client for {base_url}")
+    return client
+
+
+def configure_genai(api_key: str):
+    """設定 google.generativeai（同一個 key 只設定一次）並回傳模組"""
+    global _genai_key_fingerprint
+    import google.generativeai as genai  # type: ignore
+
+    fingerprint = _fingerprint(api_key)
+    if _genai_key_fingerprint == fingerprint:
+        return genai
+    with _lock:
+        if _genai_key_fingerprint != fingerprint:
+            genai.configure(api_key=api_key)
+            _genai_models.clear()
+            _genai_key_fingerprint = fingerprint
+    return genai
+
+
+def get_genai_model(model_name: str, api_key: str):
+    """取得共用的 GenerativeModel"""
+    genai = configure_genai(api_key)
+    key = (_genai_key_fingerprint or '', model_name)
+    model = _genai_models.get(key)
+    if model is None:
+        with _lock:
+            model = _genai_models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _genai_models[key] = model
+    return model
+
+
+class LLMCallMetrics:
+    """各呼叫位置的累計統計（行程內）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def record(self, call_site: str, provider: str, model: str, elapsed_ms: float,
+               input_tokens: int = 0, output_tokens: int = 0, error: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(call_site, {
+                'provider': provider,
+                'model': model,
+                'calls': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'input_tokens': 0,
+                'output_tokens': 0,
+            })
+            stats['model'] = model
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['input_tokens'] += input_tokens
+            stats['output_tokens'] += output_tokens
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            result = {}
+            for call_site, stats in self._stats.items():
+                data = dict(stats)
+                data['avg_ms'] = round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else 0.0
+                data['total_ms'] = round(stats['total_ms'], 1)
+                data['max_ms'] = round(stats['max_ms'], 1)
+                result[call_site] = data
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class _CallRecord:
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def usage_from(self, response) -> None:
+        """從 OpenAI（usage）或 Gemini（usage_metadata）回應取出 token 用量"""
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            self.input_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+            self.output_tokens = getattr(usage, 'completion_tokens', 0) or 0
+            return
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            self.input_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+            self.output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+
+
+@contextmanager
+def track_call(call_site: str, provider: str, model: str):
+    """
+    記錄一次模型呼叫
+
+    用法：
+        with track_call('ai_summary', 'deepseek', model) as call:
+            response = client.chat.completions.create(...)
+            call.usage_from(response)
+    """
+    record = _CallRecord()
+    started = time.perf_counter()
+    error = False
+    try:
+        yield record
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        llm_metrics.record(call_site, provider, model, elapsed_ms,
+                           record.input_tokens, record.output_tokens, error)
+        logger.debug(
+            f"LLM call {call_site} ({provider}/{model}): {elapsed_ms:.0f} ms, "
+            f"tokens {record.input_tokens}/{record.output_tokens}, error={error}"
+        )
+
+
+# 全域統計實例
+llm_metrics = LLMCallMetrics()
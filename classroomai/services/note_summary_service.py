@@ -0,0 +1,222 @@
+"""
+筆記 AI 摘要服務
+- 以 html.parser 取出筆記純文字並正規化，SHA-256 作為內容雜湊
+- 摘要與雜湊存於 NoteSummary，內容未變更時直接回傳，不再呼叫 DeepSeek
+- 筆記更新後於背景重新產生（只針對已產生過摘要的筆記）
+- 批次摘要：未命中快取的筆記同時呼叫模型，結果統一於呼叫端執行緒寫入
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 提示詞或正規化方式變更時遞增，讓既有摘要失效
+SUMMARY_PROMPT_VERSION = "1"
+BATCH_MAX_NOTES = 50
+BATCH_MAX_CONCURRENCY = 4
+
+SUMMARY_SYSTEM = '你是摘要助理。請嚴格回傳 JSON，無其他文字、無 Markdown。'
+SUMMARY_PROMPT = (
+    '以繁體中文將以下筆記濃縮為 3 個條列重點，並抽取 3-6 個關鍵字。'
+    '僅輸出 JSON：{"summary":["..."],"keywords":["k1","k2"]}\n\n'
+)
+
+WHITESPACE_RE = re.compile(r'\s+')
+KEYWORD_SPLIT_RE = re.compile(r'[^\w\u4e00-\u9fa5]+')
+# 換行類標籤：前後補空白，避免相鄰區塊的文字黏在一起
+BLOCK_TAGS = {'br', 'p', 'div', 'li', 'ul', 'ol', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre'}
+SKIP_TAGS = {'script', 'style'}
+
+
+class _TextExtractor(HTMLParser):
+    """收集 HTML 中的文字（實體字元自動轉換），略過 script / style"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def note_plain_text(note) -> str:
+    """筆記正規化後的純文字（HTML content 優先，沒有時使用 text）"""
+    source = note.content or note.text or ''
+    extractor = _TextExtractor()
+    extractor.feed(source)
+    extractor.close()
+    return WHITESPACE_RE.sub(' ', ''.join(extractor.parts)).strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(f"{SUMMARY_PROMPT_VERSION}\n{text}".encode('utf-8')).hexdigest()
+
+
+def _deepseek_available() -> bool:
+    return bool(os.getenv('DEEPSEEK') or os.getenv('DEEPSEEK_API_KEY') or os.getenv('DeepSeek_API_KEY'))
+
+
+class NoteSummaryService:
+    """筆記 AI 摘要服務"""
+
+    @staticmethod
+    def generate(text: str) -> Tuple[str, List[str], str]:
+        """
+        產生摘要（不寫入資料庫，可在背景執行緒呼叫）
+
+        Returns:
+            Tuple[str, List[str], str]: (摘要, 關鍵字, 來源 deepseek / fallback)
+
+        Raises:
+            Exception: DeepSeek 呼叫或回應解析失敗
+        """
+        if _deepseek_available():
+            from services.deepseek_client import generate_json
+
+            raw = generate_json(prompt=SUMMARY_PROMPT + text, system=SUMMARY_SYSTEM, call_site='ai_summary')
+            data = json.loads(raw or '{}')
+            return '\n'.join(data.get('summary') or []), data.get('keywords') or [], 'deepseek'
+
+        words = [w for w in KEYWORD_SPLIT_RE.split(text) if len(w) >= 2]
+        return text[:200], [w for w, _ in Counter(words).most_common(5)], 'fallback'
+
+    @staticmethod
+    def _is_fresh(summary, digest: str) -> bool:
+        # 未設定 DeepSeek 時產生的簡易摘要，在設定金鑰後視為過期
+        if summary is None or summary.content_hash != digest:
+            return False
+        return summary.source == 'deepseek' or not _deepseek_available()
+
+    @staticmethod
+    def _store(note, digest: str, summary: str, keywords: List[str], source: str):
+        from course.models import NoteSummary
+
+        obj, _ = NoteSummary.objects.update_or_create(
+            note=note,
+            defaults={'content_hash': digest, 'summary': summary, 'keywords': keywords, 'source': source},
+        )
+        return obj
+
+    @staticmethod
+    def _serialize(note, summary: str, keywords: List[str], cached: bool) -> Dict:
+        return {'id': str(note.id), 'summary': summary, 'keywords': keywords, 'cached': cached}
+
+    @staticmethod
+    def _cached_summary(note):
+        from course.models import NoteSummary
+
+        try:
+            return note.ai_summary
+        except NoteSummary.DoesNotExist:
+            return None
+
+    @staticmethod
+    def summarize(note) -> Dict:
+        """
+        取得筆記摘要：內容雜湊相符時回傳快取，否則呼叫模型並保存
+
+        Returns:
+            Dict: {'id', 'summary', 'keywords', 'cached'}
+        """
+        text = note_plain_text(note)
+        digest = content_hash(text)
+        cached = NoteSummaryService._cached_summary(note)
+        if NoteSummaryService._is_fresh(cached, digest):
+            return NoteSummaryService._serialize(note, cached.summary, cached.keywords, True)
+
+        try:
+            summary, keywords, source = NoteSummaryService.generate(text)
+        except Exception as e:
+            # 失敗時回傳前 200 字，不寫入快取
+            logger.error(f"AI summary failed for note {note.id}: {str(e)}")
+            return NoteSummaryService._serialize(note, text[:200], [], False)
+
+        NoteSummaryService._store(note, digest, summary, keywords, source)
+        return NoteSummaryService._serialize(note, summary, keywords, False)
+
+    @staticmethod
+    def summarize_many(notes: Iterable) -> List[Dict]:
+        """
+        批次摘要（最多 BATCH_MAX_NOTES 筆），未命中快取的筆記同時呼叫模型
+
+        Returns:
+            List[Dict]: 與 notes 順序相同的摘要結果
+        """
+        notes = list(notes)[:BATCH_MAX_NOTES]
+        results: Dict[str, Dict] = {}
+        pending = []
+        for note in notes:
+            text = note_plain_text(note)
+            digest = content_hash(text)
+            cached = NoteSummaryService._cached_summary(note)
+            if NoteSummaryService._is_fresh(cached, digest):
+                results[str(note.id)] = NoteSummaryService._serialize(note, cached.summary, cached.keywords, True)
+            else:
+                pending.append((note, text, digest))
+
+        def run(entry):
+            note, text, _ = entry
+            try:
+                return NoteSummaryService.generate(text)
+            except Exception as e:
+                logger.error(f"AI summary failed for note {note.id}: {str(e)}")
+                return None
+
+        if pending:
+            # 背景執行緒只呼叫模型，資料庫寫入留在目前執行緒
+            with ThreadPoolExecutor(max_workers=min(BATCH_MAX_CONCURRENCY, len(pending))) as pool:
+                generated = list(pool.map(run, pending))
+            for (note, text, digest), outcome in zip(pending, generated):
+                if outcome is None:
+                    results[str(note.id)] = NoteSummaryService._serialize(note, text[:200], [], False)
+                    continue
+                summary, keywords, source = outcome
+                NoteSummaryService._store(note, digest, summary, keywords, source)
+                results[str(note.id)] = NoteSummaryService._serialize(note, summary, keywords, False)
+
+        return [results[str(note.id)] for note in notes]
+
+    @staticmethod
+    def schedule_refresh(note) -> bool:
+        """
+        筆記更新後呼叫：已有摘要且內容雜湊改變時，於背景重新產生
+
+        Returns:
+            bool: 是否已排入背景工作
+        """
+        cached = NoteSummaryService._cached_summary(note)
+        if cached is None or cached.content_hash == content_hash(note_plain_text(note)):
+            return False
+        from services.tasks import enqueue_task, refresh_note_summary
+
+        enqueue_task(refresh_note_summary, str(note.id))
+        return True
+
+    @staticmethod
+    def refresh(note_id: str) -> Dict:
+        """背景工作：重新產生單一筆記的摘要（內容已相符時直接回傳快取）"""
+        from course.models import StudentNote
+
+        note = StudentNote.objects.select_related('ai_summary').get(pk=note_id)
+        return NoteSummaryService.summarize(note)
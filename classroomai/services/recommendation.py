@@ -224,13 +224,16 @@ def _deepseek_embed_batch(texts: List[str]) -> List[List[float]]:
         
         # 使用 OpenAI 兼容的嵌入 API
         from services.deepseek_client import _client
+        from services.llm_clients import track_call
         client = _client()
         model = os.getenv("DEEPSEEK_EMBED_MODEL", "deepseek-embedding-2")
         
-        response = client.embeddings.create(
-            model=model,
-            input=texts
-        )
+        with track_call("recommendation.rerank_embed", "deepseek", model) as call:
+            response = client.embeddings.create(
+                model=model,
+                input=texts
+            )
+            call.usage_from(response)
         vectors = [item.embedding for item in response.data]
         return vectors
     except Exception as e:
@@ -0,0 +1,306 @@
+"""
+全文搜尋服務
+課程、作業、筆記共用一份每位使用者的反向索引（SearchDocument）
+- 斷詞：中日韓文字切成二元組（bigram），英數字以整個詞為單位
+- MySQL：ngram parser 的 FULLTEXT 索引
+- SQLite：FTS5 虛擬表（owner 欄位限定使用者，bm25 排序）
+- 其他資料庫或未建立 FTS5 時：讀取該使用者的 tokens 於 Python 端計分
+"""
+import logging
+import re
+import unicodedata
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+from api_v2.models import SearchDocument
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'api_v2_searchdocument_fts'
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_RE = re.compile(f'([{_CJK}]+)|([0-9a-z]+)')
+# MySQL BOOLEAN MODE 的運算子字元
+MYSQL_BOOLEAN_CHARS_RE = re.compile(r'[+\-<>()~*"@]')
+
+
+def _uuid_str(value) -> str:
+    """原生 SQL 取得的 UUID 為 32 字元十六進位字串，統一為標準格式"""
+    return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)))
+
+
+def normalize(text: str) -> str:
+    """全形轉半形並轉小寫"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    文件斷詞
+    中日韓連續字串切成二元組，並補上最後一個單字，讓單字查詢（前綴比對）能找到每個字
+    """
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(normalize(text)):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            tokens.append(cjk[-1])
+    return tokens
+
+
+def tokenize_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    查詢斷詞
+
+    Returns:
+        List[Tuple[str, bool]]: (詞, 是否以前綴比對)；英數字詞與單一中文字以前綴比對
+    """
+    terms = []
+    for cjk, word in TOKEN_RE.findall(normalize(query)):
+        if word:
+            terms.append((word, True))
+        elif len(cjk) == 1:
+            terms.append((cjk, True))
+        else:
+            terms.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+    # 去除重複，保留順序
+    return list(dict.fromkeys(terms))
+
+
+class SearchService:
+    """全文搜尋服務"""
+
+    _fts5_available: Optional[bool] = None
+
+    # ── 索引維護 ────────────────────────────────────────────
+
+    @staticmethod
+    def document_for(instance) -> Optional[Dict]:
+        """
+        把課程 / 作業 / 筆記轉為索引文件欄位；不支援的型別回傳 None
+        以 app_label.model 判斷型別，資料遷移中的歷史模型也適用
+        """
+        label = instance._meta.label_lower
+        if label == 'api_v2.coursev2':
+            return {
+                'doc_type': 'course',
+                'user_id': instance.user_id,
+                'title': instance.title,
+                'body': ' '.join(filter(None, [instance.description, instance.instructor, instance.classroom])),
+            }
+        if label == 'api_v2.assignmentv2':
+            return {
+                'doc_type': 'assignment',
+                'user_id': instance.user_id,
+                'title': instance.title,
+                'body': instance.description or '',
+            }
+        if label == 'course.studentnote':
+            from services.note_summary_service import note_plain_text
+
+            # text 只在空白時由 content 補上，編輯後會過期；一律以去除 HTML 的 content 為準
+            plain = note_plain_text(instance)
+            # note_type 也被用來保存 course_v2:<uuid> 關聯，這種值不列入索引
+            note_type = '' if instance.note_type.startswith('course_v2:') else instance.note_type
+            return {
+                'doc_type': 'note',
+                'user_id': instance.author_id,
+                'title': instance.title or plain[:50],
+                'body': ' '.join(filter(None, [plain, instance.tags, note_type])),
+            }
+        return None
+
+    @staticmethod
+    def fields_for(instance) -> Optional[Dict]:
+        """SearchDocument 的欄位值（含斷詞結果）；不支援的型別回傳 None"""
+        document = SearchService.document_for(instance)
+        if document is None:
+            return None
+        return {
+            'doc_type': document['doc_type'],
+            'object_id': instance.pk,
+            'user_id': document['user_id'],
+            'title': document['title'][:255],
+            'body': document['body'],
+            'title_tokens': ' '.join(tokenize(document['title'])),
+            'body_tokens': ' '.join(tokenize(document['body'])),
+        }
+
+    @staticmethod
+    def index(instance) -> None:
+        """建立或更新單筆索引"""
+        fields = SearchService.fields_for(instance)
+        if fields is None:
+            return
+        SearchDocument.objects.update_or_create(
+            doc_type=fields.pop('doc_type'),
+            object_id=fields.pop('object_id'),
+            defaults=fields,
+        )
+
+    @staticmethod
+    def remove(instance) -> None:
+        """刪除單筆索引"""
+        document = SearchService.document_for(instance)
+        if document is not None:
+            SearchDocument.objects.filter(doc_type=document['doc_type'], object_id=instance.pk).delete()
+
+    @staticmethod
+    def rebuild(instances: Iterable) -> int:
+        """重建多筆索引（管理命令 / 初次建立使用），回傳處理筆數"""
+        count = 0
+        for instance in instances:
+            SearchService.index(instance)
+            count += 1
+        return count
+
+    # ── 查詢 ───────────────────────────────────────────────
+
+    @classmethod
+    def backend(cls) -> str:
+        """目前使用的搜尋後端：mysql / fts5 / python"""
+        if connection.vendor == 'mysql':
+            return 'mysql'
+        if connection.vendor == 'sqlite':
+            if cls._fts5_available is None:
+                cls._fts5_available = FTS_TABLE in connection.introspection.table_names()
+            if cls._fts5_available:
+                return 'fts5'
+        return 'python'
+
+    @classmethod
+    def search(cls, line_user_id: str, query: str, doc_types: Optional[List[str]] = None,
+               limit: Optional[int] = DEFAULT_LIMIT) -> List[Dict]:
+        """
+        依相關度排序的搜尋結果
+
+        Args:
+            line_user_id: LINE 使用者 ID
+            query: 搜尋字串
+            doc_types: 限定類型（course / assignment / note），None 為全部
+            limit: 最多筆數，None 為不限制
+
+        Returns:
+            List[Dict]: [{'type', 'id', 'title', 'score'}]，分數越高越相關
+        """
+        terms = tokenize_query(query)
+        if not terms:
+            return []
+        if limit is not None:
+            limit = min(max(int(limit), 1), MAX_LIMIT)
+
+        backend = cls.backend()
+        if backend == 'mysql':
+            rows = cls._search_mysql(line_user_id, terms, doc_types, limit)
+        elif backend == 'fts5':
+            rows = cls._search_fts5(line_user_id, terms, doc_types, limit)
+        else:
+            rows = cls._search_python(line_user_id, terms, doc_types, limit)
+
+        return [
+            {'type': doc_type, 'id': _uuid_str(object_id), 'title': title, 'score': round(float(score), 4)}
+            for doc_type, object_id, title, score in rows
+        ]
+
+    @classmethod
+    def matching_ids(cls, line_user_id: str, query: str, doc_type: str) -> List[str]:
+        """符合查詢的物件 ID（供既有列表 API 以 id__in 過濾）"""
+        return [result['id'] for result in cls.search(line_user_id, query, [doc_type], limit=None)]
+
+    @staticmethod
+    def _type_clause(doc_types: Optional[List[str]], column: str) -> Tuple[str, List]:
+        if not doc_types:
+            return '', []
+        return f" AND {column} IN ({', '.join(['%s'] * len(doc_types))})", list(doc_types)
+
+    @staticmethod
+    def _fetch(sql: str, params: List) -> List[Tuple]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @classmethod
+    def _search_mysql(cls, line_user_id, terms, doc_types, limit) -> List[Tuple]:
+        # ngram parser 會把引號內的詞再切成 ngram 並以片語比對；單字以萬用字元前綴比對
+        parts = []
+        for term, prefix in terms:
+            term = MYSQL_BOOLEAN_CHARS_RE.sub('', term)
+            if term:
+                parts.append(f'+{term}*' if prefix else f'+"{term}"')
+        if not parts:
+            return []
+        expr = ' '.join(parts)
+        type_sql, type_params = cls._type_clause(doc_types, 'doc_type')
+        sql = (
+            "SELECT doc_type, object_id, title, "
+            f"MATCH(title) AGAINST (%s IN BOOLEAN MODE) * {TITLE_WEIGHT} "
+            f"+ MATCH(title, body) AGAINST (%s IN BOOLEAN MODE) * {BODY_WEIGHT} AS score "
+            "FROM api_v2_searchdocument "
+            f"WHERE user_id = %s AND MATCH(title, body) AGAINST (%s IN BOOLEAN MODE){type_sql} "
+            "ORDER BY score DESC"
+        )
+        params = [expr, expr, line_user_id, expr] + type_params
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return cls._fetch(sql, params)
+
+    @classmethod
+    def _search_fts5(cls, line_user_id, terms, doc_types, limit) -> List[Tuple]:
+        def quote(value):
+            return '"' + value.replace('"', '""') + '"'
+
+        match = ' AND '.join(
+            f"{{title_tokens body_tokens}}: {quote(term)}{'*' if prefix else ''}" for term, prefix in terms
+        )
+        match = f"owner: {quote(line_user_id)} AND {match}"
+        type_sql, type_params = cls._type_clause(doc_types, 'd.doc_type')
+        sql = (
+            f"SELECT d.doc_type, d.object_id, d.title, -bm25({FTS_TABLE}, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM {FTS_TABLE} JOIN api_v2_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{type_sql} "
+            "ORDER BY score DESC"
+        )
+        params = [match] + type_params
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return cls._fetch(sql, params)
+
+    @staticmethod
+    def _search_python(line_user_id, terms, doc_types, limit) -> List[Tuple]:
+        documents = SearchDocument.objects.filter(user_id=line_user_id)
+        if doc_types:
+            documents = documents.filter(doc_type__in=doc_types)
+
+        def count(tokens: List[str], term: str, prefix: bool) -> int:
+            if prefix:
+                return sum(1 for token in tokens if token.startswith(term))
+            return tokens.count(term)
+
+        results = []
+        for doc_type, object_id, title, title_tokens, body_tokens in documents.values_list(
+            'doc_type', 'object_id', 'title', 'title_tokens', 'body_tokens'
+        ).iterator():
+            title_tokens, body_tokens = title_tokens.split(), body_tokens.split()
+            score = 0.0
+            for term, prefix in terms:
+                hits = (count(title_tokens, term, prefix) * TITLE_WEIGHT
+                        + count(body_tokens, term, prefix) * BODY_WEIGHT)
+                if not hits:
+                    break
+                score += hits / (1 + len(title_tokens) + len(body_tokens)) ** 0.5
+            else:
+                results.append((doc_type, object_id, title, score))
+
+        results.sort(key=lambda row: row[3], reverse=True)
+        return results if limit is None else results[:limit]
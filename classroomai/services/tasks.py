@@ -121,7 +121,7 @@ def auto_sync_calendar_for_all_users():
 @shared_task
 def cleanup_expired_cache():
     """
-    清理過期的作業統計暫存資料
+    清理過期的作業統計暫存資料、課表圖片解析快取與匯入工作
     """
     try:
         logger.info("Starting cleanup of expired cache")
@@ -133,9 +133,24 @@ def cleanup_expired_cache():
         ).delete()
         
         logger.info(f"Cleaned up {deleted_count} expired cache entries")
+
+        # 過期的課表圖片解析結果
+        from services.timetable_extraction_service import TimetableExtractionService
+        extraction_deleted = TimetableExtractionService.purge_expired()
+        logger.info(f"Cleaned up {extraction_deleted} expired timetable extraction entries")
+
+        # 超過保留天數的課表圖片匯入工作，以及中斷後停在處理中的工作
+        from services.timetable_import_job_service import TimetableImportJobService
+        jobs_deleted = TimetableImportJobService.purge_old()
+        logger.info(f"Cleaned up {jobs_deleted} old timetable import jobs")
+        jobs_failed = TimetableImportJobService.fail_stale()
+        logger.info(f"Marked {jobs_failed} stale timetable import jobs as failed")
         return {
             'success': True,
-            'deleted_count': deleted_count
+            'deleted_count': deleted_count,
+            'extraction_deleted_count': extraction_deleted,
+            'import_jobs_deleted_count': jobs_deleted,
+            'import_jobs_failed_count': jobs_failed,
         }
         
     except Exception as e:
@@ -191,4 +206,74 @@ def sync_user_data(line_user_id: str, sync_type: str = 'all'):
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+def enqueue_task(task, *args, **kwargs) -> None:
+    """
+    將任務送入 Celery 佇列；broker 無法使用時改以背景執行緒執行
+    """
+    try:
+        task.delay(*args, **kwargs)
+    except Exception as e:
+        logger.warning(f"Celery unavailable for {task.name}, running in background thread: {str(e)}")
+        import threading
+        thread = threading.Thread(target=task, args=args, kwargs=kwargs)
+        thread.daemon = True
+        thread.start()
+
+
+@shared_task
+def send_flex_batch_job(job_id: str):
+    """
+    執行 Flex Message 批次發送工作
+    
+    Args:
+        job_id: FlexBatchJob 的 job_id
+    """
+    from services.flex_batch_service import FlexBatchService
+    try:
+        return FlexBatchService.process_job(job_id)
+    except Exception as e:
+        logger.error(f"Error in send_flex_batch_job {job_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def process_timetable_import_job(job_id: str):
+    """
+    解析課表圖片匯入工作
+
+    Args:
+        job_id: TimetableImportJob 的 job_id
+    """
+    from services.timetable_import_job_service import TimetableImportJobService
+    try:
+        return TimetableImportJobService.process_job(job_id)
+    except Exception as e:
+        logger.error(f"Error in process_timetable_import_job {job_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@shared_task
+def refresh_note_summary(note_id: str):
+    """
+    筆記內容變更後重新產生 AI 摘要
+
+    Args:
+        note_id: StudentNote 的 id
+    """
+    from services.note_summary_service import NoteSummaryService
+    try:
+        return NoteSummaryService.refresh(note_id)
+    except Exception as e:
+        logger.error(f"Error in refresh_note_summary {note_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
@@ -0,0 +1,115 @@
+"""
+課表圖片解析服務
+以內容定址的資料庫快取包住 Gemini 視覺模型呼叫
+- 快取鍵：圖片 SHA-256 + 模型名稱 + 提示詞版本，不分使用者（同一份學校課表重複上傳不再呼叫模型）
+- 預覽、dryRun 與正式匯入上傳同一張圖片時共用同一次模型呼叫
+- 同一行程內同時上傳同一張圖片時只有一個請求呼叫模型，其餘等待結果
+"""
+import hashlib
+import logging
+import threading
+import weakref
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from api_v2.models import TimetableExtractionCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+class TimetableExtractionService:
+    """課表圖片解析服務"""
+
+    _locks: "weakref.WeakValueDictionary[Tuple[str, str, str], threading.Lock]" = weakref.WeakValueDictionary()
+    _locks_guard = threading.Lock()
+
+    @staticmethod
+    def ttl_seconds() -> int:
+        return int(getattr(settings, 'TIMETABLE_EXTRACTION_CACHE_TTL', DEFAULT_TTL_SECONDS))
+
+    @staticmethod
+    def cache_key(image_bytes: bytes, model: Optional[str] = None) -> Tuple[str, str, str]:
+        """(圖片 SHA-256, 模型名稱, 提示詞版本)"""
+        from services.gemma_client import TIMETABLE_PROMPT_VERSION, resolve_model_name
+
+        return hashlib.sha256(image_bytes).hexdigest(), resolve_model_name(model), TIMETABLE_PROMPT_VERSION
+
+    @classmethod
+    def _lock_for(cls, key: Tuple[str, str, str]) -> threading.Lock:
+        with cls._locks_guard:
+            lock = cls._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                cls._locks[key] = lock
+            return lock
+
+    @staticmethod
+    def get_cached(key: Tuple[str, str, str]) -> Optional[List[Dict]]:
+        """未過期的快取結果，沒有則回傳 None"""
+        image_sha256, model_name, prompt_version = key
+        return TimetableExtractionCache.objects.filter(
+            image_sha256=image_sha256,
+            model_name=model_name,
+            prompt_version=prompt_version,
+            expires_at__gt=timezone.now(),
+        ).values_list('items', flat=True).first()
+
+    @classmethod
+    def store(cls, key: Tuple[str, str, str], items: List[Dict]) -> None:
+        image_sha256, model_name, prompt_version = key
+        expires_at = timezone.now() + timedelta(seconds=cls.ttl_seconds())
+        try:
+            TimetableExtractionCache.objects.update_or_create(
+                image_sha256=image_sha256,
+                model_name=model_name,
+                prompt_version=prompt_version,
+                defaults={'items': items, 'expires_at': expires_at},
+            )
+        except IntegrityError:
+            # 其他行程同時寫入同一個鍵，內容相同，忽略即可
+            pass
+
+    @classmethod
+    def extract(cls, image_bytes: bytes, model: Optional[str] = None) -> Tuple[List[Dict], bool]:
+        """
+        解析課表圖片（優先使用快取）
+
+        Args:
+            image_bytes: 圖片內容
+            model: 模型名稱，None 為環境變數設定的預設模型
+
+        Returns:
+            Tuple[List[Dict], bool]: (課程清單, 是否命中快取)
+        """
+        from services.gemma_client import extract_timetable_from_image
+
+        key = cls.cache_key(image_bytes, model)
+        items = cls.get_cached(key)
+        if items is not None:
+            logger.info(f"Timetable extraction cache hit: {key[0][:12]} ({key[1]}, v{key[2]})")
+            return items, True
+
+        with cls._lock_for(key):
+            # 等待期間可能已由其他請求寫入
+            items = cls.get_cached(key)
+            if items is not None:
+                return items, True
+
+            items = extract_timetable_from_image(image_bytes, model=model)
+            # 模型輸出無法解析時回傳空清單，不快取，讓下次上傳重新呼叫模型
+            if items:
+                cls.store(key, items)
+            logger.info(f"Timetable extraction cache miss: {key[0][:12]} ({key[1]}, v{key[2]}), {len(items)} items")
+            return items, False
+
+    @staticmethod
+    def purge_expired() -> int:
+        """刪除過期的快取，回傳刪除筆數"""
+        deleted, _ = TimetableExtractionCache.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
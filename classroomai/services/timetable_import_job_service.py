@@ -0,0 +1,186 @@
+"""
+課表圖片非同步匯入工作
+上傳後先保存圖片並建立工作，由 Celery 任務解析與檢查衝突，前端輪詢工作狀態（或完成後收到 LINE 推播）
+解析結果保存在工作中，確認匯入時直接使用，不需重新解析
+"""
+import logging
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api_v2.models import TimetableImportJob
+from .course_import_service import CourseImportService
+from .timetable_extraction_service import TimetableExtractionService
+
+logger = logging.getLogger(__name__)
+
+# 未確認的工作保留天數
+JOB_RETENTION_DAYS = 7
+# 處理中超過此時間未更新的工作視為中斷（執行緒 / worker 重啟），可重新搶占或標記為失敗
+JOB_RUNNING_TIMEOUT = timedelta(minutes=10)
+STALE_JOB_ERROR = '處理逾時，請重新上傳課表圖片'
+
+
+class TimetableImportJobStateError(Exception):
+    """工作狀態不允許確認匯入（尚未完成，或已被其他請求確認）"""
+
+    def __init__(self, status: str):
+        super().__init__(f"匯入工作狀態為 {status}，無法匯入")
+        self.status = status
+
+
+class TimetableImportJobService:
+    """課表圖片非同步匯入工作服務"""
+
+    @staticmethod
+    def create_job(user, upload, notify: bool = False) -> TimetableImportJob:
+        """保存上傳圖片並建立工作"""
+        job = TimetableImportJob(user=user, notify=notify)
+        job.image.save(upload.name or 'timetable.png', upload, save=False)
+        job.save()
+        return job
+
+    @staticmethod
+    def process_job(job_id: str) -> Dict:
+        """
+        解析圖片並檢查衝突，結果寫回工作（Celery 任務呼叫）
+
+        Returns:
+            Dict: 工作狀態摘要
+        """
+        # 以條件更新搶占工作，重複投遞或同時執行的任務只有一個會成功；中斷的處理中工作可重新搶占
+        now = timezone.now()
+        claimed = TimetableImportJob.objects.filter(job_id=job_id).filter(
+            Q(status__in=('pending', 'failed')) | Q(status='running', updated_at__lt=now - JOB_RUNNING_TIMEOUT)
+        ).update(status='running', updated_at=now)
+        job = TimetableImportJob.objects.select_related('user').get(job_id=job_id)
+        if not claimed:
+            return TimetableImportJobService.serialize(job)
+
+        try:
+            with job.image.open('rb') as f:
+                data = f.read()
+            items, cached = TimetableExtractionService.extract(data)
+            job.items = items
+            job.preview = CourseImportService.preview_timetable(job.user, items)
+            job.cached = cached
+            job.error = ''
+            job.status = 'completed'
+        except Exception as e:
+            logger.error(f"Timetable import job {job_id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+
+        job.finished_at = timezone.now()
+        job.save()
+        if job.status == 'completed':
+            # 解析結果已保存（圖片內容另有解析快取），不再需要原圖
+            job.image.delete(save=True)
+        if job.notify:
+            TimetableImportJobService._notify(job)
+        return TimetableImportJobService.serialize(job)
+
+    @staticmethod
+    def _notify(job: TimetableImportJob) -> None:
+        """以 LINE 推播通知使用者解析結果"""
+        from linebot.models import TextSendMessage
+        from .line_messaging_service import line_messaging_service
+
+        if job.status == 'completed':
+            conflicts = sum(1 for item in job.preview if item.get('has_conflicts'))
+            text = f"📅 課表解析完成：共 {len(job.preview)} 門課程"
+            if conflicts:
+                text += f"，其中 {conflicts} 門與現有課表時段衝突"
+            text += "，請回到網頁確認匯入。"
+        else:
+            text = "⚠️ 課表圖片解析失敗，請重新上傳較清晰的圖片。"
+        try:
+            line_messaging_service.push(job.user_id, TextSendMessage(text=text))
+        except Exception as e:
+            logger.warning(f"Failed to notify timetable import job {job.job_id}: {str(e)}")
+
+    @staticmethod
+    def get_job(user, job_id: str) -> Optional[TimetableImportJob]:
+        """取得使用者自己的工作（job_id 不是合法 UUID 時視為不存在）"""
+        try:
+            job_uuid = uuid.UUID(str(job_id))
+        except (TypeError, ValueError, AttributeError):
+            return None
+        job = TimetableImportJob.objects.filter(user=user, job_id=job_uuid).first()
+        if job and job.status == 'running' and job.updated_at < timezone.now() - JOB_RUNNING_TIMEOUT:
+            # 輪詢時發現中斷的工作直接標記為失敗，前端不會無限等待
+            TimetableImportJobService.fail_stale(job_id=job_uuid)
+            job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def fail_stale(**filters) -> int:
+        """把處理中但超過 JOB_RUNNING_TIMEOUT 未更新的工作標記為失敗，回傳筆數"""
+        now = timezone.now()
+        return TimetableImportJob.objects.filter(
+            status='running', updated_at__lt=now - JOB_RUNNING_TIMEOUT, **filters,
+        ).update(status='failed', error=STALE_JOB_ERROR, finished_at=now, updated_at=now)
+
+    @staticmethod
+    def confirm(job: TimetableImportJob, courses: Optional[List[Dict]] = None) -> Dict:
+        """
+        以工作中的解析結果（或前端編輯後的課程）匯入，衝突會以目前的課表重新檢查
+
+        Args:
+            job: 已完成的工作
+            courses: 前端編輯後的課程，None 時使用工作中的解析結果
+
+        Returns:
+            Dict: 與 import_timetable 相同的匯入結果
+
+        Raises:
+            TimetableImportJobStateError: 工作未完成或已被確認（同時送出的重複確認只有一個會匯入）
+        """
+        with transaction.atomic():
+            locked = TimetableImportJob.objects.select_for_update().get(pk=job.pk)
+            if locked.status != 'completed':
+                raise TimetableImportJobStateError(locked.status)
+            result = CourseImportService.import_timetable(job.user, courses if courses else locked.items)
+            locked.result = result
+            locked.status = 'confirmed'
+            locked.save(update_fields=['result', 'status', 'updated_at'])
+        job.result = result
+        job.status = 'confirmed'
+        return result
+
+    @staticmethod
+    def serialize(job: TimetableImportJob) -> Dict:
+        data = {
+            'jobId': str(job.job_id),
+            'status': job.status,
+            'createdAt': job.created_at,
+            'finishedAt': job.finished_at,
+        }
+        if job.status in ('completed', 'confirmed'):
+            data.update({
+                'items': job.preview,
+                'cached': job.cached,
+                'total_courses': len(job.preview),
+                'courses_with_conflicts': sum(1 for item in job.preview if item.get('has_conflicts')),
+            })
+        if job.status == 'confirmed':
+            data['result'] = job.result
+        if job.status == 'failed':
+            data['error'] = job.error
+        return data
+
+    @staticmethod
+    def purge_old(days: int = JOB_RETENTION_DAYS) -> int:
+        """刪除超過保留天數的工作與殘留圖片，回傳刪除筆數"""
+        count = 0
+        cutoff = timezone.now() - timedelta(days=days)
+        for job in TimetableImportJob.objects.filter(created_at__lt=cutoff).iterator():
+            if job.image:
+                job.image.delete(save=False)
+            job.delete()
+            count += 1
+        return count